@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from itertools import pairwise
 from typing import Any, TypedDict, cast
 
-from langgraph.graph import END, StateGraph
-
+from .manifest import incremental
 from .nodes.critic import critic_node
 from .nodes.planner import planner_node
 from .nodes.planner_llm import planner_llm_node
@@ -11,6 +12,12 @@ from .nodes.refactor import refactor_node
 from .nodes.refactor_llm import refactor_llm_node
 from .nodes.test_writer_llm import test_writer_llm_node
 from .nodes.writer_node import test_writer_node
+from .tracing import instrument
+
+Node = Callable[[dict[str, Any]], dict[str, Any]]
+
+# Executors that can run the pipeline; "native" skips LangGraph entirely.
+ENGINES: tuple[str, ...] = ("langgraph", "native")
 
 
 class State(TypedDict, total=False):
@@ -24,12 +31,26 @@ class State(TypedDict, total=False):
     temperature: float
     max_output_tokens: int
     cache_dir: str
+    cache_max_mb: int
+    critic_jobs: int
+    refactor_chunk_size: int
+    llm_concurrency: int
+    token_budget: int
+    stream: bool
+    incremental: bool
+    memoize: bool
+    parallel: bool
+    lazy_imports: bool
+    autofix: bool
+    trace_memory: bool
+    memory_budget_mb: int
 
     plan: dict[str, Any]
     files: dict[str, str]
     tests: dict[str, str]
     metrics: dict[str, Any]
     report: str
+    llm_calls: list[dict[str, Any]]
 
 
 def _use_llm(state: dict[str, Any]) -> bool:
@@ -49,15 +70,63 @@ def _test_writer_dispatch(state: dict[str, Any]) -> dict[str, Any]:
     return test_writer_llm_node(state) if _use_llm(state) else test_writer_node(state)
 
 
-def build_graph() -> Any:
+def pipeline_nodes() -> dict[str, Node]:
+    """The pipeline's stages in the order they run; each one feeds the next."""
+    return {
+        "planner": _planner_dispatch,
+        "refactor": _refactor_dispatch,
+        "test_writer": _test_writer_dispatch,
+        "critic": critic_node,
+    }
+
+
+def _wrap(nodes: dict[str, Node]) -> dict[str, Node]:
+    # Timing wraps the manifest check, so reused stages show up as near-zero spans.
+    return {name: instrument(name, incremental(name, node)) for name, node in nodes.items()}
+
+
+def build_graph(nodes: dict[str, Node] | None = None) -> Any:
+    from langgraph.graph import END, StateGraph
+
     g = StateGraph(State)
-    g.add_node("planner", cast(Any, _planner_dispatch))
-    g.add_node("refactor", cast(Any, _refactor_dispatch))
-    g.add_node("test_writer", cast(Any, _test_writer_dispatch))
-    g.add_node("critic", cast(Any, critic_node))
-    g.set_entry_point("planner")
-    g.add_edge("planner", "refactor")
-    g.add_edge("refactor", "test_writer")
-    g.add_edge("test_writer", "critic")
-    g.add_edge("critic", END)
+    wrapped = _wrap(nodes or pipeline_nodes())
+    for name, node in wrapped.items():
+        g.add_node(name, cast(Any, node))
+    names = list(wrapped)
+    g.set_entry_point(names[0])
+    for src, dst in pairwise(names):
+        g.add_edge(src, dst)
+    g.add_edge(names[-1], END)
     return g.compile()
+
+
+class NativePipeline:
+    """Runs the pipeline's nodes in order, in-process, with the compiled graph's state rules.
+
+    As with LangGraph's ``StateGraph(State)``: input and update keys not declared
+    in :class:`State` are dropped, every node gets a shallow copy of the current
+    state (edits to that dict are lost, edits to the values in it are not), and
+    the last write to a key wins.
+    """
+
+    def __init__(self, nodes: dict[str, Node] | None = None) -> None:
+        self.nodes = _wrap(nodes or pipeline_nodes())
+        self.keys = frozenset(State.__annotations__)
+
+    def invoke(self, state: dict[str, Any]) -> dict[str, Any]:
+        current = {k: v for k, v in state.items() if k in self.keys}
+        for name, node in self.nodes.items():
+            update = node(dict(current))
+            if not isinstance(update, dict):
+                raise TypeError(f"node {name!r} returned {type(update).__name__}, not a dict")
+            current.update((k, v) for k, v in update.items() if k in self.keys)
+        return current
+
+
+def build_pipeline(engine: str = "langgraph", nodes: dict[str, Node] | None = None) -> Any:
+    """An object with ``invoke(state) -> state`` running the pipeline on ``engine``."""
+    if engine == "native":
+        return NativePipeline(nodes)
+    if engine == "langgraph":
+        return build_graph(nodes)
+    raise ValueError(f"Unknown engine {engine!r}; expected one of: {', '.join(ENGINES)}")
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+import dataclasses
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+
+from ..tools.nb_model import load_notebook
+from .nodes.refactor_runtime import MEMO_DIR_NAME
+
+MANIFEST_NAME = ".nra-manifest.json"
+MANIFEST_VERSION = 1
+
+# Tool caches written while the critic runs; never part of a stage's output.
+_SKIP_DIRS = frozenset(
+    {"__pycache__", ".pytest_cache", ".mypy_cache", ".ruff_cache", MEMO_DIR_NAME}
+)
+
+# State keys each stage contributes, restored verbatim when the stage is reused.
+STAGE_OUTPUTS: dict[str, tuple[str, ...]] = {
+    "planner": ("plan",),
+    "refactor": ("files",),
+    "test_writer": ("tests",),
+    "critic": ("metrics", "report"),
+}
+
+# Settings each stage depends on besides its inputs.
+_LLM_KEYS = ("provider", "model", "temperature", "max_output_tokens")
+_STAGE_KEYS: dict[str, tuple[str, ...]] = {
+    "planner": _LLM_KEYS,
+    "refactor": (
+        *_LLM_KEYS,
+        "mode",
+        "memoize",
+        "parallel",
+        "lazy_imports",
+        "refactor_chunk_size",
+        "token_budget",
+    ),
+    "test_writer": (*_LLM_KEYS, "mode"),
+    "critic": ("safe", "timeout_secs", "autofix", "trace_memory"),
+}
+
+Node = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha(p: Path) -> str | None:
+    try:
+        return _sha(p.read_bytes())
+    except OSError:
+        return None
+
+
+def _encode(value: Any) -> Any:
+    """JSON form of a state value; plans are tagged so they decode to the same type."""
+    if isinstance(value, BaseModel):
+        return {"__plan__": "schema", "data": value.model_dump()}
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {"__plan__": "llm", "data": dataclasses.asdict(value)}
+    return value
+
+
+def _decode(value: Any) -> Any:
+    if not (isinstance(value, dict) and "__plan__" in value):
+        return value
+    data = dict(value["data"])
+    if value["__plan__"] == "schema":
+        from .schemas import Plan as SchemaPlan
+
+        return SchemaPlan.model_validate(data)
+    from .nodes.planner_llm import FunctionSpec, Plan
+
+    functions = [FunctionSpec(**f) for f in data.pop("functions", [])]
+    return Plan(functions=functions, **data)
+
+
+class Manifest:
+    """Per-output-dir record of what the last run produced and from which inputs.
+
+    Stored as ``<output_dir>/.nra-manifest.json``. It keeps the notebook's
+    per-cell hashes, and per stage: a fingerprint of the stage's inputs and
+    settings, the state it returned (plan, critic metrics, ...) and the hashes
+    of the files it wrote. A stage whose fingerprint matches and whose files
+    are untouched is reused instead of run.
+    """
+
+    def __init__(self, output_dir: Path, data: dict[str, Any] | None = None) -> None:
+        self.output_dir = output_dir
+        self.data: dict[str, Any] = data or {"version": MANIFEST_VERSION, "stages": {}}
+
+    @property
+    def path(self) -> Path:
+        return self.output_dir / MANIFEST_NAME
+
+    @classmethod
+    def load(cls, output_dir: Path) -> Manifest:
+        try:
+            data = json.loads((output_dir / MANIFEST_NAME).read_text())
+        except (OSError, ValueError):
+            return cls(output_dir)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls(output_dir)
+        return cls(output_dir, data)
+
+    def save(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.data, indent=1, sort_keys=True))
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------ #
+    def cell_hashes(self, input_nb: str) -> list[str]:
+        """Hashes of the notebook's cells; recomputed only when the file's stat changes."""
+        st = os.stat(input_nb)
+        stamp = [str(Path(input_nb).resolve()), st.st_mtime_ns, st.st_size]
+        known = self.data.get("input")
+        if known == stamp and isinstance(self.data.get("cells"), list):
+            return list(self.data["cells"])
+        nb = load_notebook(input_nb)
+        cells = [_sha(f"{c.cell_type}\0{c.source}".encode()) for c in nb.cells]
+        self.data["input"] = stamp
+        self.data["cells"] = cells
+        return cells
+
+    def tree(self, include_reports: bool = True) -> dict[str, tuple[int, int]]:
+        """``rel path -> (mtime_ns, size)`` of every file under the output dir."""
+        out: dict[str, tuple[int, int]] = {}
+        root = str(self.output_dir)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [
+                d for d in dirnames if d not in _SKIP_DIRS and (include_reports or d != ".reports")
+            ]
+            for name in filenames:
+                if name == MANIFEST_NAME or name.endswith(".tmp"):
+                    continue
+                full = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                out[os.path.relpath(full, root)] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def tree_hash(self) -> str:
+        """Content hash of the generated package and tests (critic reports excluded)."""
+        h = hashlib.sha256()
+        for rel in sorted(self.tree(include_reports=False)):
+            h.update(rel.encode() + b"\0")
+            h.update((_file_sha(self.output_dir / rel) or "").encode())
+        return h.hexdigest()
+
+    def fingerprint(self, stage: str, state: dict[str, Any]) -> str:
+        parts: dict[str, Any] = {
+            "stage": stage,
+            "settings": {k: state.get(k) for k in _STAGE_KEYS[stage]},
+        }
+        if stage in ("planner", "refactor"):
+            parts["cells"] = self.cell_hashes(str(state["input_nb"]))
+        if stage in ("refactor", "test_writer"):
+            parts["plan"] = _encode(state.get("plan"))
+        if stage == "test_writer":
+            parts["generated"] = self.stage_files("refactor")
+        if stage == "critic":
+            parts["tree"] = self.tree_hash()
+        return _sha(json.dumps(parts, sort_keys=True, default=str).encode())
+
+    def stage_files(self, stage: str) -> dict[str, str]:
+        rec = self.data["stages"].get(stage) or {}
+        return dict(rec.get("files", {}))
+
+    # ------------------------------------------------------------------ #
+    def reuse(self, stage: str, fingerprint: str) -> dict[str, Any] | None:
+        """The recorded state update for ``stage`` if still valid, else None."""
+        rec = self.data["stages"].get(stage)
+        if not rec or rec.get("fingerprint") != fingerprint:
+            return None
+        for rel, sha in rec.get("files", {}).items():
+            if _file_sha(self.output_dir / rel) != sha:
+                return None
+        return {k: _decode(v) for k, v in rec.get("update", {}).items()}
+
+    def record(
+        self,
+        stage: str,
+        fingerprint: str,
+        update: dict[str, Any],
+        before: dict[str, tuple[int, int]],
+    ) -> None:
+        """Store ``update`` and the files the stage (re)wrote since ``before`` was taken."""
+        written = {
+            rel: _file_sha(self.output_dir / rel)
+            for rel, stamp in self.tree().items()
+            if before.get(rel) != stamp
+        }
+        # A file rewritten by this stage belongs to it now, not to an earlier one.
+        for other, rec in self.data["stages"].items():
+            if other != stage:
+                for rel in written:
+                    rec.get("files", {}).pop(rel, None)
+        self.data["stages"][stage] = {
+            "fingerprint": fingerprint,
+            "update": {k: _encode(update[k]) for k in STAGE_OUTPUTS[stage] if k in update},
+            "files": {rel: sha for rel, sha in written.items() if sha is not None},
+        }
+
+
+def incremental(stage: str, node: Node) -> Node:
+    """Wrap a graph node so it is skipped when the manifest shows its outputs are current.
+
+    Only active when the state has ``incremental`` set; the CLI turns it on.
+    """
+
+    def run(state: dict[str, Any]) -> dict[str, Any]:
+        if not state.get("incremental"):
+            return node(state)
+        manifest = Manifest.load(Path(state["output_dir"]))
+        fp = manifest.fingerprint(stage, state)
+        hit = manifest.reuse(stage, fp)
+        if hit is not None:
+            return hit
+        before = manifest.tree()
+        update = node(state)
+        manifest.record(stage, fp, update, before)
+        manifest.save()
+        return update
+
+    run.__name__ = getattr(node, "__name__", stage)
+    return run
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import ctypes
+import json
+import os
+from pathlib import Path
+import threading
+import time
+import tracemalloc
+from typing import Any
+
+_MB = 1024 * 1024
+
+# Allocations made by the tracing machinery itself are not the pipeline's.
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """A node went above the run's memory budget (``memory_budget_mb``)."""
+
+    def __init__(
+        self, node: str, used_mb: float, budget_mb: int, top: list[dict[str, Any]]
+    ) -> None:
+        self.node = node
+        self.used_mb = used_mb
+        self.budget_mb = budget_mb
+        self.top = top
+        msg = f"node {node!r} used {used_mb:.0f} MB, over the {budget_mb} MB memory budget"
+        if top:
+            msg += f" (largest live allocation: {top[0]['where']}, {top[0]['size_mb']:.1f} MB)"
+        super().__init__(msg)
+
+
+def rss_mb() -> float | None:
+    """Current resident set size of this process, or None where it cannot be read."""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / _MB
+
+
+def node_memory(top: int = 10) -> dict[str, Any]:
+    """Python allocations since tracing (re)started, with the call sites holding the most.
+
+    ``py_peak_mb`` is the high-water mark since the last ``tracemalloc.reset_peak()``;
+    ``top`` lists the source lines whose allocations are still alive right now.
+    """
+    if not tracemalloc.is_tracing():
+        return {"py_current_mb": 0.0, "py_peak_mb": 0.0, "rss_mb": rss_mb(), "top": []}
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    return {
+        "py_current_mb": current / _MB,
+        "py_peak_mb": peak / _MB,
+        "rss_mb": rss_mb(),
+        "top": [
+            {
+                "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_mb": stat.size / _MB,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:top]
+        ],
+    }
+
+
+def check_budget(node: str, entry: dict[str, Any], budget_mb: int) -> None:
+    """Raise :class:`MemoryBudgetExceeded` if ``entry`` (RSS or traced peak) exceeds the budget."""
+    if budget_mb <= 0:
+        return
+    used = max(float(entry.get("rss_mb") or 0.0), float(entry.get("py_peak_mb") or 0.0))
+    if used > budget_mb:
+        raise MemoryBudgetExceeded(node, used, budget_mb, list(entry.get("top", [])))
+
+
+class BudgetInterrupt(BaseException):
+    """Raised inside a node by :class:`BudgetWatch`; not an ``Exception`` so the node cannot catch it."""
+
+
+def _raise_in(thread_id: int, exc: type[BaseException]) -> bool:
+    """Schedule ``exc`` in another thread; False where that is not possible (not CPython)."""
+    set_async_exc = getattr(getattr(ctypes, "pythonapi", None), "PyThreadState_SetAsyncExc", None)
+    if set_async_exc is None:
+        return False
+    return bool(set_async_exc(ctypes.c_ulong(thread_id), ctypes.py_object(exc)) == 1)
+
+
+class BudgetWatch:
+    """Polls RSS and the traced peak while a node runs, and stops the node over budget.
+
+    Used as a context manager around the node call. Once usage exceeds
+    ``budget_mb``, ``used_mb`` is set and :class:`BudgetInterrupt` is raised in
+    the node's thread as soon as it runs Python code again (a single long C
+    call ends at its own pace); leaving the block swallows it. A budget of 0
+    watches nothing.
+    """
+
+    def __init__(self, budget_mb: int, interval: float = 0.05) -> None:
+        self.budget_mb = budget_mb
+        self.interval = interval
+        self.used_mb: float | None = None
+        self._pending = False
+        self._target = threading.get_ident()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._poll, name="memory-budget", daemon=True)
+
+    def __enter__(self) -> BudgetWatch:
+        if self.budget_mb > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *_: object) -> bool:
+        interrupted = exc_type is BudgetInterrupt
+        delivered = interrupted
+        while True:
+            try:
+                with self._lock:
+                    self._done.set()
+                if self._thread.is_alive():
+                    self._thread.join()
+                # A scheduled interrupt cannot be withdrawn; let it arrive here
+                # rather than in the caller.
+                deadline = time.monotonic() + 1.0
+                while self._pending and not delivered and time.monotonic() < deadline:
+                    time.sleep(0.001)
+                return interrupted
+            except BudgetInterrupt:
+                delivered = True
+
+    def _poll(self) -> None:
+        while not self._done.wait(self.interval):
+            used = rss_mb() or 0.0
+            if tracemalloc.is_tracing():
+                used = max(used, tracemalloc.get_traced_memory()[1] / _MB)
+            if used > self.budget_mb:
+                with self._lock:
+                    if not self._done.is_set():
+                        self.used_mb = used
+                        self._pending = _raise_in(self._target, BudgetInterrupt)
+                return
+
+
+def memory_table(nodes: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """The ``memory`` entries of ``metrics["nodes"]``, keyed by node."""
+    return {name: n["memory"] for name, n in nodes.items() if "memory" in n}
+
+
+def write_budget_report(
+    output_dir: Path, error: MemoryBudgetExceeded, memory: dict[str, Any]
+) -> Path:
+    """Record an aborted run in ``.reports/report.json`` in place of the critic's report."""
+    reports = output_dir / ".reports"
+    reports.mkdir(parents=True, exist_ok=True)
+    path = reports / "report.json"
+    report = f"aborted: {error}"
+    path.write_text(
+        json.dumps(
+            {
+                "metrics": {"memory_budget_mb": error.budget_mb, "memory_used_mb": error.used_mb},
+                "report": report,
+                "memory": memory,
+            },
+            indent=2,
+        )
+    )
+    return path
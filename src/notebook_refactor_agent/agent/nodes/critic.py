@@ -1,27 +1,31 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import hashlib
 import json
-import os
 from pathlib import Path
 import subprocess
-import sys
 import time
-from types import ModuleType
 from typing import Any
 
 from ...plan import Plan
-
-try:
-    import resource as _resource
-
-    res: ModuleType | None = _resource
-except Exception:
-    res = None
+from ...tools.sandbox_pool import default_pool, sandbox_env
+from ...tracing import span
+from ..memory import memory_table, node_memory
 
 
 def _run(cmd: list[str], cwd: Path) -> dict[str, Any]:
-    p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
-    return {"returncode": p.returncode, "stdout": p.stdout or "", "stderr": p.stderr or ""}
+    t0 = time.monotonic()
+    with span(" ".join(cmd), cat="subprocess"):
+        p = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    return {
+        "returncode": p.returncode,
+        "seconds": time.monotonic() - t0,
+        "stdout": p.stdout or "",
+        "stderr": p.stderr or "",
+    }
 
 
 def _get_plan_value(plan: Any, key: str, default: str) -> str:
@@ -39,64 +43,68 @@ def _safe_exec(
     safe: bool,
     module_rel: str = "src_pkg/module.py",
     mem_mb: int = 512,
+    import_only: bool = False,
 ) -> dict[str, Any]:
-    env = os.environ.copy()
-    if safe:
-        # Remove proxy env vars and signal "no network" to any cooperating code
-        for k in list(env.keys()):
-            lk = k.lower()
-            if lk.endswith("_proxy") or lk in ("http_proxy", "https_proxy", "no_proxy"):
-                env.pop(k, None)
-        env["NO_NETWORK"] = "1"
-
-    # Script imports the generated module (relative to out_dir) and calls run_all() if present.
+    env = sandbox_env(safe)
+
+    # Script imports the generated module (relative to out_dir) and calls run_all() if present,
+    # or, with ``import_only``, prints how long the cold import itself took.
     script = (
-        "import importlib.util, pathlib\n"
+        "import importlib.util, pathlib, time\n"
         f"p = (pathlib.Path({module_rel!r})).resolve()\n"
         "spec = importlib.util.spec_from_file_location('generated.module', p)\n"
         "assert spec and spec.loader\n"
         "m = importlib.util.module_from_spec(spec)\n"
+        "t0 = time.perf_counter()\n"
         "spec.loader.exec_module(m)\n"
-        "fn = getattr(m, 'run_all', None)\n"
-        "fn() if callable(fn) else None\n"
     )
+    if import_only:
+        script += "print(time.perf_counter() - t0)\n"
+    else:
+        script += "fn = getattr(m, 'run_all', None)\nfn() if callable(fn) else None\n"
+
+    # A warm, single-use worker runs the script; it applies the CPU/memory rlimits itself.
+    with span("import" if import_only else "exec", cat="subprocess"):
+        return default_pool().run(
+            out_dir,
+            script,
+            env,
+            timeout_secs,
+            cpu_secs=max(1, int(timeout_secs)) if safe else None,
+            mem_mb=int(mem_mb) if safe else None,
+        )
 
-    def _limits() -> None:
-        if res is None:
-            return
-        try:
-            cpu = max(1, int(timeout_secs))
-            res.setrlimit(res.RLIMIT_CPU, (cpu, cpu))
-        except Exception:
-            pass
-        try:
-            if hasattr(res, "RLIMIT_AS"):
-                mem = int(mem_mb) * 1024 * 1024
-                res.setrlimit(res.RLIMIT_AS, (mem, mem))
-        except Exception:
-            pass
 
-    t0 = time.monotonic()
+def _py_digest(out_dir: Path) -> str:
+    h = hashlib.sha256()
+    for f in sorted(out_dir.rglob("*.py")):
+        h.update(str(f).encode() + b"\0" + f.read_bytes())
+    return h.hexdigest()
+
+
+def _autofix(out_dir: Path) -> dict[str, dict[str, Any]]:
+    """Format with black, then ``ruff check --fix``; returns the results that double as checks.
+
+    ``ruff check --fix`` exits non-zero exactly when violations remain, so it is
+    the ruff check. Black's formatting pass is the black check too unless ruff
+    rewrote files after it, in which case it is left out and re-checked.
+    """
+    black = _run(["black", "."], out_dir)
+    before = _py_digest(out_dir)
+    ruff = _run(["ruff", "check", "--fix", "."], out_dir)
+    if _py_digest(out_dir) != before:
+        return {"ruff": ruff}
+    return {"black": black, "ruff": ruff}
+
+
+def _import_seconds(result: dict[str, Any]) -> float | None:
+    """Cold import time printed by an ``import_only`` run, or None if the import failed."""
+    if result["returncode"] != 0:
+        return None
     try:
-        proc = subprocess.run(
-            [sys.executable, "-I", "-c", script],
-            cwd=out_dir,
-            capture_output=True,
-            text=True,
-            timeout=timeout_secs,
-            env=env,
-            preexec_fn=_limits if safe and res is not None else None,
-        )
-        dt = time.monotonic() - t0
-        return {
-            "returncode": proc.returncode,
-            "seconds": dt,
-            "stdout": proc.stdout or "",
-            "stderr": proc.stderr or "",
-        }
-    except subprocess.TimeoutExpired:
-        dt = time.monotonic() - t0
-        return {"returncode": 124, "seconds": dt, "stdout": "", "stderr": ""}
+        return float(result["stdout"].strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return None
 
 
 def critic_node(state: dict[str, Any]) -> dict[str, Any]:
@@ -109,15 +117,34 @@ def critic_node(state: dict[str, Any]) -> dict[str, Any]:
     module_rel = _get_plan_value(plan_any, "module_path", "src_pkg/module.py")
     tests_rel = _get_plan_value(plan_any, "tests_path", "tests/test_module.py")
 
-    # Run tools relative to the output dir; pass "." (not the absolute out path).
-    r_pytest = _run(["pytest", "-q", "tests"], cwd=out)
-    r_ruff = _run(["ruff", "check", "."], cwd=out)
-    r_black = _run(["black", "--check", "."], cwd=out)
-    r_mypy = _run(["mypy", "."], cwd=out)
-
     timeout_secs = int(state.get("timeout_secs", 60))
     safe = bool(state.get("safe", True))
-    r_exec = _safe_exec(out, timeout_secs, safe, module_rel=module_rel)
+
+    # The tools are independent, so start them together; each one is a blocking
+    # subprocess, so threads are enough. Run relative to the output dir ("." not abs path).
+    tasks: dict[str, Callable[[], dict[str, Any]]] = {
+        "pytest": partial(_run, ["pytest", "-q", "tests"], out),
+        "ruff": partial(_run, ["ruff", "check", "."], out),
+        "black": partial(_run, ["black", "--check", "."], out),
+        "mypy": partial(_run, ["mypy", "."], out),
+        "exec": partial(_safe_exec, out, timeout_secs, safe, module_rel=module_rel),
+        "import": partial(
+            _safe_exec, out, timeout_secs, safe, module_rel=module_rel, import_only=True
+        ),
+    }
+    jobs = max(1, int(state.get("critic_jobs", 0) or len(tasks)))
+    t0 = time.monotonic()
+    fixed = _autofix(out) if state.get("autofix") else {}
+    with ThreadPoolExecutor(max_workers=min(jobs, len(tasks))) as ex:
+        futures = {name: ex.submit(fn) for name, fn in tasks.items() if name not in fixed}
+        results = {name: fixed[name] if name in fixed else futures[name].result() for name in tasks}
+    critic_seconds = time.monotonic() - t0
+    r_pytest = results["pytest"]
+    r_ruff = results["ruff"]
+    r_black = results["black"]
+    r_mypy = results["mypy"]
+    r_exec = results["exec"]
+    r_import = results["import"]
 
     # Write tool outputs
     (reports / "pytest.txt").write_text(r_pytest["stdout"] + r_pytest["stderr"])
@@ -129,6 +156,7 @@ def critic_node(state: dict[str, Any]) -> dict[str, Any]:
     )
 
     # Metrics + JSON report
+    tool_seconds = {name: float(r.get("seconds", 0.0)) for name, r in results.items()}
     metrics = {
         "pytest_returncode": int(r_pytest["returncode"]),
         "ruff_returncode": int(r_ruff["returncode"]),
@@ -138,15 +166,21 @@ def critic_node(state: dict[str, Any]) -> dict[str, Any]:
         "exec_seconds": float(r_exec.get("seconds", 0.0)),
         "exec_stdout_len": len(r_exec.get("stdout", "")),
         "exec_stderr_len": len(r_exec.get("stderr", "")),
+        "import_seconds": _import_seconds(r_import),
+        "tool_seconds": tool_seconds,
+        "critic_seconds": critic_seconds,
     }
     report = (
         f"pytest={metrics['pytest_returncode']} ruff={metrics['ruff_returncode']} "
         f"black={metrics['black_returncode']} mypy={metrics['mypy_returncode']} "
         f"exec={metrics['exec_returncode']} secs={metrics['exec_seconds']:.2f}"
     )
-    (reports / "report.json").write_text(
-        json.dumps({"metrics": metrics, "report": report}, indent=2)
-    )
+    payload: dict[str, Any] = {"metrics": metrics, "report": report}
+    if state.get("trace_memory"):
+        # Earlier nodes come from the state; this one is measured up to here.
+        nodes = (state.get("metrics") or {}).get("nodes", {})
+        payload["memory"] = {**memory_table(nodes), "critic": node_memory()}
+    (reports / "report.json").write_text(json.dumps(payload, indent=2))
 
     # Human-friendly index
     base = out.resolve()
@@ -167,6 +201,12 @@ def critic_node(state: dict[str, Any]) -> dict[str, Any]:
     lines.append(f"- exec:   {(reports / 'exec.txt').resolve()}")
     lines.append(f"- json:   {(reports / 'report.json').resolve()}")
     lines.append("")
+    lines.append(f"Timings (critic wall {critic_seconds:.2f}s, jobs={min(jobs, len(tasks))})")
+    for name, secs in tool_seconds.items():
+        lines.append(f"- {name}: {secs:.2f}s")
+    if metrics["import_seconds"] is not None:
+        lines.append(f"Cold import of the generated module: {metrics['import_seconds']:.3f}s")
+    lines.append("")
     (reports / "index.txt").write_text("\n".join(lines) + "\n")
 
     return {"metrics": metrics, "report": report}
@@ -5,11 +5,12 @@ import json  # ← NEW
 from pathlib import Path
 from typing import Any, cast
 
-import nbformat
-
 from ...llm.cache import LLMCache
 from ...llm.factory import create_llm
 from ...llm.json_utils import extract_json
+from ...llm.tokens import estimate_messages_tokens, usage_record
+from ...tools.nb_model import load_notebook
+from ...tracing import span
 
 
 @dataclass
@@ -86,25 +87,18 @@ def planner_llm_node(state: dict[str, Any]) -> dict[str, Any]:
     cache_dir = Path(str(state.get("cache_dir", ".cache/nra")))
 
     # 1. Read the notebook & make a light-weight summary of the code cells
-    nb_path = Path(str(state["input_nb"]))
-    nb: Any = cast(Any, nbformat.read(str(nb_path), as_version=4))
+    nb = load_notebook(str(state["input_nb"]))
 
     cells_summary: list[dict[str, Any]] = []
-    code_ord = 0
-    for c in nb.get("cells", []):
-        if c.get("cell_type") != "code":
-            continue
-        src = str(c.get("source", "")) or ""
-        head = [ln for ln in src.splitlines()[:2]]
+    for code_ord, c in enumerate(nb.code_cells):
         cells_summary.append(
             {
-                "id": c.get("id", code_ord),
+                "id": c.cell_id if c.cell_id is not None else code_ord,
                 "type": "code",
-                "head": head,
-                "lines": len(src.splitlines()),
+                "head": c.head(2),
+                "lines": c.line_count,
             }
         )
-        code_ord += 1
 
     # 2. Craft the messages for the LLM
     system_prompt = _read_prompt(
@@ -125,7 +119,7 @@ def planner_llm_node(state: dict[str, Any]) -> dict[str, Any]:
     ]
 
     # 3. Call (or cache) the LLM
-    cache = LLMCache(cache_dir)
+    cache = LLMCache(cache_dir, max_bytes=int(state.get("cache_max_mb", 512)) * 1024 * 1024)
     cache_key = json.dumps({"sp": system_prompt[:80], "payload": user_payload}, sort_keys=True)
     cached = cache.get(provider, model, cache_key)
 
@@ -133,15 +127,22 @@ def planner_llm_node(state: dict[str, Any]) -> dict[str, Any]:
         text, meta = cached
     else:
         llm = create_llm(provider)
-        text, meta = llm.chat(
-            messages=messages,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
+        with span("llm.chat", cat="llm", node="planner", model=model):
+            text, meta = llm.chat(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
         cache.put(provider, model, cache_key, text, meta)
         state.setdefault("llm_calls", []).append(
-            {"node": "planner", "provider": provider, "model": model, "meta": meta}
+            {
+                "node": "planner",
+                "provider": provider,
+                "model": model,
+                "meta": meta,
+                **usage_record(estimate_messages_tokens(messages, model), meta),
+            }
         )
 
     # 4. Parse the JSON returned by the LLM -------------------------------- #
@@ -1,160 +1,422 @@
 from __future__ import annotations
 
 import ast
+from collections.abc import Iterator
+from dataclasses import dataclass, field
 from pathlib import Path
 import re
-from typing import Any, cast
+import sys
+import tokenize
+from typing import Any
 
-import nbformat
+from ...tools.dataflow import (
+    TRY_NODES,
+    CellFlow,
+    DefUseGraph,
+    cell_deps,
+    cell_flow,
+    def_use_graph,
+)
+from ...tools.nb_model import load_notebook
+from .refactor_runtime import (
+    MEMO_IMPORTS,
+    MEMO_RUNTIME,
+    PARALLEL_IMPORTS,
+    PARALLEL_RUNTIME,
+    source_hash,
+)
 
+_DEF_RE = re.compile(r"^def\s+([A-Za-z_][A-Za-z0-9_]*)\s*\((.*)\)\s*:\s*$")
+_ANY = ast.Name(id="Any", ctx=ast.Load())
 
+
+@dataclass(slots=True)
+class _Cell:
+    """One cell, split into hoisted imports, body lines and top-level bound names."""
+
+    body: list[str] = field(default_factory=list)
+    imports: list[str] = field(default_factory=list)
+    future: list[str] = field(default_factory=list)
+    names: dict[str, None] = field(default_factory=dict)
+    # with lazy imports: bound name -> imports moved into the functions that read it
+    lazy: dict[str, list[str]] = field(default_factory=dict)
+    reads: set[str] | None = None  # every name the cell loads; None = unknown
+    flow: CellFlow | None = None
+    needs_any: bool = False
+    has_code: bool = True
+
+
+# --------------------------------------------------------------------------- #
+# line-based fallback for cells that are not valid Python (magics, shell, …)  #
+# --------------------------------------------------------------------------- #
+def _is_import_line(s: str) -> bool:
+    t = s.strip()
+    return t.startswith("import ") or t.startswith("from ")
+
+
+def _annotate_param(tok: str) -> str:
+    stars = len(tok) - len(tok.lstrip("*"))
+    inner = tok[stars:]
+    if "=" in inner:
+        left, right = inner.split("=", 1)
+        return f"{'*' * stars}{left.strip()}: Any={right.strip()}"
+    return f"{'*' * stars}{inner.strip()}: Any"
+
+
+def _annotate_def_line(line: str) -> tuple[str, bool]:
+    s = line.lstrip()
+    indent = line[: len(line) - len(s)]
+    m = _DEF_RE.match(s)
+    if not m:
+        return line, False
+    name, params = m.group(1), m.group(2)
+    new_params: list[str] = []
+    for tok in (p.strip() for p in params.split(",")):
+        if not tok:
+            continue
+        if ":" in tok or tok == "*":
+            new_params.append(tok)
+        else:
+            new_params.append(_annotate_param(tok))
+    return f"{indent}def {name}({', '.join(new_params)}) -> Any:", True
+
+
+def _scan_lines(src: str) -> _Cell:
+    cell = _Cell()
+    for ln in src.splitlines():
+        if _is_import_line(ln):
+            cell.imports.append(ln.strip())
+        elif ln.strip() != "":
+            nln, used_any = _annotate_def_line(ln)
+            cell.needs_any |= used_any
+            cell.body.append(nln)
+    return cell
+
+
+# --------------------------------------------------------------------------- #
+# AST engine – one parse per cell                                             #
+# --------------------------------------------------------------------------- #
+def _bind_targets(target: ast.expr, names: dict[str, None]) -> None:
+    if isinstance(target, ast.Name):
+        names[target.id] = None
+    elif isinstance(target, ast.Tuple | ast.List):
+        for elt in target.elts:
+            _bind_targets(elt, names)
+    elif isinstance(target, ast.Starred):
+        _bind_targets(target.value, names)
+
+
+def _collect_binds(stmts: list[ast.stmt], names: dict[str, None]) -> None:
+    """Names assigned at module level, including inside if/for/while/with/try blocks.
+
+    Function and class bodies are separate scopes and are not entered.
+    """
+    for st in stmts:
+        if isinstance(st, ast.Assign):
+            for tgt in st.targets:
+                _bind_targets(tgt, names)
+        elif isinstance(st, ast.AnnAssign):
+            if st.value is not None:
+                _bind_targets(st.target, names)
+        elif isinstance(st, ast.AugAssign):
+            _bind_targets(st.target, names)
+        elif isinstance(st, ast.If | ast.For | ast.AsyncFor | ast.While):
+            _collect_binds(st.body, names)
+            _collect_binds(st.orelse, names)
+        elif isinstance(st, ast.With | ast.AsyncWith):
+            _collect_binds(st.body, names)
+        elif isinstance(st, TRY_NODES):
+            for block in (st.body, st.orelse, st.finalbody):
+                _collect_binds(block, names)
+            for handler in st.handlers:
+                _collect_binds(handler.body, names)
+
+
+def _iter_defs(stmts: list[ast.stmt]) -> Iterator[ast.FunctionDef | ast.AsyncFunctionDef]:
+    """Every (async) function def in ``stmts``, descending only through statement blocks."""
+    for st in stmts:
+        if isinstance(st, ast.FunctionDef | ast.AsyncFunctionDef):
+            yield st
+        for attr in ("body", "orelse", "finalbody"):
+            block = getattr(st, attr, None)
+            if isinstance(block, list):
+                yield from _iter_defs(block)
+        for sub in getattr(st, "handlers", None) or getattr(st, "cases", None) or ():
+            yield from _iter_defs(sub.body)
+
+
+def _header_end(lines: list[str], node: ast.FunctionDef | ast.AsyncFunctionDef) -> int | None:
+    """0-based index of the line holding the ``:`` that closes ``node``'s signature."""
+    start = node.lineno - 1
+    readline = iter(lines[start:]).__next__
+    depth = 0
+    try:
+        for tok in tokenize.generate_tokens(readline):
+            if tok.type != tokenize.OP:
+                continue
+            if tok.string in "([{":
+                depth += 1
+            elif tok.string in ")]}":
+                depth -= 1
+            elif tok.string == ":" and depth == 0:
+                return start + tok.start[0] - 1
+    except (tokenize.TokenError, IndentationError, StopIteration):
+        return None
+    return None
+
+
+def _annotated_header(node: ast.FunctionDef | ast.AsyncFunctionDef, indent: str) -> str:
+    args = node.args
+    for a in (*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg):
+        if a is not None and a.annotation is None:
+            a.annotation = _ANY
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    return f"{indent}{prefix} {node.name}({ast.unparse(args)}) -> Any:"
+
+
+def _is_heavy(st: ast.Import | ast.ImportFrom) -> bool:
+    """Absolute import of a third-party (non-stdlib) module."""
+    if isinstance(st, ast.ImportFrom):
+        return st.level == 0 and (st.module or "").split(".")[0] not in sys.stdlib_module_names
+    return any(a.name.split(".")[0] not in sys.stdlib_module_names for a in st.names)
+
+
+def _with_names(st: ast.Import | ast.ImportFrom, names: list[ast.alias]) -> ast.stmt:
+    if isinstance(st, ast.ImportFrom):
+        return ast.ImportFrom(module=st.module, names=names, level=st.level)
+    return ast.Import(names=names)
+
+
+def _scan_ast(src: str, tree: ast.Module, dataflow: bool, lazy: bool = False) -> _Cell:
+    cell = _Cell()
+    lines = src.splitlines(keepends=True)
+    # line index -> replacement (None drops the line)
+    edits: dict[int, str | None] = {}
+
+    code_stmts = 0
+    for st in tree.body:
+        if isinstance(st, ast.Import | ast.ImportFrom):
+            text = ast.unparse(st)
+            if isinstance(st, ast.ImportFrom) and st.module == "__future__":
+                cell.future.append(text)
+            elif lazy and _is_heavy(st) and not any(a.name == "*" for a in st.names):
+                # One import per name, so ``import a.b`` and ``import a`` both survive.
+                for alias in st.names:
+                    bound = alias.asname or alias.name.split(".")[0]
+                    single = ast.unparse(_with_names(st, [alias]))
+                    cell.lazy.setdefault(bound, []).append(single)
+            else:
+                cell.imports.append(text)
+            end = st.end_lineno or st.lineno
+            for i in range(st.lineno - 1, end):
+                edits[i] = None
+        else:
+            code_stmts += 1
+    cell.has_code = code_stmts > 0
+    _collect_binds(tree.body, cell.names)
+    if dataflow:
+        cell.flow = cell_flow(tree)
+    if lazy:
+        cell.reads = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}
+
+    # Annotate signatures that have no return annotation (same rule as the line-based path).
+    for node in _iter_defs(tree.body) if "def" in src else ():
+        if node.returns:
+            continue
+        header_end = _header_end(lines, node)
+        if header_end is None or node.body[0].lineno - 1 <= header_end:
+            continue  # one-line ``def f(): ...`` is left alone
+        first = lines[node.lineno - 1]
+        indent = first[: len(first) - len(first.lstrip())]
+        edits[node.lineno - 1] = _annotated_header(node, indent)
+        for i in range(node.lineno, header_end + 1):
+            edits[i] = None
+        cell.needs_any = True
+
+    for i, ln in enumerate(lines):
+        if i in edits:
+            new = edits[i]
+            if new is not None:
+                cell.body.append(new)
+        else:
+            cell.body.append(ln.rstrip("\r\n"))
+    while cell.body and not cell.body[0].strip():
+        cell.body.pop(0)
+    while cell.body and not cell.body[-1].strip():
+        cell.body.pop()
+    return cell
+
+
+def _scan_cell(src: str, dataflow: bool = False, lazy: bool = False) -> _Cell:
+    try:
+        tree = ast.parse(src)
+    except SyntaxError:
+        return _scan_lines(src)
+    return _scan_ast(src, tree, dataflow, lazy)
+
+
+def _local_imports(lazy: dict[str, dict[str, None]], cells: list[_Cell]) -> list[str]:
+    """Deferred imports the given cells read, as indented lines for a function body."""
+    needed: dict[str, None] = {}
+    for c in cells:
+        for name, texts in lazy.items():
+            if c.reads is None or name in c.reads:
+                needed.update(texts)
+    return [f"    {text}" for text in needed]
+
+
+def _indent(body: list[str]) -> list[str]:
+    return ["    " + ln if ln.strip() else "" for ln in body]
+
+
+def _return_annot(names: list[str]) -> str:
+    if len(names) == 0:
+        return "None"
+    if len(names) == 1:
+        return "object"
+    return "tuple[" + ", ".join(["object"] * len(names)) + "]"
+
+
+def _return_line(names: list[str]) -> list[str]:
+    return [f"    return {', '.join(names)}"] if names else []
+
+
+def _parallel_run_all(cells: list[_Cell], graph: DefUseGraph) -> list[str]:
+    """``CELL_DEPS`` plus a ``run_all`` that hands one step per cell to ``_run_dag``.
+
+    Each step reads its inputs from, and stores its outputs in, a shared dict
+    keyed ``name@cell`` so concurrent cells never see each other's rebinding.
+    """
+    deps = cell_deps([c.flow for c in cells], graph)
+    lines = ["CELL_DEPS: dict[str, tuple[str, ...]] = {"]
+    for idx, before in enumerate(deps):
+        items = ", ".join(f'"cell_{d}"' for d in before) + ("," if len(before) == 1 else "")
+        lines.append(f'    "cell_{idx}": ({items}),')
+    lines.extend(["}", "", "def run_all(max_workers: int | None = None) -> None:"])
+    lines.append("    v: dict[str, Any] = {}")
+    for idx in range(len(cells)):
+        args = ", ".join(f'v["{n}@{src}"]' for n, src in graph.inputs[idx].items())
+        call = f"cell_{idx}({args})"
+        outs = ", ".join(f'v["{n}@{idx}"]' for n in graph.outputs[idx])
+        lines.extend(["", f"    def _cell_{idx}() -> None:"])
+        lines.append(f"        {outs} = {call}" if outs else f"        {call}")
+    lines.extend(["", "    steps: dict[str, Callable[[], None]] = {"])
+    lines.extend(f'        "cell_{idx}": _cell_{idx},' for idx in range(len(cells)))
+    lines.extend(["    }", "    _run_dag(steps, CELL_DEPS, max_workers)", ""])
+    return lines
+
+
+# --------------------------------------------------------------------------- #
+# node                                                                        #
+# --------------------------------------------------------------------------- #
 def refactor_node(state: dict[str, Any]) -> dict[str, Any]:
     input_nb = state["input_nb"]
     plan = state["plan"]
     mode = str(state.get("mode", "run-all"))
-    nb: Any = cast(Any, nbformat.read(str(input_nb), as_version=4))
-
-    def is_import_line(s: str) -> bool:
-        t = s.strip()
-        return t.startswith("import ") or t.startswith("from ")
-
-    def annotate_def_line(line: str) -> tuple[str, bool]:
-        s = line.lstrip()
-        indent = line[: len(line) - len(s)]
-        m = re.match(r"^def\s+([A-Za-z_][A-Za-z0-9_]*)\s*\((.*)\)\s*:\s*$", s)
-        if not m:
-            return line, False
-        name, params = m.group(1), m.group(2)
-        tokens = [p.strip() for p in params.split(",")] if params.strip() else []
-        new_params: list[str] = []
-        used_any = False
-        for tok in tokens:
-            if not tok:
-                continue
-            if ":" in tok:
-                new_params.append(tok)
-                continue
-            if tok.startswith("**"):
-                inner = tok[2:]
-                if "=" in inner:
-                    left, right = inner.split("=", 1)
-                    new_params.append(f"**{left.strip()}: Any={right.strip()}")
-                else:
-                    new_params.append(f"**{inner.strip()}: Any")
-                used_any = True
-            elif tok.startswith("*"):
-                inner = tok[1:]
-                if inner == "":
-                    new_params.append(tok)
-                else:
-                    if "=" in inner:
-                        left, right = inner.split("=", 1)
-                        new_params.append(f"*{left.strip()}: Any={right.strip()}")
-                    else:
-                        new_params.append(f"*{inner.strip()}: Any")
-                    used_any = True
-            else:
-                if "=" in tok:
-                    left, right = tok.split("=", 1)
-                    new_params.append(f"{left.strip()}: Any={right.strip()}")
-                else:
-                    new_params.append(f"{tok}: Any")
-                used_any = True
-        return f"{indent}def {name}({', '.join(new_params)}) -> Any:", used_any
-
-    collected_imports: list[str] = []
-    cell_bodies: list[list[str]] = []
-    needs_any = False
-    for item in plan["functions"]:
-        cid = int(item["cell_id"])
-        src = str(nb.cells[cid].get("source", ""))
-        body_lines: list[str] = []
-        for ln in src.splitlines():
-            if is_import_line(ln):
-                collected_imports.append(ln.strip())
-            elif ln.strip() != "":
-                nln, used_any = annotate_def_line(ln)
-                if used_any:
-                    needs_any = True
-                body_lines.append(nln)
-        cell_bodies.append(body_lines)
-
-    def assigned_names(lines: list[str]) -> list[str]:
-        if not lines:
-            return []
-        try:
-            tree = ast.parse("\n".join(lines))
-        except SyntaxError:
-            return []
-        out: list[str] = []
-        for n in ast.walk(tree):
-            if isinstance(n, ast.Assign):
-                for tgt in n.targets:
-                    if isinstance(tgt, ast.Name) and tgt.id not in out:
-                        out.append(tgt.id)
-                    elif isinstance(tgt, ast.Tuple):
-                        for e in tgt.elts:
-                            if isinstance(e, ast.Name) and e.id not in out:
-                                out.append(e.id)
-            elif isinstance(n, ast.AnnAssign):
-                tgt = n.target
-                if isinstance(tgt, ast.Name) and tgt.id not in out:
-                    out.append(tgt.id)
-            elif isinstance(n, ast.AugAssign):
-                tgt = n.target
-                if isinstance(tgt, ast.Name) and tgt.id not in out:
-                    out.append(tgt.id)
-        return out
-
-    lines: list[str] = ["from __future__ import annotations", ""]
-    if needs_any:
+    memoize = bool(state.get("memoize", False))
+    parallel = bool(state.get("parallel", False))
+    if memoize and mode == "run-all":
+        mode = "both"  # memoization wraps cell functions, so emit them
+    if parallel:
+        mode = "both"  # the scheduler runs cell functions from run_all
+    nb = load_notebook(str(input_nb))
+
+    dataflow = mode in ("functions", "both")
+    lazy_imports = bool(state.get("lazy_imports", False))
+    cells = [
+        _scan_cell(nb.cells[int(item["cell_id"])].source, dataflow, lazy_imports)
+        for item in plan["functions"]
+    ]
+    future: dict[str, None] = {"from __future__ import annotations": None}
+    imports: dict[str, None] = {}
+    # Third-party imports are imported inside the functions that use them when lazy.
+    lazy: dict[str, dict[str, None]] = {}
+    for c in cells:
+        future.update(dict.fromkeys(c.future))
+        imports.update(dict.fromkeys(c.imports))
+        for name, texts in c.lazy.items():
+            lazy.setdefault(name, {}).update(dict.fromkeys(texts))
+    # An import nothing reads is there for its side effects (``import seaborn``): keep it.
+    for name in [n for n in lazy if not any(c.reads is None or n in c.reads for c in cells)]:
+        imports.update(lazy.pop(name))
+    if memoize:
+        imports.update(dict.fromkeys(MEMO_IMPORTS))
+    if parallel:
+        imports.update(dict.fromkeys(PARALLEL_IMPORTS))
+    needs_any = any(c.needs_any for c in cells)
+
+    # Functions take their upstream inputs as parameters and return only what
+    # later cells read, per the def-use graph.
+    graph = def_use_graph([c.flow for c in cells]) if dataflow else None
+    if graph is not None:
+        needs_any |= any(graph.inputs) or (parallel and bool(cells))
+
+    lines: list[str] = [*future, ""]
+    if needs_any and not memoize:  # the memo imports already bring in ``Any``
         lines.extend(["from typing import Any", ""])
-    if collected_imports:
-        lines.extend(sorted(set(collected_imports)))
+    if imports:
+        lines.extend(sorted(imports))
         lines.append("")
 
-    if mode in ("functions", "both"):
-        for idx, body in enumerate(cell_bodies):
-            names = assigned_names(body)
-            if len(names) == 0:
-                ret_annot = "None"
-            elif len(names) == 1:
-                ret_annot = "object"
-            else:
-                ret_annot = "tuple[" + ", ".join(["object"] * len(names)) + "]"
-            lines.append(f"def cell_{idx}() -> {ret_annot}:")
-            if body:
-                lines.extend("    " + ln for ln in body)
-                if len(names) == 1:
-                    lines.append(f"    return {names[0]}")
-                elif len(names) > 1:
-                    lines.append("    return " + ", ".join(names))
+    if memoize:
+        lines.extend([MEMO_RUNTIME, ""])
+    if parallel:
+        lines.extend([PARALLEL_RUNTIME, ""])
+
+    if graph is not None:
+        lines.append("CELL_OUTPUTS: dict[str, tuple[str, ...]] = {")
+        for idx, outs in enumerate(graph.outputs):
+            items = ", ".join(f'"{n}"' for n in outs) + ("," if len(outs) == 1 else "")
+            lines.append(f'    "cell_{idx}": ({items}),')
+        lines.extend(["}", ""])
+        for idx, c in enumerate(cells):
+            outs = graph.outputs[idx]
+            params = ", ".join(f"{n}: Any" for n in graph.inputs[idx])
+            fn = [f"def cell_{idx}({params}) -> {_return_annot(outs)}:"]
+            if c.body:
+                fn.extend(_local_imports(lazy, [c]))
+                fn.extend(_indent(c.body))
+                if not c.has_code:
+                    fn.append("    pass")
+                fn.extend(_return_line(outs))
             else:
-                lines.append("    pass")
+                fn.append("    pass")
+            # A memo hit returns the cached outputs without running the body, so a
+            # cell that may change one of its inputs in place is never memoized.
+            mutates = c.flow is not None and not set(c.flow.mutates).isdisjoint(graph.inputs[idx])
+            if memoize and not mutates:
+                # Keyed on the function's own source; upstream changes arrive via its inputs.
+                lines.append(f'@_memoize("{source_hash(chr(10).join(fn))}")')
+            lines.extend(fn)
             lines.append("")
 
-    if mode in ("run-all", "both"):
-        flat_body = [ln for body in cell_bodies for ln in body]
-        names_all = assigned_names(flat_body)
-        if len(names_all) == 0:
-            ret_annot = "None"
-        elif len(names_all) == 1:
-            ret_annot = "object"
-        else:
-            ret_annot = "tuple[" + ", ".join(["object"] * len(names_all)) + "]"
-        lines.append(f"def run_all() -> {ret_annot}:")
-        if mode == "run-all":
-            if flat_body:
-                lines.extend("    " + ln for ln in flat_body)
-                if len(names_all) == 1:
-                    lines.append(f"    return {names_all[0]}")
-                elif len(names_all) > 1:
-                    lines.append("    return " + ", ".join(names_all))
-            else:
+    if mode == "run-all":
+        names_all: dict[str, None] = {}
+        for c in cells:
+            names_all.update(c.names)
+        all_names = list(names_all)
+        lines.append(f"def run_all() -> {_return_annot(all_names)}:")
+        flat_body = [ln for c in cells for ln in c.body]
+        if flat_body:
+            lines.extend(_local_imports(lazy, cells))
+            lines.extend(_indent(flat_body))
+            if not any(c.has_code for c in cells):
                 lines.append("    pass")
+            lines.extend(_return_line(all_names))
         else:
-            for idx in range(len(cell_bodies)):
-                lines.append(f"    cell_{idx}()")
+            lines.append("    pass")
+        lines.append("")
+    elif parallel and graph is not None:
+        lines.extend(_parallel_run_all(cells, graph))
+    elif mode == "both" and graph is not None:
+        # Thread each cell's outputs into the cells that read them.
+        lines.append("def run_all() -> None:")
+        for idx in range(len(cells)):
+            call = f"cell_{idx}({', '.join(graph.inputs[idx])})"
+            outs = graph.outputs[idx]
+            lines.append(f"    {', '.join(outs)} = {call}" if outs else f"    {call}")
+        if not cells:
+            lines.append("    pass")
         lines.append("")
 
     files = {plan["module_path"]: "\n".join(lines) + "\n"}
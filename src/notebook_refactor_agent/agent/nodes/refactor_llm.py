@@ -1,15 +1,29 @@
 from __future__ import annotations
 
+import ast
+import hashlib
+import json
 from pathlib import Path
 import re
 import textwrap
 from typing import Any, cast
 
-import nbformat
-
+from ...llm.aio import chat_many
+from ...llm.cache import LLMCache
 from ...llm.factory import create_llm
+from ...llm.interfaces import LLMClient
+from ...llm.json_stream import FilesStreamParser
 from ...llm.json_utils import extract_json
+from ...llm.tokens import (
+    estimate_messages_tokens,
+    estimate_tokens,
+    input_budget,
+    pack_by_budget,
+    usage_record,
+)
 from ...plan import FunctionSpec, Plan
+from ...tools.nb_model import load_notebook
+from ...tracing import span
 
 # --------------------------------------------------------------------------- #
 # weak-JSON fallback – makes best-effort to salvage ``files`` blocks that     #
@@ -41,86 +55,372 @@ def _fallback_parse_files(raw: str) -> dict[str, str]:
     return out
 
 
+def _parse_files(text: str) -> tuple[dict[str, Any], dict[str, str]]:
+    obj = extract_json(text)
+    files: dict[str, str] = cast(dict[str, str], obj.get("files", {}))
+    # If we still have nothing, try weak parser before giving up
+    if not files:
+        files = _fallback_parse_files(text)
+    return obj, files
+
+
+def _user_message(
+    functions: list[FunctionSpec], frags: dict[int, str], part: tuple[int, int] | None = None
+) -> str:
+    head = (
+        "Re-organise the following notebook cell fragments into a clean package.\n"
+        "Respond **only** with JSON having keys: package_root, module_path, "
+        "tests_path, files (dict of path→code – escape with \\n so it's valid JSON).\n\n"
+    )
+    if part is not None:
+        head += (
+            f"This is part {part[0] + 1} of {part[1]} of the notebook; emit only the code "
+            "for these fragments, it will be merged with the other parts.\n\n"
+        )
+    return head + "\n".join(_fragment(spec, frags) for spec in functions)
+
+
+def _fragment(spec: FunctionSpec, frags: dict[int, str]) -> str:
+    return f"### {spec.fn_name} (cell {spec.cell_id})\n{frags.get(spec.cell_id, '')}"
+
+
+def _chunk_functions(functions: list[FunctionSpec], size: int) -> list[list[FunctionSpec]]:
+    if size <= 0 or len(functions) <= size:
+        return [functions]
+    return [functions[i : i + size] for i in range(0, len(functions), size)]
+
+
+def _chunk_by_tokens(
+    functions: list[FunctionSpec],
+    frags: dict[int, str],
+    system: dict[str, str],
+    model: str,
+    max_tokens: int,
+    token_budget: int,
+) -> list[list[FunctionSpec]]:
+    """Pack functions into requests whose prompt and expected output fit the token budget."""
+    base = estimate_messages_tokens(
+        [system, {"role": "user", "content": _user_message([], {}, (0, 2))}], model
+    )
+    return pack_by_budget(
+        functions,
+        lambda spec: estimate_tokens(_fragment(spec, frags) + "\n", model),
+        input_tokens=input_budget(model, max_tokens, token_budget),
+        output_tokens=max_tokens,
+        base_cost=base,
+    )
+
+
+def _hoistable_imports(tree: ast.Module) -> list[ast.Import | ast.ImportFrom]:
+    """Top-level imports that share no line with another statement (``import os; x = 1``)."""
+    taken: set[int] = set()
+    for st in tree.body:
+        if not isinstance(st, ast.Import | ast.ImportFrom):
+            taken.update(range(st.lineno, (st.end_lineno or st.lineno) + 1))
+    return [
+        st
+        for st in tree.body
+        if isinstance(st, ast.Import | ast.ImportFrom)
+        and taken.isdisjoint(range(st.lineno, (st.end_lineno or st.lineno) + 1))
+    ]
+
+
+def _merge_python(parts: list[str]) -> str:
+    """Concatenate module fragments, hoisting ``__future__`` and top-level imports once.
+
+    Imports are found with ``ast``, so multi-line ``from x import (...)`` moves
+    as a whole and indented or docstring lines that look like imports stay put.
+    A fragment that does not parse is kept as it is.
+    """
+    future: dict[str, None] = {}
+    imports: dict[str, None] = {}
+    bodies: list[str] = []
+    for part in parts:
+        lines = part.splitlines()
+        try:
+            tree = ast.parse(part)
+        except SyntaxError:
+            bodies.append(part.strip("\n"))
+            continue
+        hoisted: set[int] = set()
+        for st in _hoistable_imports(tree):
+            end = st.end_lineno or st.lineno
+            text = "\n".join(lines[st.lineno - 1 : end]).strip()
+            if isinstance(st, ast.ImportFrom) and st.module == "__future__":
+                future[text] = None
+            else:
+                imports[text] = None
+            hoisted.update(range(st.lineno - 1, end))
+        body = [ln for i, ln in enumerate(lines) if i not in hoisted]
+        bodies.append("\n".join(body).strip("\n"))
+    header = "\n".join([*future, *imports])
+    chunks = [header] if header else []
+    chunks.extend(b for b in bodies if b)
+    return "\n\n\n".join(chunks) + "\n"
+
+
+def _merge_files(per_chunk: list[dict[str, str]]) -> dict[str, str]:
+    """Merge chunk results in chunk order; same-path .py files are combined, others keep the first."""
+    parts: dict[str, list[str]] = {}
+    for files in per_chunk:
+        for rel, content in files.items():
+            parts.setdefault(rel, []).append(content)
+    merged: dict[str, str] = {}
+    for rel, contents in parts.items():
+        if len(contents) == 1:
+            merged[rel] = contents[0]
+        elif rel.endswith(".py"):
+            merged[rel] = _merge_python(contents)
+        else:
+            merged[rel] = contents[0]
+    return merged
+
+
+def _normalize_source(src: str) -> str:
+    """Cell source with line endings, trailing whitespace and edge blank lines normalised."""
+    lines = [ln.rstrip() for ln in src.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).strip("\n")
+
+
+def _chunk_cache_key(
+    functions: list[FunctionSpec],
+    frags: dict[int, str],
+    system: dict[str, str],
+    whole: bool,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    """Content address of one refactor request: its cells' normalised sources plus settings.
+
+    The part number, cell ids and function names are deliberately left out:
+    they shift when cells elsewhere in the notebook are added or removed, so a
+    chunk keeps its key and a hit is renamed with :func:`_rename_functions`.
+    """
+    cells = [
+        hashlib.sha256(_normalize_source(frags.get(spec.cell_id, "")).encode()).hexdigest()
+        for spec in functions
+    ]
+    return json.dumps(
+        {
+            "sp": system["content"],
+            "prompt": hashlib.sha256(_user_message([], {}).encode()).hexdigest()[:16],
+            "whole": whole,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "cells": cells,
+        },
+        sort_keys=True,
+    )
+
+
+def _rename_functions(files: dict[str, str], old: list[str], new: list[str]) -> dict[str, str]:
+    """Rewrite the function names of a cached reply to the ones the current plan uses."""
+    mapping = {o: n for o, n in zip(old, new, strict=True) if o != n}
+    if not mapping:
+        return files
+    names = re.compile(r"\b(" + "|".join(map(re.escape, mapping)) + r")\b")
+    return {rel: names.sub(lambda m: mapping[m.group()], code) for rel, code in files.items()}
+
+
+def _write_file(out_dir: Path, rel: str, content: str) -> None:
+    p = (out_dir / rel).resolve()
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(content)
+
+
+def _stream_files(
+    llm: LLMClient,
+    messages: list[dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    out_dir: Path,
+) -> tuple[str, dict[str, Any], dict[str, Any], dict[str, str]]:
+    """Stream a completion, writing each ``files`` entry to disk as soon as it is complete.
+
+    Stops the stream as soon as the reply can no longer be valid JSON. Unless the
+    ``files`` object had been closed by then, that is an error, and so is a stream
+    that simply ends early.
+    """
+    parser = FilesStreamParser()
+    meta: dict[str, Any] = {}
+    parts: list[str] = []
+    stream = llm.chat_stream(messages, model, temperature, max_tokens, meta_out=meta)
+    with span("llm.chat_stream", cat="llm", node="refactor", model=model) as args:
+        try:
+            for delta in stream:
+                parts.append(delta)
+                for rel, content in parser.feed(delta):
+                    _write_file(out_dir, rel, content)
+                if parser.failed:
+                    break
+        finally:
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+        args["files_streamed"] = len(parser.files)
+    text = "".join(parts)
+    if not parser.files_complete:
+        why = (
+            f"reply is no longer valid JSON ({parser.error})"
+            if parser.failed
+            else "reply ended before the `files` object was complete"
+        )
+        raise RuntimeError(
+            f"LLM stream aborted: {why}; {len(parser.files)} file(s) were complete.\n\n"
+            f"First 1 kB of raw response:\n{text[:1024]}"
+        )
+    return text, meta, parser.fields, parser.files
+
+
 # --------------------------------------------------------------------------- #
 # node                                                                        #
 # --------------------------------------------------------------------------- #
 def refactor_llm_node(state: dict[str, Any]) -> dict[str, Any]:
-    nb_path = Path(str(state["input_nb"]))
-    nb: Any = cast(Any, nbformat.read(str(nb_path), as_version=4))
+    nb = load_notebook(str(state["input_nb"]))
 
     plan: Plan = cast(Plan, state["plan"])
     functions: list[FunctionSpec] = plan.functions
 
     # Map ordinal code-cells to nb indices
-    code_cell_indices = [i for i, c in enumerate(nb.cells) if c.get("cell_type") == "code"]
+    code_cell_indices = nb.code_cell_indices
 
     frags: dict[int, str] = {}
     for spec in functions:
         cid = int(spec.cell_id)
         nb_idx = code_cell_indices[cid] if cid < len(code_cell_indices) else cid
         if 0 <= nb_idx < len(nb.cells):
-            frags[cid] = str(nb.cells[nb_idx].get("source", ""))
+            frags[cid] = nb.cells[nb_idx].source
 
     # ------------------------------------------------------------------ #
     provider = str(state.get("provider", ""))
     model = str(state.get("model", ""))
     temperature = float(state.get("temperature", 0.1))
     max_tokens = int(state.get("max_output_tokens", 4096))
+    chunk_size = int(state.get("refactor_chunk_size", 0) or 0)
+    concurrency = int(state.get("llm_concurrency", 4) or 4)
+    token_budget = int(state.get("token_budget", 0) or 0)
+    out_dir = Path(state["output_dir"])
 
-    user_msg = (
-        "Re-organise the following notebook cell fragments into a clean package.\n"
-        "Respond **only** with JSON having keys: package_root, module_path, "
-        "tests_path, files (dict of path→code – escape with \\n so it's valid JSON).\n\n"
-        + "\n".join(
-            f"### {spec.fn_name} (cell {spec.cell_id})\n{frags.get(spec.cell_id, '')}"
-            for spec in functions
+    # Either one request for the whole notebook, or one per chunk of functions
+    # sent concurrently so latency follows the largest chunk. Without an explicit
+    # chunk size, chunks are packed to the token budget when one is set or when
+    # the single prompt would not fit the model's context window.
+    system = {"role": "system", "content": "You are the **Refactor Agent**."}
+    if chunk_size <= 0 and (
+        token_budget > 0
+        or estimate_messages_tokens(
+            [system, {"role": "user", "content": _user_message(functions, frags)}], model
         )
-    )
+        > input_budget(model, max_tokens)
+    ):
+        chunks = _chunk_by_tokens(functions, frags, system, model, max_tokens, token_budget)
+    else:
+        chunks = _chunk_functions(functions, chunk_size)
+    whole = len(chunks) == 1
+    if whole:
+        requests = [[system, {"role": "user", "content": _user_message(functions, frags)}]]
+    else:
+        requests = [
+            [system, {"role": "user", "content": _user_message(c, frags, (i, len(chunks)))}]
+            for i, c in enumerate(chunks)
+        ]
 
-    llm = create_llm(provider)
-    text, meta = llm.chat(
-        [
-            {"role": "system", "content": "You are the **Refactor Agent**."},
-            {"role": "user", "content": user_msg},
-        ],
-        model=model,
-        temperature=temperature,
-        max_tokens=max_tokens,
+    # Unchanged chunks are served from a content-addressed cache; only the
+    # rest go back to the provider.
+    cache = LLMCache(
+        Path(str(state.get("cache_dir", ".cache/nra"))) / "refactor",
+        max_bytes=int(state.get("cache_max_mb", 512)) * 1024 * 1024,
     )
+    keys = [_chunk_cache_key(c, frags, system, whole, temperature, max_tokens) for c in chunks]
+    responses: list[tuple[str, dict[str, Any]] | None] = [
+        cache.get(provider, model, k) for k in keys
+    ]
+    cached = [r is not None for r in responses]
+    # A hit was answered for the names its cells had then; keep them out of the
+    # recorded metadata.
+    cached_names: dict[int, list[str]] = {}
+    for i, r in enumerate(responses):
+        if r is not None and "fn_names" in r[1]:
+            meta = dict(r[1])
+            cached_names[i] = meta.pop("fn_names")
+            responses[i] = (r[0], meta)
+    misses = [i for i, r in enumerate(responses) if r is None]
 
-    obj = extract_json(text)
-    files: dict[str, str] = cast(dict[str, str], obj.get("files", {}))
-
-    # If we still have nothing, try weak parser before giving up
-    if not files:
-        files = _fallback_parse_files(text)
-
-    if not files:
-        raise RuntimeError(
-            "LLM did not return any parsable `files`.\n\n"
-            f"First 1 kB of raw response:\n{text[:1024]}"
+    llm = create_llm(provider) if misses else None
+    streamed: dict[int, tuple[dict[str, Any], dict[str, str]]] = {}
+    if llm is not None and whole:
+        if state.get("stream") and hasattr(llm, "chat_stream"):
+            text, meta, fields, files = _stream_files(
+                llm, requests[0], model, temperature, max_tokens, out_dir
+            )
+            responses[0] = (text, meta)
+            if files:
+                streamed[0] = (fields, files)
+        else:
+            with span("llm.chat", cat="llm", node="refactor", model=model):
+                responses[0] = llm.chat(
+                    requests[0], model=model, temperature=temperature, max_tokens=max_tokens
+                )
+    elif llm is not None:
+        fresh = chat_many(
+            llm, [requests[i] for i in misses], model, temperature, max_tokens, concurrency
         )
+        for i, resp in zip(misses, fresh, strict=True):
+            responses[i] = resp
+
+    replies = [r for r in responses if r is not None]
+    objs: list[dict[str, Any]] = []
+    per_chunk: list[dict[str, str]] = []
+    for i, (text, meta) in enumerate(replies):
+        obj, chunk_files = streamed[i] if i in streamed else _parse_files(text)
+        names = [spec.fn_name for spec in chunks[i]]
+        if i in cached_names:
+            chunk_files = _rename_functions(chunk_files, cached_names[i], names)
+        if not chunk_files:
+            where = f" for chunk {i + 1}/{len(chunks)}" if len(chunks) > 1 else ""
+            raise RuntimeError(
+                f"LLM did not return any parsable `files`{where}.\n\n"
+                f"First 1 kB of raw response:\n{text[:1024]}"
+            )
+        if not cached[i]:
+            # A streamed reply may carry junk after the closed ``files`` object;
+            # cache what was parsed so a hit always parses again.
+            reply = json.dumps({**obj, "files": chunk_files}) if i in streamed else text
+            cache.put(provider, model, keys[i], reply, {**meta, "fn_names": names})
+        objs.append(obj)
+        per_chunk.append(chunk_files)
+    files = _merge_files(per_chunk)
 
     # ------------------------------------------------------------------ #
     # 1. Resolve target paths
+    obj = objs[0]
     package_root = str(obj.get("package_root", plan.package_root))
     module_path = str(obj.get("module_path", plan.module_path))
     tests_path = str(obj.get("tests_path", plan.tests_path))
 
-    # 2. Persist the files
-    out_dir = Path(state["output_dir"])
-    for rel, content in files.items():
-        p = (out_dir / rel).resolve()
-        p.parent.mkdir(parents=True, exist_ok=True)
-        p.write_text(content)
+    # 2. Persist the files (streamed ones are already on disk)
+    if not streamed:
+        for rel, content in files.items():
+            _write_file(out_dir, rel, content)
 
     # 3. Record artefacts & bookkeeping
     state.setdefault("artifacts", {}).update(
         {"package_root": package_root, "module_path": module_path, "tests_path": tests_path}
     )
-    state.setdefault("llm_calls", []).append(
-        {"node": "refactor", "provider": provider, "model": model, "meta": meta}
-    )
+    calls = state.setdefault("llm_calls", [])
+    for i, (_text, meta) in enumerate(replies):
+        call: dict[str, Any] = {
+            "node": "refactor",
+            "provider": provider,
+            "model": model,
+            "meta": meta,
+            "cached": cached[i],
+            **usage_record(estimate_messages_tokens(requests[i], model), meta),
+        }
+        if len(chunks) > 1:
+            call["chunk"] = i
+        calls.append(call)
 
     state["report"] = f"Refactor completed – wrote {len(files)} file(s)."
     return state
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+import shutil
+
+# Directory (below the output dir) where memoized cell results are pickled.
+MEMO_DIR_NAME = ".nra_memo"
+
+# Imports the memo runtime needs; merged into the generated module's import block.
+MEMO_IMPORTS: tuple[str, ...] = (
+    "from collections.abc import Callable",
+    "import functools",
+    "import hashlib",
+    "import os",
+    "import pathlib",
+    "import pickle",
+    "from typing import Any, ParamSpec, TypeVar",
+)
+
+# Emitted verbatim into generated modules built with ``--memoize``. Kept free of
+# any dependency on this package so the generated code stays standalone.
+MEMO_RUNTIME = '''\
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+_MEMO_DIR = pathlib.Path(
+    os.environ.get("NRA_MEMO_DIR")
+    or pathlib.Path(__file__).resolve().parents[1] / "__MEMO_DIR__"
+)
+_MEMO_MAX_BYTES = int(float(os.environ.get("NRA_MEMO_MAX_MB") or 1024) * 1024 * 1024)
+
+
+def _memo_fingerprint(args: tuple[object, ...], kwargs: dict[str, object]) -> str | None:
+    try:
+        data = pickle.dumps((args, sorted(kwargs.items())), protocol=4)
+    except Exception:
+        return None
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _memo_evict() -> None:
+    entries: list[tuple[float, int, pathlib.Path]] = []
+    for p in _MEMO_DIR.glob("*.pkl"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in entries)
+    for _, size, p in sorted(entries):
+        if total <= _MEMO_MAX_BYTES:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+def _memoize(source_hash: str) -> Callable[[Callable[_P, _T]], Callable[_P, _T]]:
+    """Cache results on disk, keyed by the function's source hash and its pickled inputs."""
+
+    def decorate(fn: Callable[_P, _T]) -> Callable[_P, _T]:
+        @functools.wraps(fn)
+        def wrapper(*args: _P.args, **kwargs: _P.kwargs) -> _T:
+            fp = _memo_fingerprint(args, kwargs)
+            if fp is None:
+                return fn(*args, **kwargs)
+            path = _MEMO_DIR / f"{fn.__name__}-{source_hash}-{fp}.pkl"
+            try:
+                with path.open("rb") as fh:
+                    value: _T = pickle.load(fh)
+                os.utime(path)
+                return value
+            except Exception:
+                pass
+            value = fn(*args, **kwargs)
+            try:
+                data = pickle.dumps(value, protocol=4)
+            except Exception:
+                return value
+            _MEMO_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            _memo_evict()
+            return value
+
+        return wrapper
+
+    return decorate
+'''.replace("__MEMO_DIR__", MEMO_DIR_NAME)
+
+# Imports and scheduler emitted into modules generated with ``--parallel``.
+PARALLEL_IMPORTS: tuple[str, ...] = (
+    "from collections.abc import Callable",
+    "from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait",
+    "import os",
+)
+
+PARALLEL_RUNTIME = '''\
+def _run_dag(
+    steps: dict[str, Callable[[], None]],
+    deps: dict[str, tuple[str, ...]],
+    max_workers: int | None = None,
+) -> None:
+    """Run every step once the steps it depends on are done; independent ones concurrently."""
+    waiting = {name: set(deps.get(name, ())) for name in steps}
+    running: dict[Future[None], str] = {}
+    workers = max_workers or int(os.environ.get("NRA_WORKERS") or 0)
+    workers = workers or min(8, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while waiting or running:
+            for name in [n for n, d in waiting.items() if not d]:
+                del waiting[name]
+                running[pool.submit(steps[name])] = name
+            if not running:
+                raise RuntimeError(f"unsatisfiable cell dependencies: {sorted(waiting)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                finished = running.pop(fut)
+                fut.result()  # re-raise the cell's error; queued cells never start
+                for pending in waiting.values():
+                    pending.discard(finished)
+'''
+
+
+def source_hash(source: str) -> str:
+    """Short, stable hash of a generated function's source, used in memo keys."""
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def clear_memo(output_dir: Path) -> tuple[int, int]:
+    """Delete the memo cache of a generated package; returns ``(files, bytes)`` removed."""
+    memo = output_dir / MEMO_DIR_NAME
+    if not memo.is_dir():
+        return 0, 0
+    files = [p for p in memo.rglob("*") if p.is_file()]
+    size = sum(p.stat().st_size for p in files)
+    shutil.rmtree(memo)
+    return len(files), size
@@ -6,6 +6,8 @@ from typing import Any
 from ...llm.cache import LLMCache
 from ...llm.factory import create_llm
 from ...llm.json_utils import extract_json
+from ...llm.tokens import estimate_messages_tokens, usage_record
+from ...tracing import span
 
 
 def test_writer_llm_node(state: dict[str, Any]) -> dict[str, Any]:
@@ -30,19 +32,24 @@ def test_writer_llm_node(state: dict[str, Any]) -> dict[str, Any]:
     max_tokens = int(state.get("max_output_tokens", 2048))
     cache_dir = Path(state.get("cache_dir", ".cache/nra"))
 
-    cache = LLMCache(cache_dir / "tests")
+    cache = LLMCache(
+        cache_dir / "tests", max_bytes=int(state.get("cache_max_mb", 512)) * 1024 * 1024
+    )
     key_prompt = f"{sp_text}\n{user_payload}"
     cached = cache.get(provider, model, key_prompt)
 
+    messages = [
+        {"role": "system", "content": sp_text},
+        {"role": "user", "content": str(user_payload)},
+    ]
     if cached:
         text, meta = cached
     else:
-        messages = [
-            {"role": "system", "content": sp_text},
-            {"role": "user", "content": str(user_payload)},
-        ]
         llm = create_llm(provider)
-        text, meta = llm.chat(messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        with span("llm.chat", cat="llm", node="test_writer", model=model):
+            text, meta = llm.chat(
+                messages, model=model, temperature=temperature, max_tokens=max_tokens
+            )
         cache.put(provider, model, key_prompt, text, meta)
 
     tests = extract_json(text)
@@ -59,6 +66,8 @@ def test_writer_llm_node(state: dict[str, Any]) -> dict[str, Any]:
             "provider": provider,
             "model": meta.get("model", model),
             "meta": meta,
+            "cached": cached is not None,
+            **usage_record(estimate_messages_tokens(messages, model), meta),
         }
     )
 
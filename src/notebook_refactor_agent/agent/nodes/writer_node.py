@@ -10,6 +10,7 @@ def test_writer_node(state: dict[str, Any]) -> dict[str, Any]:
     lines.append("from __future__ import annotations")
     lines.append("")
     lines.append("import importlib.util")
+    lines.append("import inspect")
     lines.append("import pathlib")
     lines.append("import re")
     lines.append("")
@@ -25,10 +26,19 @@ def test_writer_node(state: dict[str, Any]) -> dict[str, Any]:
     lines.append("    if callable(fn):")
     lines.append("        fn()")
     lines.append("    else:")
-    lines.append("        c = [getattr(m, a) for a in dir(m) if re.match(r'^cell_\\d+$', a)]")
-    lines.append("        for f in c:")
-    lines.append("            if callable(f):")
-    lines.append("                f()")
+    lines.append("        # Call cells in order, feeding each one the upstream values it takes.")
+    lines.append("        outputs = getattr(m, 'CELL_OUTPUTS', {})")
+    lines.append("        env: dict[str, object] = {}")
+    lines.append("        names = [a for a in dir(m) if re.match(r'^cell_\\d+$', a)]")
+    lines.append("        for name in sorted(names, key=lambda a: int(a[5:])):")
+    lines.append("            f = getattr(m, name)")
+    lines.append("            params = inspect.signature(f).parameters")
+    lines.append("            result = f(**{p: env[p] for p in params})")
+    lines.append("            outs = outputs.get(name, ())")
+    lines.append("            if len(outs) == 1:")
+    lines.append("                env[outs[0]] = result")
+    lines.append("            elif outs:")
+    lines.append("                env.update(zip(outs, result, strict=True))")
     lines.append("")
     tests = {plan["tests_path"]: "\n".join(lines) + "\n"}
     for path, content in tests.items():
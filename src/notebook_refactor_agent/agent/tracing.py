@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+import cProfile
+import io
+from pathlib import Path
+import pstats
+import sys
+import time
+import tracemalloc
+from types import ModuleType
+from typing import Any
+
+from ..tracing import span
+from .memory import (
+    BudgetWatch,
+    MemoryBudgetExceeded,
+    check_budget,
+    memory_table,
+    node_memory,
+    rss_mb,
+    write_budget_report,
+)
+
+try:
+    import resource as _resource
+
+    res: ModuleType | None = _resource
+except Exception:
+    res = None
+
+Node = Callable[[dict[str, Any]], dict[str, Any]]
+
+# Directory for per-node cProfile dumps; None (the default) disables profiling.
+_PROFILE_DIR: Path | None = None
+
+
+def start_profile(profile_dir: Path) -> None:
+    """Profile each instrumented node from now on into ``<profile_dir>/<node>.pstats``."""
+    global _PROFILE_DIR
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    _PROFILE_DIR = profile_dir
+
+
+def stop_profile() -> None:
+    global _PROFILE_DIR
+    _PROFILE_DIR = None
+
+
+def write_profile_report(
+    profile_dir: Path,
+    dest: Path,
+    nodes: dict[str, dict[str, Any]] | None = None,
+    total_seconds: float | None = None,
+    top: int = 25,
+) -> None:
+    """Summarise the node profiles under ``profile_dir``: combined hotspots, then each node.
+
+    Profiles are found recursively, so several runs (one subdirectory per eval
+    case) are merged per node. With the run's ``total_seconds`` and ``nodes``
+    timings, the time spent outside any node (LangGraph scheduling) is reported too.
+    """
+    order = list(nodes or {})
+    files = sorted(profile_dir.rglob("*.pstats"))
+    by_node: dict[str, list[str]] = {}
+    for f in files:
+        by_node.setdefault(f.stem, []).append(str(f))
+    names = sorted(by_node, key=lambda n: (order.index(n) if n in order else len(order), n))
+    buf = io.StringIO()
+    buf.write(f"Profiles: {profile_dir.resolve()}\n")
+    if nodes and total_seconds is not None:
+        inside = sum(float(n.get("wall_seconds", 0.0)) for n in nodes.values())
+        buf.write(
+            f"Run wall {total_seconds:.3f}s, in nodes {inside:.3f}s, "
+            f"outside nodes (graph overhead) {total_seconds - inside:.3f}s\n"
+        )
+    if not files:
+        buf.write("No node profiles found.\n")
+    else:
+        buf.write(f"\n==== Top {top} hotspots, all nodes combined (by own time) ====\n")
+        pstats.Stats(*(str(f) for f in files), stream=buf).sort_stats("tottime").print_stats(top)
+        for name in names:
+            buf.write(f"\n==== {name} (by cumulative time) ====\n")
+            pstats.Stats(*by_node[name], stream=buf).sort_stats("cumulative").print_stats(top)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.write_text(buf.getvalue())
+
+
+def _peak_rss_mb() -> float | None:
+    if res is None:
+        return None
+    peak = float(res.getrusage(res.RUSAGE_SELF).ru_maxrss)
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _child_cpu() -> float:
+    if res is None:
+        return 0.0
+    ru = res.getrusage(res.RUSAGE_CHILDREN)
+    return float(ru.ru_utime + ru.ru_stime)
+
+
+def instrument(name: str, node: Node) -> Node:
+    """Wrap a graph node: trace it and record its timings in ``metrics["nodes"][name]``.
+
+    While :func:`start_profile` is active the node also runs under cProfile (its
+    own thread only; the critic's worker threads just wait on subprocesses).
+    With ``trace_memory`` set, tracemalloc runs during the node and its peak and
+    largest live allocations land in ``nodes[name]["memory"]``. A positive
+    ``memory_budget_mb`` is polled while the node runs (see :class:`BudgetWatch`)
+    and checked again once it returns; going over it stops the node, writes an
+    abort report and raises :class:`MemoryBudgetExceeded`.
+
+    ``cpu_seconds`` is this process's CPU time (all threads), ``child_cpu_seconds``
+    that of subprocesses reaped meanwhile, ``peak_rss_mb`` the process high-water
+    mark once the node finished. Earlier nodes' entries are carried over since
+    ``metrics`` is replaced, not merged, by each update.
+    """
+
+    def run(state: dict[str, Any]) -> dict[str, Any]:
+        profile_dir = _PROFILE_DIR
+        profiler = cProfile.Profile() if profile_dir is not None else None
+        trace_memory = bool(state.get("trace_memory"))
+        budget = int(state.get("memory_budget_mb") or 0)
+        own_tracing = trace_memory and not tracemalloc.is_tracing()
+        if own_tracing:
+            tracemalloc.start()
+        elif trace_memory:
+            tracemalloc.reset_peak()
+        wall0, cpu0, child0 = time.perf_counter(), time.process_time(), _child_cpu()
+        with span(name, cat="node") as args:
+            if profiler is not None:
+                profiler.enable()
+            update: dict[str, Any] = {}
+            try:
+                with BudgetWatch(budget) as watch:
+                    update = node(state)
+            finally:
+                if profiler is not None and profile_dir is not None:
+                    profiler.disable()
+                    profiler.dump_stats(str(profile_dir / f"{name}.pstats"))
+                memory: dict[str, Any] = node_memory() if trace_memory else {"rss_mb": rss_mb()}
+                if own_tracing:
+                    tracemalloc.stop()
+            stats: dict[str, Any] = {
+                "wall_seconds": time.perf_counter() - wall0,
+                "cpu_seconds": time.process_time() - cpu0,
+                "child_cpu_seconds": _child_cpu() - child0,
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+            args.update(stats)
+            if trace_memory:
+                stats["memory"] = memory
+                args["py_peak_mb"] = memory["py_peak_mb"]
+        prev: dict[str, Any] = state.get("metrics") or {}
+        metrics = dict(update["metrics"] if "metrics" in update else prev)
+        metrics["nodes"] = {**prev.get("nodes", {}), **metrics.get("nodes", {}), name: stats}
+        try:
+            if watch.used_mb is not None:
+                raise MemoryBudgetExceeded(name, watch.used_mb, budget, memory.get("top", []))
+            check_budget(name, memory, budget)
+        except MemoryBudgetExceeded as e:
+            write_budget_report(
+                Path(state["output_dir"]), e, {**memory_table(metrics["nodes"]), name: memory}
+            )
+            raise
+        return {**update, "metrics": metrics}
+
+    run.__name__ = getattr(node, "__name__", name)
+    return run
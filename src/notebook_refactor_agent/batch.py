@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+import glob
+import os
+from pathlib import Path
+import time
+from typing import Any
+
+# Metrics keys that must all be zero for a refactor run to count as passing.
+FAIL_KEYS: tuple[str, ...] = (
+    "pytest_returncode",
+    "ruff_returncode",
+    "black_returncode",
+    "mypy_returncode",
+    "exec_returncode",
+)
+
+# Pipeline per engine, built at most once per (worker) process.
+_PIPELINES: dict[str, Any] = {}
+
+
+@dataclass(slots=True)
+class BatchResult:
+    input_nb: str
+    output_dir: str
+    passed: bool
+    seconds: float
+    report: str
+    error: str | None = None
+
+
+def metrics_failed(metrics: dict[str, Any]) -> bool:
+    """Return True if any critic return code in ``metrics`` is non-zero."""
+    return any(int(metrics.get(k, 0)) != 0 for k in FAIL_KEYS)
+
+
+def collect_notebooks(target: str | Path) -> list[Path]:
+    """Resolve a notebook path, a directory (searched recursively) or a glob pattern."""
+    p = Path(target)
+    if p.is_file():
+        return [p]
+    if p.is_dir():
+        found = p.rglob("*.ipynb")
+    else:
+        found = (Path(x) for x in glob.glob(str(target), recursive=True))
+    return sorted(x for x in found if x.suffix == ".ipynb" and ".ipynb_checkpoints" not in x.parts)
+
+
+def output_dirs_for(notebooks: list[Path], output_root: Path) -> list[Path]:
+    """Map each notebook to its own output dir, mirroring the layout below their common parent."""
+    if not notebooks:
+        return []
+    parents = [str(nb.resolve().parent) for nb in notebooks]
+    base = Path(os.path.commonpath(parents))
+    return [output_root / nb.resolve().relative_to(base).with_suffix("") for nb in notebooks]
+
+
+def compiled_graph(engine: str = "langgraph") -> Any:
+    """The pipeline on ``engine`` (see ``agent.graph.ENGINES``), built once per process."""
+    pipeline = _PIPELINES.get(engine)
+    if pipeline is None:
+        from .agent.graph import build_pipeline
+
+        pipeline = _PIPELINES[engine] = build_pipeline(engine)
+    return pipeline
+
+
+def init_worker(engine: str = "langgraph") -> None:
+    """Process-pool initializer shared by batch and eval runs."""
+    # Pay LangGraph/nbformat import and graph compile once per worker, not per notebook,
+    # and start the critic's sandbox interpreters (safe mode is the default) meanwhile.
+    from .tools.sandbox_pool import default_pool, sandbox_env
+
+    default_pool().warm(sandbox_env(True))
+    compiled_graph(engine)
+
+
+def refactor_one(state: dict[str, Any], engine: str = "langgraph") -> BatchResult:
+    """Run the compiled pipeline for a single prepared state; never raises."""
+    t0 = time.monotonic()
+    try:
+        final_state: dict[str, Any] = compiled_graph(engine).invoke(state)
+    except Exception as e:
+        return BatchResult(
+            input_nb=str(state["input_nb"]),
+            output_dir=str(state["output_dir"]),
+            passed=False,
+            seconds=time.monotonic() - t0,
+            report="error",
+            error=f"{type(e).__name__}: {e}",
+        )
+    metrics = final_state.get("metrics", {}) or {}
+    return BatchResult(
+        input_nb=str(state["input_nb"]),
+        output_dir=str(state["output_dir"]),
+        passed=not metrics_failed(metrics),
+        seconds=time.monotonic() - t0,
+        report=str(final_state.get("report", "done")),
+    )
+
+
+def refactor_many(
+    states: list[dict[str, Any]], jobs: int = 1, engine: str = "langgraph"
+) -> list[BatchResult]:
+    """Refactor many notebooks, in a process pool when ``jobs > 1``.
+
+    Results are returned in the order of ``states``.
+    """
+    if jobs <= 1 or len(states) <= 1:
+        return [refactor_one(s, engine) for s in states]
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(states)), initializer=init_worker, initargs=(engine,)
+    ) as ex:
+        return list(ex.map(partial(refactor_one, engine=engine), states, chunksize=1))
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+from importlib import import_module
+import json
+from pathlib import Path
+import statistics
+import tempfile
+import time
+from typing import Any
+
+from ..agent.graph import ENGINES, build_pipeline, pipeline_nodes
+from .startup import import_profile
+from .synthetic import NotebookSpec, write_synthetic
+
+
+def _no_critic(state: dict[str, Any]) -> dict[str, Any]:
+    return {}
+
+
+def run_engines(
+    workdir: Path, cells: int = 10, runs: int = 20, with_critic: bool = False
+) -> dict[str, Any]:
+    """Per-run cost of each engine on a small synthetic notebook.
+
+    ``overhead_ms`` is the invoke time not spent inside any node (per the
+    nodes' own timings), i.e. what the executor itself costs. The critic is
+    replaced by a no-op unless ``with_critic``, since its tools take seconds.
+    """
+    nb = str(write_synthetic(workdir / "nb.ipynb", NotebookSpec(cells=cells)))
+    nodes = pipeline_nodes()
+    if not with_critic:
+        nodes["critic"] = _no_critic
+    results: dict[str, Any] = {}
+    for engine in ENGINES:
+        if engine == "langgraph":
+            import_module("langgraph.graph")  # import cost is reported separately below
+        t0 = time.perf_counter()
+        pipeline = build_pipeline(engine, nodes)
+        build_ms = (time.perf_counter() - t0) * 1000
+        pipeline.invoke({"input_nb": nb, "output_dir": str(workdir / engine / "warmup")})
+        totals: list[float] = []
+        overheads: list[float] = []
+        for i in range(max(1, runs)):
+            state = {"input_nb": nb, "output_dir": str(workdir / engine / str(i))}
+            t0 = time.perf_counter()
+            final = pipeline.invoke(state)
+            total = time.perf_counter() - t0
+            in_nodes = sum(n["wall_seconds"] for n in final["metrics"]["nodes"].values())
+            totals.append(total * 1000)
+            overheads.append((total - in_nodes) * 1000)
+        results[engine] = {
+            "build_ms": build_ms,
+            "invoke_ms": statistics.median(totals),
+            "overhead_ms": statistics.median(overheads),
+        }
+    # What a one-shot `nra refactor` additionally pays just to load LangGraph.
+    results["langgraph"]["import_ms"] = import_profile("langgraph.graph")["import_ms"]
+    results["native"]["import_ms"] = 0.0
+    return {"cells": cells, "runs": runs, "with_critic": with_critic, "engines": results}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Per-run overhead of the LangGraph and native engines.")
+    p.add_argument("--cells", type=int, default=10)
+    p.add_argument("--runs", type=int, default=20)
+    p.add_argument("--with-critic", action="store_true", help="run the real critic too (slow)")
+    args = p.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        res = run_engines(Path(tmp), args.cells, args.runs, args.with_critic)
+    print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import argparse
+from dataclasses import replace
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any
+
+from ..agent.nodes.planner import planner_node
+from ..agent.nodes.refactor import refactor_node
+from ..tools.nb_model import load_notebook
+from .synthetic import NotebookSpec, write_synthetic
+
+# Mixed syntax and magics exercise both the AST engine and its line-based fallback.
+ENGINE_SPEC = NotebookSpec(
+    import_density=0.2, def_ratio=0.2, markdown_every=0, magic_ratio=0.2, syntax_mix=True
+)
+
+
+def run_bench(cells: int, modes: list[str], workdir: Path) -> dict[str, Any]:
+    nb_path = write_synthetic(
+        workdir / f"synthetic_{cells}.ipynb", replace(ENGINE_SPEC, cells=cells)
+    )
+    t0 = time.perf_counter()
+    load_notebook(str(nb_path))
+    load_secs = time.perf_counter() - t0
+    plan = planner_node({"input_nb": str(nb_path)})["plan"]
+
+    results: dict[str, Any] = {"cells": cells, "load_seconds": round(load_secs, 4), "modes": {}}
+    for mode in modes:
+        state = {
+            "input_nb": str(nb_path),
+            "plan": plan,
+            "output_dir": str(workdir / f"out_{mode}"),
+            "mode": mode,
+        }
+        t0 = time.perf_counter()
+        files = refactor_node(state)["files"]
+        secs = time.perf_counter() - t0
+        lines = sum(c.count("\n") for c in files.values())
+        results["modes"][mode] = {"seconds": round(secs, 4), "lines": lines}
+    return results
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Benchmark the rule-based refactor engine.")
+    p.add_argument("--cells", type=int, default=10_000)
+    p.add_argument("--modes", default="run-all,functions,both")
+    p.add_argument("--max-seconds", type=float, default=0.0, help="Fail if any mode is slower")
+    args = p.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        res = run_bench(args.cells, args.modes.split(","), Path(tmp))
+    print(json.dumps(res, indent=2))
+    slow = [
+        m for m, r in res["modes"].items() if args.max_seconds and r["seconds"] > args.max_seconds
+    ]
+    sys.exit(1 if slow else 0)
+
+
+if __name__ == "__main__":
+    main()
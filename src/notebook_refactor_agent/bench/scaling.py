@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import argparse
+from collections.abc import Callable
+from dataclasses import asdict, replace
+from datetime import datetime
+import itertools
+import json
+import os
+from pathlib import Path
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+from ..agent.nodes.planner import planner_node
+from ..agent.nodes.refactor import refactor_node
+from ..agent.nodes.writer_node import test_writer_node
+from ..batch import compiled_graph
+from ..llm.factory import register_llm
+from ..llm.fake import FakeLLM
+from ..tools.nb_inspector import summarize_notebook
+from ..tools.nb_model import clear_notebook_cache
+from .synthetic import NotebookSpec, write_synthetic
+
+STAGES: tuple[str, ...] = ("summarize", "planner", "refactor", "test_writer", "graph", "graph_llm")
+# Stages that run the critic (pytest, ruff, black, mypy) on the output.
+GRAPH_STAGES: tuple[str, ...] = ("graph", "graph_llm")
+# Stages timed with a cold parsed-notebook cache.
+COLD_STAGES: tuple[str, ...] = ("summarize", "planner", *GRAPH_STAGES)
+
+_MB = 1024 * 1024
+
+
+def _fake_reply(messages: list[dict[str, str]]) -> str:
+    """Shape-correct replies for each LLM node, so the LLM path runs without a provider."""
+    prompt = messages[-1]["content"] if messages else ""
+    names = re.findall(r"^### (\w+)", prompt, flags=re.M)
+    if names:  # refactor: one stub per fragment it was sent
+        code = "from __future__ import annotations\n\n\n" + "\n\n\n".join(
+            f"def {n}() -> None:\n    return None" for n in names
+        )
+        return json.dumps({"files": {"src_pkg/module.py": code + "\n"}})
+    if '"summary"' in prompt:  # planner: no cell_map, so one function per cell
+        return "{}"
+    return json.dumps({"tests/test_module.py": "def test_smoke() -> None:\n    assert True\n"})
+
+
+def fake_llm() -> FakeLLM:
+    return FakeLLM({}, default=_fake_reply)
+
+
+def _measure(run: Callable[[], object], repeat: int, memory: bool, cold: bool) -> dict[str, Any]:
+    """Best and median wall time over ``repeat`` runs, then one extra run under tracemalloc.
+
+    With ``cold`` the parsed-notebook cache is dropped before every run.
+    """
+    times: list[float] = []
+    for _ in range(max(1, repeat)):
+        if cold:
+            clear_notebook_cache()
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    peak: float | None = None
+    if memory:
+        if cold:
+            clear_notebook_cache()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / _MB
+        finally:
+            tracemalloc.stop()
+    return {"seconds": min(times), "median_seconds": statistics.median(times), "py_peak_mb": peak}
+
+
+def _stage_runner(stage: str, nb_path: Path, workdir: Path) -> Callable[[], object]:
+    """A zero-argument callable running one stage; graph runs get a fresh output dir each time."""
+    nb = str(nb_path)
+    if stage == "summarize":
+        return lambda: summarize_notebook(nb)
+    if stage == "planner":
+        return lambda: planner_node({"input_nb": nb})
+    if stage in ("refactor", "test_writer"):
+        node = refactor_node if stage == "refactor" else test_writer_node
+        plan = planner_node({"input_nb": nb})["plan"]
+        state = {"input_nb": nb, "plan": plan, "output_dir": str(workdir)}
+        return lambda: node(dict(state))
+
+    llm = {"provider": "fake", "model": "fake"} if stage == "graph_llm" else {}
+    runs = itertools.count()
+
+    def run_graph() -> object:
+        out = workdir / f"{stage}_{next(runs)}"
+        state = {"input_nb": nb, "output_dir": str(out), "cache_dir": str(out / ".cache"), **llm}
+        return compiled_graph().invoke(state)
+
+    return run_graph
+
+
+def run_suite(
+    sizes: list[int],
+    stages: list[str],
+    spec: NotebookSpec,
+    workdir: Path,
+    repeat: int = 3,
+    graph_max_cells: int = 1000,
+    memory: bool = True,
+) -> dict[str, Any]:
+    """Time every stage on a synthetic notebook of each size; returns JSON-ready results."""
+    register_llm("fake", fake_llm, ["fake"])
+    results: list[dict[str, Any]] = []
+    for n in sizes:
+        nb_path = write_synthetic(workdir / f"synthetic_{n}.ipynb", replace(spec, cells=n))
+        for stage in stages:
+            if stage in GRAPH_STAGES and n > graph_max_cells:
+                continue
+            run = _stage_runner(stage, nb_path, workdir / f"{stage}_{n}")
+            # The whole graph is slow and dominated by the critic's tools: one timed run.
+            # As in the pipeline, the first readers parse the notebook, later nodes reuse it.
+            cold = stage in COLD_STAGES
+            m = _measure(run, 1 if stage in GRAPH_STAGES else repeat, memory, cold)
+            m["cells_per_second"] = n / m["seconds"] if m["seconds"] else None
+            results.append({"stage": stage, "cells": n, **m})
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "spec": {k: v for k, v in asdict(spec).items() if k != "cells"},
+        "results": results,
+    }
+
+
+def compare(baseline: dict[str, Any], current: dict[str, Any]) -> list[dict[str, Any]]:
+    """Per (stage, cells) present in both runs: seconds before/after and their ratio."""
+    before = {(r["stage"], r["cells"]): r for r in baseline.get("results", [])}
+    rows: list[dict[str, Any]] = []
+    for r in current.get("results", []):
+        old = before.get((r["stage"], r["cells"]))
+        if old is None or not old["seconds"]:
+            continue
+        rows.append(
+            {
+                "stage": r["stage"],
+                "cells": r["cells"],
+                "before": old["seconds"],
+                "after": r["seconds"],
+                "ratio": r["seconds"] / old["seconds"],
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Scaling benchmark on synthetic notebooks.")
+    p.add_argument("--sizes", default="10,100,1000,10000", help="comma-separated cell counts")
+    p.add_argument("--stages", default=",".join(STAGES))
+    p.add_argument("--lines-per-cell", type=int, default=6)
+    p.add_argument("--import-density", type=float, default=0.1)
+    p.add_argument("--def-ratio", type=float, default=0.2)
+    p.add_argument("--output-bytes", type=int, default=0, help="display payload per code cell")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--graph-max-cells", type=int, default=1000, help="largest size for graph runs")
+    p.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    p.add_argument("--out", type=Path, default=None, help="write JSON here instead of stdout")
+    p.add_argument("--compare", type=Path, default=None, help="baseline JSON from an earlier run")
+    p.add_argument(
+        "--max-regression", type=float, default=0.0, help="fail if any stage is this much slower"
+    )
+    args = p.parse_args()
+
+    stages = [s for s in args.stages.split(",") if s]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        p.error(f"unknown stage(s): {', '.join(unknown)}")
+    spec = NotebookSpec(
+        lines_per_cell=args.lines_per_cell,
+        import_density=args.import_density,
+        def_ratio=args.def_ratio,
+        output_bytes=args.output_bytes,
+        seed=args.seed,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        res = run_suite(
+            [int(s) for s in args.sizes.split(",") if s],
+            stages,
+            spec,
+            Path(tmp),
+            repeat=args.repeat,
+            graph_max_cells=args.graph_max_cells,
+            memory=not args.no_memory,
+        )
+    text = json.dumps(res, indent=2)
+    if args.out is not None:
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare is None:
+        return
+    rows = compare(json.loads(args.compare.read_text()), res)
+    for r in rows:
+        print(
+            f"{r['stage']:<12} {r['cells']:>6}  {r['before']:.4f}s -> {r['after']:.4f}s  "
+            f"x{r['ratio']:.2f}",
+            file=sys.stderr,
+        )
+    worse = [r for r in rows if args.max_regression and r["ratio"] > args.max_regression]
+    sys.exit(1 if worse else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+# Modules the CLI must not load just to start; the commands that need them import them.
+HEAVY_MODULES: tuple[str, ...] = ("langgraph", "nbformat", "omegaconf", "pydantic", "jsonschema")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """``(module, self_us, cumulative_us, depth)`` for each line of ``-X importtime`` output."""
+    rows: list[tuple[str, int, int, int]] = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def import_profile(module: str, python: str = sys.executable) -> dict[str, Any]:
+    """Import ``module`` in a fresh interpreter and report what that cost.
+
+    ``import_ms`` is the module's cumulative import time as printed by
+    ``-X importtime`` (interpreter startup and ``site`` excluded); ``wall_ms``
+    is the whole process, startup included.
+    """
+    loaded = f"{{m.split('.')[0] for m in sys.modules}} & {set(HEAVY_MODULES)!r}"
+    code = f"import json, sys, {module}; print(json.dumps(sorted({loaded})))"
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - t0
+    rows = parse_importtime(proc.stderr)
+    total = next((cum for name, _, cum, _ in rows if name == module), 0)
+    top = sorted((r for r in rows if r[0] != module), key=lambda r: r[1], reverse=True)[:10]
+    return {
+        "import_ms": total / 1000,
+        "wall_ms": wall * 1000,
+        "heavy_loaded": json.loads(proc.stdout.strip().splitlines()[-1]),
+        "top_self_ms": [{"module": name, "self_ms": s / 1000} for name, s, _, _ in top],
+    }
+
+
+def run_startup(module: str, runs: int = 5, python: str = sys.executable) -> dict[str, Any]:
+    """Median import and process time of ``module`` over ``runs`` fresh interpreters."""
+    profiles = [import_profile(module, python) for _ in range(max(1, runs))]
+    return {
+        "module": module,
+        "runs": len(profiles),
+        "import_ms": statistics.median(p["import_ms"] for p in profiles),
+        "wall_ms": statistics.median(p["wall_ms"] for p in profiles),
+        "heavy_loaded": profiles[-1]["heavy_loaded"],
+        "top_self_ms": profiles[-1]["top_self_ms"],
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(
+        description="CLI startup benchmark based on -X importtime. "
+        f"Also fails if the module loads any of: {', '.join(HEAVY_MODULES)}."
+    )
+    p.add_argument("--module", default="notebook_refactor_agent.cli")
+    p.add_argument("--runs", type=int, default=5)
+    p.add_argument(
+        "--max-ms",
+        type=float,
+        default=150.0,
+        help="fail if the median import time is above this (0 = no limit)",
+    )
+    args = p.parse_args()
+    res = run_startup(args.module, args.runs)
+    print(json.dumps(res, indent=2))
+    too_slow = bool(args.max_ms) and res["import_ms"] > args.max_ms
+    sys.exit(1 if too_slow or res["heavy_loaded"] else 0)
+
+
+if __name__ == "__main__":
+    main()
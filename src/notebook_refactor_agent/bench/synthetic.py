@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+import json
+from pathlib import Path
+import random
+from typing import Any
+
+_IMPORTS = (
+    "import json",
+    "import math",
+    "import re",
+    "from collections import Counter",
+    "from pathlib import Path",
+    "import statistics as st",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class NotebookSpec:
+    """Shape of a generated notebook.
+
+    ``import_density`` and ``def_ratio`` are the fractions of code cells that
+    start with imports and that define a function; ``output_bytes`` is the size
+    of the (fake PNG) display output attached to each code cell, 0 for none.
+    Every ``markdown_every``-th cell is markdown. Code cells read a value bound
+    by an earlier cell, so the def-use graph is not trivially empty.
+
+    ``magic_ratio`` is the fraction of code cells that start with an IPython
+    magic, which is not valid Python. ``syntax_mix`` varies the statements:
+    multi-line unannotated signatures with ``*args``/``**kwargs``, tuple and
+    augmented assignments, comments, loops and annotated assignments.
+    """
+
+    cells: int = 100
+    lines_per_cell: int = 6
+    import_density: float = 0.1
+    def_ratio: float = 0.2
+    output_bytes: int = 0
+    markdown_every: int = 10
+    seed: int = 0
+    magic_ratio: float = 0.0
+    syntax_mix: bool = False
+
+
+def _code_cell(i: int, spec: NotebookSpec, rng: random.Random, prev: int | None) -> str:
+    lines: list[str] = []
+    if spec.magic_ratio and rng.random() < spec.magic_ratio:
+        lines.append(f"%timeit {i}")
+    if rng.random() < spec.import_density:
+        lines.extend(rng.sample(_IMPORTS, 2))
+    base = f"v{prev}" if prev is not None else "0"
+    body = max(1, spec.lines_per_cell - len(lines))
+    if rng.random() < spec.def_ratio:
+        if spec.syntax_mix:
+            lines.append(f"def f{i}(a,\n        b={i}, *args,\n        **kwargs):")
+        else:
+            lines.append(f"def f{i}(a: int, b: int = {i}) -> int:")
+        lines.append("    t = a + b")
+        lines.extend(f"    t = t * {k + 2} % 9973" for k in range(max(0, body - 4)))
+        lines.append("    return t")
+        lines.append(f"v{i} = f{i}({base})")
+        return "\n".join(lines)
+    if spec.syntax_mix and i % 3 == 1:
+        lines.append(f"x{i}, y{i} = {base}, {i}")
+        lines.append(f"x{i} += 1  # comment {i}")
+        lines.append(f"v{i} = x{i} + y{i}")
+    elif spec.syntax_mix and i % 3 == 2:
+        lines.append("for j in range(3):")
+        lines.append(f"    acc{i} = j + {base}")
+        lines.append(f"v{i}: int = acc{i}")
+    else:
+        lines.append(f"v{i} = {base} + {i}")
+    lines.extend(f"w{i}_{k} = v{i} * {k + 1}" for k in range(body - 1))
+    return "\n".join(lines)
+
+
+def synthetic_notebook(spec: NotebookSpec) -> dict[str, Any]:
+    """An nbformat 4.5 notebook (as a plain dict) shaped by ``spec``; deterministic per seed."""
+    rng = random.Random(spec.seed)
+    payload = ("iVBORw0KGgo" * (spec.output_bytes // 11 + 1))[: spec.output_bytes]
+    cells: list[dict[str, Any]] = []
+    prev: int | None = None
+    for i in range(spec.cells):
+        if spec.markdown_every and i % spec.markdown_every == spec.markdown_every - 1:
+            cells.append(
+                {"cell_type": "markdown", "id": f"c{i}", "metadata": {}, "source": f"## Step {i}"}
+            )
+            continue
+        outputs: list[dict[str, Any]] = []
+        if payload:
+            outputs.append(
+                {
+                    "output_type": "display_data",
+                    "data": {"image/png": payload, "text/plain": "<Figure>"},
+                    "metadata": {},
+                }
+            )
+        cells.append(
+            {
+                "cell_type": "code",
+                "id": f"c{i}",
+                "metadata": {},
+                "source": _code_cell(i, spec, rng, prev),
+                "outputs": outputs,
+                "execution_count": i + 1,
+            }
+        )
+        prev = i
+    return {
+        "cells": cells,
+        "metadata": {"nra_synthetic": asdict(spec)},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def write_synthetic(path: Path, spec: NotebookSpec) -> Path:
+    """Write the notebook for ``spec`` to ``path`` (raw JSON, no nbformat validation)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(synthetic_notebook(spec), indent=1))
+    return path
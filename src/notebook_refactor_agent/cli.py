@@ -1,15 +1,17 @@
 from __future__ import annotations
 
 from collections.abc import Callable
+import os
 from pathlib import Path
+import time
 from typing import Any, TypeVar, cast
 
-from omegaconf import OmegaConf
 import typer
 
-from .agent.graph import build_graph
+# Only stdlib, typer and the provider registry load at startup; each command imports
+# what it runs (LangGraph, nbformat, OmegaConf, ...) itself, so `nra inspect` or
+# `nra config init` stay quick. tests/test_startup.py guards this.
 from .llm.factory import supported_models_help
-from .tools.nb_inspector import summarize_notebook
 
 app = typer.Typer(help="Notebook Refactor Agent")
 
@@ -17,10 +19,71 @@ app = typer.Typer(help="Notebook Refactor Agent")
 config_app = typer.Typer(help="Configuration commands")
 app.add_typer(config_app, name="config")
 
+# Sub-typer for the on-disk memo cache of generated cell functions
+memo_app = typer.Typer(help="Memoization cache commands")
+app.add_typer(memo_app, name="memo")
+
 # ---- B008-safe Typer option defaults (avoid calling typer.Option in signature) ----
 TEMPERATURE_OPT = typer.Option(0.1, "--temperature")
 MAX_TOKENS_OPT = typer.Option(2048, "--max-output-tokens")
 CACHE_DIR_OPT = typer.Option(Path(".cache/nra"), "--cache-dir")
+CRITIC_JOBS_OPT = typer.Option(
+    None, "--critic-jobs", help="Max critic tools run concurrently (default: all at once)"
+)
+CHUNK_SIZE_OPT = typer.Option(
+    None, "--chunk-size", help="LLM refactor: functions per request, sent concurrently (0 = one)"
+)
+LLM_CONCURRENCY_OPT = typer.Option(
+    None, "--llm-concurrency", help="Max concurrent LLM requests when chunking"
+)
+TOKEN_BUDGET_OPT = typer.Option(
+    None,
+    "--token-budget",
+    help="Split refactor LLM requests to this many input+output tokens "
+    "(0 = split only if the prompt overflows the context window)",
+)
+INCREMENTAL_OPT = typer.Option(
+    None,
+    "--incremental/--full",
+    help="Reuse stages whose inputs are unchanged since the last run into the output dir",
+)
+MEMOIZE_OPT = typer.Option(
+    None,
+    "--memoize/--no-memoize",
+    help="Cache generated cell function results on disk (implies --mode both for run-all)",
+)
+PARALLEL_OPT = typer.Option(
+    None,
+    "--parallel/--sequential",
+    help="Generated run_all runs independent cells concurrently (implies --mode both)",
+)
+LAZY_IMPORTS_OPT = typer.Option(
+    None,
+    "--lazy-imports/--eager-imports",
+    help="Import third-party modules inside the generated functions that use them",
+)
+TRACE_MEMORY_OPT = typer.Option(
+    None,
+    "--trace-memory/--no-trace-memory",
+    help="Record each node's peak Python allocation and top call sites in report.json",
+)
+MEMORY_BUDGET_OPT = typer.Option(
+    None,
+    "--memory-budget",
+    help="Stop the node that goes above this many MB (RSS or traced peak); 0 = no limit",
+)
+ENGINE_OPT = typer.Option(
+    None, "--engine", help="Pipeline executor: langgraph (default) or native (in-process, faster)"
+)
+TRACE_OPT = typer.Option(
+    None, "--trace", help="Write a Chrome trace-event JSON of the run (open in Perfetto)"
+)
+PROFILE_OPT = typer.Option(
+    None,
+    "--profile",
+    help="cProfile each graph node into DIR/<node>.pstats; summary in .reports/profile.txt",
+)
+WATCH_TARGET_ARG = typer.Argument(..., help="Notebook or directory of notebooks to watch")
 
 # ---- Typed decorator wrappers to keep mypy happy ----
 F = TypeVar("F", bound=Callable[..., Any])
@@ -51,6 +114,8 @@ def typed_command_for(app_obj: typer.Typer, *dargs: Any, **dkwargs: Any) -> Call
 def _load_cfg() -> dict[str, Any]:
     p = Path("configs/default.yaml")
     if p.exists():
+        from omegaconf import OmegaConf
+
         try:
             obj: Any = OmegaConf.to_container(OmegaConf.load(str(p)), resolve=True)
             return cast(dict[str, Any], obj) if isinstance(obj, dict) else {}
@@ -59,6 +124,16 @@ def _load_cfg() -> dict[str, Any]:
     return {}
 
 
+def _engine(cfg: dict[str, Any], engine: str | None) -> str:
+    """The executor to use: the CLI option, else the config file, else LangGraph."""
+    from .agent.graph import ENGINES
+
+    name = (engine or str(cfg.get("engine", "langgraph"))).strip().lower()
+    if name not in ENGINES:
+        raise typer.BadParameter(f"expected one of: {', '.join(ENGINES)}", param_hint="--engine")
+    return name
+
+
 def _plan_value(plan: Any, key: str, default: str) -> str:
     """Return a plan field from Plan dataclass or dict, with a default."""
     if isinstance(plan, dict):
@@ -79,9 +154,91 @@ def _tokens_from_meta(meta: dict[str, Any]) -> tuple[int, int, int]:
     return pt, ct, tt
 
 
+def _build_state(
+    cfg: dict[str, Any],
+    input_nb: Path,
+    output_dir: Path,
+    *,
+    mode: str | None,
+    safe: bool | None,
+    timeout_secs: int | None,
+    provider: str | None,
+    model: str | None,
+    temperature: float | None,
+    max_output_tokens: int | None,
+    cache_dir: Path | None,
+    critic_jobs: int | None = None,
+    refactor_chunk_size: int | None = None,
+    llm_concurrency: int | None = None,
+    token_budget: int | None = None,
+    incremental: bool | None = None,
+    memoize: bool | None = None,
+    parallel: bool | None = None,
+    lazy_imports: bool | None = None,
+    trace_memory: bool | None = None,
+    memory_budget_mb: int | None = None,
+) -> dict[str, Any]:
+    """Build the initial graph state from CLI options, falling back to the config file."""
+    return {
+        "input_nb": str(input_nb),
+        "output_dir": str(output_dir),
+        "mode": (mode or str(cfg.get("mode", "run-all"))),
+        "safe": bool(safe if safe is not None else cfg.get("safe", True)),
+        "timeout_secs": int(
+            timeout_secs if timeout_secs is not None else cfg.get("timeout_secs", 60)
+        ),
+        "provider": provider or str(cfg.get("provider", "none")),
+        "model": model or str(cfg.get("model", "none")),
+        "temperature": float(
+            temperature if temperature is not None else cfg.get("temperature", 0.1)
+        ),
+        "max_output_tokens": int(
+            max_output_tokens
+            if max_output_tokens is not None
+            else cfg.get("max_output_tokens", 2048)
+        ),
+        "cache_dir": str(
+            cache_dir if cache_dir is not None else cfg.get("cache_dir", ".cache/nra")
+        ),
+        "cache_max_mb": int(cfg.get("cache_max_mb", 512)),
+        "critic_jobs": int(
+            critic_jobs if critic_jobs is not None else cfg.get("critic_jobs", 0) or 0
+        ),
+        "refactor_chunk_size": int(
+            refactor_chunk_size
+            if refactor_chunk_size is not None
+            else cfg.get("refactor_chunk_size", 0) or 0
+        ),
+        "llm_concurrency": int(
+            llm_concurrency if llm_concurrency is not None else cfg.get("llm_concurrency", 4)
+        ),
+        "token_budget": int(
+            token_budget if token_budget is not None else cfg.get("token_budget", 0) or 0
+        ),
+        "incremental": bool(
+            incremental if incremental is not None else cfg.get("incremental", True)
+        ),
+        "memoize": bool(memoize if memoize is not None else cfg.get("memoize", False)),
+        "parallel": bool(parallel if parallel is not None else cfg.get("parallel", False)),
+        "lazy_imports": bool(
+            lazy_imports if lazy_imports is not None else cfg.get("lazy_imports", False)
+        ),
+        "trace_memory": bool(
+            trace_memory if trace_memory is not None else cfg.get("trace_memory", False)
+        ),
+        "memory_budget_mb": int(
+            memory_budget_mb
+            if memory_budget_mb is not None
+            else cfg.get("memory_budget_mb", 0) or 0
+        ),
+    }
+
+
 @typed_command(name="inspect")
 def inspect_cmd(input_nb: Path) -> None:
     """Print a quick JSON-like summary of a notebook."""
+    from .tools.nb_inspector import summarize_notebook
+
     summary: Any = summarize_notebook(input_nb)
     typer.echo(summary)
 
@@ -98,38 +255,86 @@ def refactor_cmd(
     temperature: float = TEMPERATURE_OPT,
     max_output_tokens: int = MAX_TOKENS_OPT,
     cache_dir: Path = CACHE_DIR_OPT,
+    critic_jobs: int | None = CRITIC_JOBS_OPT,
+    chunk_size: int | None = CHUNK_SIZE_OPT,
+    llm_concurrency: int | None = LLM_CONCURRENCY_OPT,
+    token_budget: int | None = TOKEN_BUDGET_OPT,
+    incremental: bool | None = INCREMENTAL_OPT,
+    memoize: bool | None = MEMOIZE_OPT,
+    parallel: bool | None = PARALLEL_OPT,
+    lazy_imports: bool | None = LAZY_IMPORTS_OPT,
+    trace_memory: bool | None = TRACE_MEMORY_OPT,
+    memory_budget_mb: int | None = MEMORY_BUDGET_OPT,
+    stream: bool = typer.Option(
+        False, "--stream/--no-stream", help="LLM refactor: stream the reply, write files early"
+    ),
+    engine: str | None = ENGINE_OPT,
+    trace: Path | None = TRACE_OPT,
+    profile: Path | None = PROFILE_OPT,
     verbose: bool = typer.Option(False, "--verbose"),
 ) -> None:
     """Refactor a notebook into a small package and tests, optionally using an LLM."""
+    from .agent.graph import build_pipeline
+    from .agent.memory import MemoryBudgetExceeded
+    from .agent.tracing import start_profile, stop_profile, write_profile_report
+    from .batch import metrics_failed
+    from .llm.cache import cache_stats
+    from .tracing import start_trace, stop_trace, write_trace
+
     cfg = _load_cfg()
-    app_graph = build_graph()
-    state = {
-        "input_nb": str(input_nb),
-        "output_dir": str(output_dir),
-        "mode": (mode or str(cfg.get("mode", "run-all"))),
-        "safe": bool(safe if safe is not None else cfg.get("safe", True)),
-        "timeout_secs": int(
-            timeout_secs if timeout_secs is not None else cfg.get("timeout_secs", 60)
-        ),
-        "provider": provider or str(cfg.get("provider", "none")),
-        "model": model or str(cfg.get("model", "none")),
-        "temperature": float(
-            temperature if temperature is not None else cfg.get("temperature", 0.1)
-        ),
-        "max_output_tokens": int(
-            max_output_tokens
-            if max_output_tokens is not None
-            else cfg.get("max_output_tokens", 2048)
-        ),
-        "cache_dir": str(
-            cache_dir if cache_dir is not None else cfg.get("cache_dir", ".cache/nra")
-        ),
-    }
+    app_graph = build_pipeline(_engine(cfg, engine))
+    state = _build_state(
+        cfg,
+        input_nb,
+        output_dir,
+        mode=mode,
+        safe=safe,
+        timeout_secs=timeout_secs,
+        provider=provider,
+        model=model,
+        temperature=temperature,
+        max_output_tokens=max_output_tokens,
+        cache_dir=cache_dir,
+        critic_jobs=critic_jobs,
+        refactor_chunk_size=chunk_size,
+        llm_concurrency=llm_concurrency,
+        token_budget=token_budget,
+        incremental=incremental,
+        memoize=memoize,
+        parallel=parallel,
+        lazy_imports=lazy_imports,
+        trace_memory=trace_memory,
+        memory_budget_mb=memory_budget_mb,
+    )
+    state["stream"] = stream
 
-    final_state: dict[str, Any] = app_graph.invoke(state)
+    if trace is not None:
+        start_trace()
+    if profile is not None:
+        start_profile(profile)
+    t0 = time.perf_counter()
+    try:
+        final_state: dict[str, Any] = app_graph.invoke(state)
+    except MemoryBudgetExceeded as e:
+        report_json = (Path(output_dir) / ".reports" / "report.json").resolve()
+        typer.echo(f"Aborted: {e}\nMemory report: {report_json}", err=True)
+        raise typer.Exit(code=1) from e
+    finally:
+        elapsed = time.perf_counter() - t0
+        stop_profile()
+        tracer = stop_trace()
+        if trace is not None and tracer is not None:
+            write_trace(trace, tracer.events)
 
     report = final_state.get("report", "done")
     metrics = final_state.get("metrics", {}) or {}
+    if profile is not None:
+        write_profile_report(
+            profile,
+            Path(output_dir) / ".reports" / "profile.txt",
+            nodes=metrics.get("nodes"),
+            total_seconds=elapsed,
+        )
     typer.echo(report)
     if verbose:
         plan_any: Any = final_state.get("plan", None)
@@ -142,6 +347,15 @@ def refactor_cmd(
         index_path = reports_dir / "index.txt"
         if index_path.exists():
             typer.echo(f"Index:   {index_path.resolve()}")
+        nodes = cast(dict[str, dict[str, Any]], metrics.get("nodes", {}) or {})
+        if nodes:
+            typer.echo(
+                "Nodes:   "
+                + ", ".join(
+                    f"{name} {n['wall_seconds']:.2f}s (cpu {n['cpu_seconds']:.2f}s)"
+                    for name, n in nodes.items()
+                )
+            )
 
         # LLM token summary (if any)
         calls = cast(list[dict[str, Any]], final_state.get("llm_calls", []) or [])
@@ -153,23 +367,184 @@ def refactor_cmd(
                 total_pt += pt
                 total_ct += ct
                 total_tt += tt
+                est = c.get("estimated_prompt_tokens")
                 typer.echo(
                     f"- node={c.get('node')} provider={c.get('provider')} model={c.get('model')} "
                     f"tokens: prompt={pt} completion={ct} total={tt}"
+                    + (f" (estimated prompt={est})" if est is not None else "")
                 )
             typer.echo(f"Total tokens: prompt={total_pt} completion={total_ct} total={total_tt}\n")
 
-    fail = any(
-        int(metrics.get(k, 0)) != 0
-        for k in (
-            "pytest_returncode",
-            "ruff_returncode",
-            "black_returncode",
-            "mypy_returncode",
-            "exec_returncode",
+        cs = cache_stats()
+        if cs["hits"] or cs["misses"]:
+            typer.echo(
+                f"LLM cache: hits={cs['hits']} (memory={cs['memory_hits']} disk={cs['disk_hits']}) "
+                f"misses={cs['misses']} evictions=(memory={cs['memory_evictions']} "
+                f"disk={cs['disk_evictions']}) bytes_saved={cs['bytes_saved']}"
+            )
+
+    fail = metrics_failed(metrics)
+    raise typer.Exit(code=1 if fail else 0)
+
+
+@typed_command(name="refactor-batch")
+def refactor_batch_cmd(
+    target: str = typer.Argument(..., help="Notebook directory, notebook path or glob pattern"),
+    output_dir: Path = Path("out_batch"),
+    jobs: int = typer.Option(os.cpu_count() or 1, "--jobs", "-j", help="Worker processes"),
+    mode: str = typer.Option("run-all", "--mode", help="run-all|functions|both"),
+    safe: bool = typer.Option(True, "--safe/--no-safe"),
+    timeout_secs: int = typer.Option(60, "--timeout"),
+    provider: str = typer.Option("none", "--provider", help="LLM provider, e.g. 'groq' or 'none'"),
+    model: str = typer.Option("none", "--model", help=supported_models_help()),
+    temperature: float = TEMPERATURE_OPT,
+    max_output_tokens: int = MAX_TOKENS_OPT,
+    cache_dir: Path = CACHE_DIR_OPT,
+    critic_jobs: int | None = CRITIC_JOBS_OPT,
+    chunk_size: int | None = CHUNK_SIZE_OPT,
+    llm_concurrency: int | None = LLM_CONCURRENCY_OPT,
+    token_budget: int | None = TOKEN_BUDGET_OPT,
+    incremental: bool | None = INCREMENTAL_OPT,
+    memoize: bool | None = MEMOIZE_OPT,
+    parallel: bool | None = PARALLEL_OPT,
+    lazy_imports: bool | None = LAZY_IMPORTS_OPT,
+    trace_memory: bool | None = TRACE_MEMORY_OPT,
+    memory_budget_mb: int | None = MEMORY_BUDGET_OPT,
+    engine: str | None = ENGINE_OPT,
+) -> None:
+    """Refactor many notebooks in parallel, one output dir per notebook."""
+    from .batch import collect_notebooks, output_dirs_for, refactor_many
+
+    notebooks = collect_notebooks(target)
+    if not notebooks:
+        typer.echo(f"No notebooks found for {target!r}.")
+        raise typer.Exit(code=1)
+
+    cfg = _load_cfg()
+    states = [
+        _build_state(
+            cfg,
+            nb,
+            out,
+            mode=mode,
+            safe=safe,
+            timeout_secs=timeout_secs,
+            provider=provider,
+            model=model,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            cache_dir=cache_dir,
+            critic_jobs=critic_jobs,
+            refactor_chunk_size=chunk_size,
+            llm_concurrency=llm_concurrency,
+            token_budget=token_budget,
+            incremental=incremental,
+            memoize=memoize,
+            parallel=parallel,
+            lazy_imports=lazy_imports,
+            trace_memory=trace_memory,
+            memory_budget_mb=memory_budget_mb,
         )
+        for nb, out in zip(notebooks, output_dirs_for(notebooks, output_dir), strict=True)
+    ]
+
+    t0 = time.monotonic()
+    results = refactor_many(states, jobs=jobs, engine=_engine(cfg, engine))
+    wall = time.monotonic() - t0
+
+    width = max(len(r.input_nb) for r in results)
+    for r in results:
+        status = "PASS" if r.passed else "FAIL"
+        detail = r.error or r.report
+        typer.echo(f"{status}  {r.seconds:7.2f}s  {r.input_nb.ljust(width)}  {detail}")
+    n_pass = sum(r.passed for r in results)
+    typer.echo(
+        f"\n{len(results)} notebook(s): {n_pass} passed, {len(results) - n_pass} failed "
+        f"in {wall:.2f}s wall ({sum(r.seconds for r in results):.2f}s total, jobs={jobs})"
     )
-    raise typer.Exit(code=1 if fail else 0)
+    raise typer.Exit(code=0 if n_pass == len(results) else 1)
+
+
+@typed_command(name="watch")
+def watch_cmd(
+    target: Path = WATCH_TARGET_ARG,
+    output_dir: Path = Path("out_pkg"),
+    debounce: float = typer.Option(0.3, "--debounce", help="Seconds of quiet before re-running"),
+    poll: bool = typer.Option(False, "--poll", help="Poll for changes instead of using inotify"),
+    poll_interval: float = typer.Option(1.0, "--poll-interval"),
+    mode: str = typer.Option("run-all", "--mode", help="run-all|functions|both"),
+    safe: bool = typer.Option(True, "--safe/--no-safe"),
+    timeout_secs: int = typer.Option(60, "--timeout"),
+    provider: str = typer.Option("none", "--provider", help="LLM provider, e.g. 'groq' or 'none'"),
+    model: str = typer.Option("none", "--model", help=supported_models_help()),
+    temperature: float = TEMPERATURE_OPT,
+    max_output_tokens: int = MAX_TOKENS_OPT,
+    cache_dir: Path = CACHE_DIR_OPT,
+    critic_jobs: int | None = CRITIC_JOBS_OPT,
+    chunk_size: int | None = CHUNK_SIZE_OPT,
+    llm_concurrency: int | None = LLM_CONCURRENCY_OPT,
+    token_budget: int | None = TOKEN_BUDGET_OPT,
+    memoize: bool | None = MEMOIZE_OPT,
+    parallel: bool | None = PARALLEL_OPT,
+    lazy_imports: bool | None = LAZY_IMPORTS_OPT,
+    trace_memory: bool | None = TRACE_MEMORY_OPT,
+    memory_budget_mb: int | None = MEMORY_BUDGET_OPT,
+    engine: str | None = ENGINE_OPT,
+) -> None:
+    """Re-refactor notebooks whenever they are saved, keeping the pipeline warm in-process."""
+    from .batch import collect_notebooks, refactor_one
+    from .tools.sandbox_pool import default_pool, sandbox_env
+    from .watch import iter_changes, open_watcher, watch_output_dir
+
+    if not target.exists():
+        typer.echo(f"{target} does not exist.")
+        raise typer.Exit(code=1)
+    cfg = _load_cfg()
+    executor = _engine(cfg, engine)
+
+    def run(notebooks: list[Path]) -> None:
+        for nb in notebooks:
+            state = _build_state(
+                cfg,
+                nb,
+                watch_output_dir(nb, target, output_dir),
+                mode=mode,
+                safe=safe,
+                timeout_secs=timeout_secs,
+                provider=provider,
+                model=model,
+                temperature=temperature,
+                max_output_tokens=max_output_tokens,
+                cache_dir=cache_dir,
+                critic_jobs=critic_jobs,
+                refactor_chunk_size=chunk_size,
+                llm_concurrency=llm_concurrency,
+                token_budget=token_budget,
+                incremental=True,
+                memoize=memoize,
+                parallel=parallel,
+                lazy_imports=lazy_imports,
+                trace_memory=trace_memory,
+                memory_budget_mb=memory_budget_mb,
+            )
+            r = refactor_one(state, executor)
+            status = "PASS" if r.passed else "FAIL"
+            stamp = time.strftime("%H:%M:%S")
+            typer.echo(f"[{stamp}] {status}  {r.seconds:6.2f}s  {nb}  {r.error or r.report}")
+
+    # The first pass compiles the graph and fills the manifests; later saves reuse both,
+    # and find warm sandbox interpreters for the critic.
+    default_pool().warm(sandbox_env(safe))
+    watcher = open_watcher(target, poll=poll, poll_interval=poll_interval)
+    run(collect_notebooks(target))
+    typer.echo(f"Watching {target} ({type(watcher).__name__}); Ctrl-C to stop.")
+    try:
+        for changed in iter_changes(watcher, debounce=debounce):
+            run(sorted(changed))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
 
 
 # -----------------------
@@ -190,6 +565,34 @@ max_output_tokens: 2048
 
 # Cache
 cache_dir: .cache/nra
+cache_max_mb: 512   # SQLite LLM cache size cap; least recently used entries are evicted
+
+# LLM refactor fan-out
+refactor_chunk_size: 0   # functions per request; 0 = whole notebook in one request
+llm_concurrency: 4
+token_budget: 0          # split refactor requests to this many tokens; 0 = only on overflow
+
+# Critic
+critic_jobs: 0      # max tools run concurrently; 0 = all at once
+
+# Reuse unchanged stages recorded in <output_dir>/.nra-manifest.json
+incremental: true
+
+# Cache generated cell function results in <output_dir>/.nra_memo
+memoize: false      # size cap: NRA_MEMO_MAX_MB (default 1024); clear with: nra memo clear
+
+# Generated run_all runs independent cells in a thread pool (workers: NRA_WORKERS)
+parallel: false
+
+# Import third-party modules inside the generated functions instead of at module top
+lazy_imports: false
+
+# Memory: per-node tracemalloc peaks in .reports/report.json, and an abort threshold
+trace_memory: false
+memory_budget_mb: 0      # polled while each node runs; 0 = no limit
+
+# Pipeline executor: langgraph, or native (same nodes and state rules, no LangGraph)
+engine: langgraph
 """
 
 
@@ -207,5 +610,19 @@ def config_init(
     typer.echo(f"Wrote {path}")
 
 
+# -----------------------
+# memo subcommands
+# -----------------------
+
+
+@typed_command_for(memo_app, name="clear")
+def memo_clear(output_dir: Path = Path("out_pkg")) -> None:
+    """Delete the memoized cell results of a generated package."""
+    from .agent.nodes.refactor_runtime import clear_memo
+
+    files, size = clear_memo(output_dir)
+    typer.echo(f"Removed {files} memo file(s), {size / 1024:.1f} KiB from {output_dir}")
+
+
 if __name__ == "__main__":
     app()
@@ -2,24 +2,22 @@ from __future__ import annotations
 
 import argparse
 import ast
+from concurrent.futures import ProcessPoolExecutor
 import csv
 from datetime import datetime
 import json
+import os
 from pathlib import Path
-import subprocess
 import sys
 import time
 from typing import Any
 
 import yaml
 
-from ..agent.graph import build_graph
-
-
-def _run(cmd: list[str], cwd: Path | None = None) -> tuple[int, str, str]:
-    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, text=True)
-    out, err = p.communicate()
-    return p.returncode, out, err
+from ..agent.tracing import start_profile, stop_profile, write_profile_report
+from ..batch import compiled_graph, init_worker
+from ..llm.cache import cache_stats
+from ..tracing import span, start_trace, stop_trace, write_trace
 
 
 def _count_functions(py_file: Path) -> int:
@@ -71,60 +69,113 @@ def _evaluate(accept: dict[str, Any], metrics: dict[str, Any]) -> bool:
     return ok
 
 
-def run_suite(suite_path: Path) -> int:
+def _run_case(
+    case: dict[str, Any], base: Path, trace: bool = False, profile: Path | None = None
+) -> tuple[dict[str, Any], dict[str, Any], list[dict[str, Any]], dict[str, int]]:
+    """Refactor one case and score it.
+
+    Returns its table row, summary entry, trace events and the LLM cache counters
+    it added; counters live per process, so with ``--jobs`` only the worker sees them.
+    """
+    before = cache_stats()
+    if trace:
+        start_trace(f"eval worker {os.getpid()}")
+    try:
+        with span(str(case["id"]), cat="case"):
+            row, entry = _score_case(case, base, profile)
+    finally:
+        tracer = stop_trace()
+    cache = {k: v - before.get(k, 0) for k, v in cache_stats().items()}
+    return row, entry, tracer.events if tracer is not None else [], cache
+
+
+def _score_case(
+    case: dict[str, Any], base: Path, profile: Path | None = None
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    case_id = str(case["id"])
+    nb_path = Path(case["input"])
+    out_dir = base / case_id
+    t0 = time.monotonic()
+    # The critic formats/fixes the output first, so its checks are the ones we score.
+    state = {"input_nb": str(nb_path), "output_dir": str(out_dir), "autofix": True}
+    if profile is not None:
+        start_profile(profile / case_id)
+    try:
+        final_state: dict[str, Any] = compiled_graph().invoke(state)
+    finally:
+        stop_profile()
+    critic = final_state.get("metrics", {}) or {}
+    if profile is not None:
+        write_profile_report(
+            profile / case_id,
+            out_dir / ".reports" / "profile.txt",
+            nodes=critic.get("nodes"),
+            total_seconds=time.monotonic() - t0,
+        )
+    pytest_rc = int(critic.get("pytest_returncode", 1))
+    ruff_rc = int(critic.get("ruff_returncode", 1))
+    black_rc = int(critic.get("black_returncode", 1))
+    mypy_rc = int(critic.get("mypy_returncode", 1))
+
+    mod_path = out_dir / "src_pkg" / "module.py"
+    fn_count = _count_functions(mod_path)
+    py_files = list(out_dir.rglob("*.py"))
+    dt = time.monotonic() - t0
+
+    metrics = {
+        "pytest_returncode": pytest_rc,
+        "ruff_returncode": ruff_rc,
+        "black_returncode": black_rc,
+        "mypy_returncode": mypy_rc,
+        "function_count": fn_count,
+        "file_count": len(py_files),
+        "seconds": dt,
+    }
+    passed = _evaluate(case.get("acceptance", {}), metrics)
+    row = {
+        "case": case_id,
+        "pass": passed,
+        "secs": dt,
+        "pytest": pytest_rc,
+        "ruff": ruff_rc,
+        "black": black_rc,
+        "mypy": mypy_rc,
+        "funcs": fn_count,
+        "files": len(py_files),
+    }
+    return row, {"id": case_id, "metrics": metrics, "passed": passed}
+
+
+def run_suite(
+    suite_path: Path, jobs: int = 1, trace: Path | None = None, profile: Path | None = None
+) -> int:
     cfg = yaml.safe_load(suite_path.read_text())
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
     base = Path(cfg.get("run_root", "eval_runs")) / ts
     base.mkdir(parents=True, exist_ok=True)
-    rows: list[dict[str, Any]] = []
-    summary: dict[str, Any] = {"run_root": str(base), "cases": []}
-    for case in cfg.get("cases", []):
-        case_id = str(case["id"])
-        nb_path = Path(case["input"])
-        out_dir = base / case_id
-        t0 = time.monotonic()
-        app = build_graph()
-        state = {"input_nb": str(nb_path), "output_dir": str(out_dir)}
-        app.invoke(state)
-
-        _run(["black", str(out_dir)])
-        _run(["ruff", "check", str(out_dir), "--fix"])
-
-        pytest_rc, _, _ = _run(["pytest", "-q", str(out_dir / "tests")])
-        ruff_rc, _, _ = _run(["ruff", "check", str(out_dir)])
-        black_rc, _, _ = _run(["black", "--check", str(out_dir)])
-        mypy_rc, _, _ = _run(["mypy", str(out_dir)])
-
-        mod_path = out_dir / "src_pkg" / "module.py"
-        fn_count = _count_functions(mod_path)
-        py_files = list(out_dir.rglob("*.py"))
-        dt = time.monotonic() - t0
-
-        metrics = {
-            "pytest_returncode": pytest_rc,
-            "ruff_returncode": ruff_rc,
-            "black_returncode": black_rc,
-            "mypy_returncode": mypy_rc,
-            "function_count": fn_count,
-            "file_count": len(py_files),
-            "seconds": dt,
-        }
-        passed = _evaluate(case.get("acceptance", {}), metrics)
-        rows.append(
-            {
-                "case": case_id,
-                "pass": passed,
-                "secs": dt,
-                "pytest": pytest_rc,
-                "ruff": ruff_rc,
-                "black": black_rc,
-                "mypy": mypy_rc,
-                "funcs": fn_count,
-                "files": len(py_files),
-            }
-        )
-        summary["cases"].append({"id": case_id, "metrics": metrics, "passed": passed})
-
+    cases: list[dict[str, Any]] = list(cfg.get("cases", []))
+    if jobs > 1 and len(cases) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(cases)), initializer=init_worker) as ex:
+            # map() yields in submission order, so the summary stays in case order.
+            n = len(cases)
+            outcomes = list(
+                ex.map(_run_case, cases, [base] * n, [trace is not None] * n, [profile] * n)
+            )
+    else:
+        outcomes = [_run_case(case, base, trace is not None, profile) for case in cases]
+    rows = [row for row, _, _, _ in outcomes]
+    summary: dict[str, Any] = {"run_root": str(base), "cases": [c for _, c, _, _ in outcomes]}
+    if trace is not None:
+        write_trace(trace, [e for _, _, events, _ in outcomes for e in events])
+    if profile is not None:
+        # Per-case summaries sit in each case's .reports/; this one merges all cases.
+        write_profile_report(profile, base / "profile.txt")
+
+    llm_cache = dict.fromkeys(cache_stats(), 0)
+    for _, _, _, cache in outcomes:
+        for k, v in cache.items():
+            llm_cache[k] = llm_cache.get(k, 0) + v
+    summary["llm_cache"] = llm_cache
     (base / "summary.json").write_text(json.dumps(summary, indent=2))
     with (base / "summary.csv").open("w", newline="") as f:
         w = csv.writer(f)
@@ -163,8 +214,16 @@ def main() -> None:
 
     p = argparse.ArgumentParser()
     p.add_argument("suite", nargs="?", default="eval/suite.yaml")
+    p.add_argument("--jobs", "-j", type=int, default=1, help="cases run in parallel processes")
+    p.add_argument("--trace", type=Path, default=None, help="write Chrome trace-event JSON")
+    p.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="cProfile each node into DIR/<case>/<node>.pstats",
+    )
     args = p.parse_args()
-    rc = run_suite(Path(args.suite))
+    rc = run_suite(Path(args.suite), jobs=args.jobs, trace=args.trace, profile=args.profile)
     sys.exit(rc)
 
 
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from ..tracing import span
+from .interfaces import LLMClient
+
+
+async def achat(
+    llm: LLMClient,
+    messages: list[dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    extra: dict[str, Any] | None = None,
+) -> tuple[str, dict[str, Any]]:
+    """Await ``llm.achat`` when the client has one, else run ``llm.chat`` in a thread."""
+    native = getattr(llm, "achat", None)
+    if native is not None:
+        text, meta = await native(messages, model, temperature, max_tokens, extra)
+        return str(text), dict(meta)
+    return await asyncio.to_thread(llm.chat, messages, model, temperature, max_tokens, extra)
+
+
+async def _chat_many(
+    llm: LLMClient,
+    requests: list[list[dict[str, str]]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    concurrency: int,
+) -> list[tuple[str, dict[str, Any]]]:
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i: int, messages: list[dict[str, str]]) -> tuple[str, dict[str, Any]]:
+        async with sem:
+            # Requests overlap on one thread, so each gets its own trace track.
+            with span("llm.achat", cat="llm", track=f"llm request {i}", model=model):
+                return await achat(llm, messages, model, temperature, max_tokens)
+
+    return list(await asyncio.gather(*(one(i, m) for i, m in enumerate(requests))))
+
+
+def chat_many(
+    llm: LLMClient,
+    requests: list[list[dict[str, str]]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    concurrency: int = 4,
+) -> list[tuple[str, dict[str, Any]]]:
+    """Send several independent chats concurrently; results keep the order of ``requests``."""
+    return asyncio.run(_chat_many(llm, requests, model, temperature, max_tokens, concurrency))
@@ -1,27 +1,244 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 import hashlib
 import json
+import os
 from pathlib import Path
+import sqlite3
+import threading
+import time
 from typing import Any
+import zlib
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access);
+"""
+
+
+@dataclass(slots=True)
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+    bytes_saved: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        d = asdict(self)
+        d["hits"] = self.memory_hits + self.disk_hits
+        return d
+
+
+class _MemoryTier:
+    """Process-wide LRU of decoded responses, bounded by the size of the response texts."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], tuple[str, dict[str, Any]]] = OrderedDict()
+        self._bytes = 0
+        # Disk recency updates for memory hits, flushed with the next write to that store.
+        self._touched: dict[tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str]) -> tuple[str, dict[str, Any]] | None:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self._touched[key] = time.time()
+            return hit
+
+    def pop_touched(self, store: str) -> list[tuple[float, str]]:
+        with self._lock:
+            keys = [k for k in self._touched if k[0] == store]
+            return [(self._touched.pop(k), k[1]) for k in keys]
+
+    def put(self, key: tuple[str, str], value: tuple[str, dict[str, Any]]) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = value
+            self._bytes += len(value[0])
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (text, _meta) = self._entries.popitem(last=False)
+                self._bytes -= len(text)
+                _STATS.memory_evictions += 1
+
+    def discard(self, keys: list[tuple[str, str]]) -> None:
+        with self._lock:
+            for key in keys:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= len(old[0])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            self._bytes = 0
+
+
+_STATS = CacheStats()
+_MEMORY = _MemoryTier(DEFAULT_MEMORY_BYTES)
+
+
+def cache_stats() -> dict[str, int]:
+    """Return this process's LLM cache counters (both tiers, all cache dirs)."""
+    return _STATS.as_dict()
+
+
+def reset_cache_stats(clear_memory: bool = False) -> None:
+    global _STATS
+    _STATS = CacheStats()
+    if clear_memory:
+        _MEMORY.clear()
 
 
 class LLMCache:
-    def __init__(self, root: Path) -> None:
+    """Single-file SQLite (WAL) store of LLM responses keyed by prompt hash.
+
+    Payloads are zlib-compressed JSON. When the compressed total exceeds
+    ``max_bytes`` the least recently used entries are evicted. Each process
+    opens its own connection, so parallel batch workers can share one cache.
+    Legacy ``<sha256>.json`` files found in ``root`` are imported on open.
+
+    Reads go through a process-wide in-memory LRU first; hits, misses,
+    evictions and bytes saved are counted in :func:`cache_stats`.
+    """
+
+    DB_NAME = "cache.sqlite3"
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
         self.root = root
         self.root.mkdir(parents=True, exist_ok=True)
+        self.path = self.root / self.DB_NAME
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_json_files()
+
+    @staticmethod
+    def _hash(provider: str, model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{provider}|{model}|{prompt}".encode()).hexdigest()
 
-    def _key(self, provider: str, model: str, prompt: str) -> Path:
-        h = hashlib.sha256(f"{provider}|{model}|{prompt}".encode()).hexdigest()
-        return self.root / f"{h}.json"
+    @staticmethod
+    def _encode(text: str, meta: dict[str, Any]) -> bytes:
+        raw = json.dumps({"text": text, "meta": meta}, separators=(",", ":")).encode()
+        return zlib.compress(raw, 6)
+
+    @staticmethod
+    def _decode(payload: bytes) -> tuple[str, dict[str, Any]]:
+        d = json.loads(zlib.decompress(payload))
+        return d["text"], d["meta"]
 
     def get(self, provider: str, model: str, prompt: str) -> tuple[str, dict[str, Any]] | None:
-        p = self._key(provider, model, prompt)
-        if not p.exists():
+        key = self._hash(provider, model, prompt)
+        hit = _MEMORY.get((str(self.path), key))
+        if hit is not None:
+            _STATS.memory_hits += 1
+            _STATS.bytes_saved += len(hit[0].encode())
+            return hit
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+        if row is None:
+            _STATS.misses += 1
             return None
-        d = json.loads(p.read_text())
-        return d["text"], d["meta"]
+        value = self._decode(row[0])
+        _MEMORY.put((str(self.path), key), value)
+        _STATS.disk_hits += 1
+        _STATS.bytes_saved += len(value[0].encode())
+        return value
 
     def put(self, provider: str, model: str, prompt: str, text: str, meta: dict[str, Any]) -> None:
-        p = self._key(provider, model, prompt)
-        p.write_text(json.dumps({"text": text, "meta": meta}, indent=2))
+        payload = self._encode(text, meta)
+        key = self._hash(provider, model, prompt)
+        self._store([(key, payload, len(payload), time.time())])
+        _MEMORY.put((str(self.path), key), (text, meta))
+
+    def _store(self, rows: list[tuple[str, bytes, int, float]], replace: bool = True) -> None:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    _MEMORY.pop_touched(str(self.path)),
+                )
+                self._conn.executemany(
+                    f"{verb} INTO entries (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+        excess = int(total) - self.max_bytes
+        if excess <= 0:
+            return
+        doomed: list[tuple[str]] = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            doomed.append((key,))
+            excess -= int(size)
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        _STATS.disk_evictions += len(doomed)
+        _MEMORY.discard([(str(self.path), k) for (k,) in doomed])
+
+    def _migrate_json_files(self) -> None:
+        """Import entries from the old one-JSON-file-per-prompt layout, then remove the files."""
+        with os.scandir(self.root) as it:
+            legacy = [e for e in it if e.is_file() and e.name.endswith(".json")]
+        if not legacy:
+            return
+        rows: list[tuple[str, bytes, int, float]] = []
+        migrated: list[Path] = []
+        for entry in legacy:
+            try:
+                d = json.loads(Path(entry.path).read_text())
+                payload = self._encode(d["text"], d["meta"])
+                rows.append(
+                    (entry.name[: -len(".json")], payload, len(payload), entry.stat().st_mtime)
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            migrated.append(Path(entry.path))
+        # A concurrent opener may have imported the same files already; keep its rows.
+        self._store(rows, replace=False)
+        for p in migrated:
+            p.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return int(n)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
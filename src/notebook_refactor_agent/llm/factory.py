@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+
 from .interfaces import LLMClient
 
 # Keep a small registry just for help text / validation
@@ -12,6 +14,17 @@ _SUPPORTED: dict[str, list[str]] = {
 }
 
 
+# Extra providers registered at runtime (benchmarks, tests, plugins).
+_REGISTRY: dict[str, Callable[[], LLMClient]] = {}
+
+
+def register_llm(provider: str, factory: Callable[[], LLMClient], models: list[str]) -> None:
+    """Make ``create_llm(provider)`` return ``factory()``; replaces an earlier registration."""
+    prov = provider.strip().lower()
+    _REGISTRY[prov] = factory
+    _SUPPORTED[prov] = list(models)
+
+
 def supported_models_help() -> str:
     parts: list[str] = []
     for prov, models in _SUPPORTED.items():
@@ -26,6 +39,8 @@ def create_llm(provider: str) -> LLMClient:
     (e.g., CI eval runs) don't need optional dependencies installed.
     """
     prov = (provider or "none").strip().lower()
+    if prov in _REGISTRY:
+        return _REGISTRY[prov]()
     if prov == "groq":
         # Lazy import to avoid requiring 'groq' unless actually used.
         from .groq_client import GroqLLM  # local import
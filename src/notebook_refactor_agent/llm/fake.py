@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+from collections.abc import Callable, Iterator
 from typing import Any
 
 
 class FakeLLM:
-    def __init__(self, goldens: dict[str, str]) -> None:
+    """Replays golden replies keyed by the last message; anything else gets ``default``.
+
+    ``default`` may be a function of the messages, to answer prompts that are not
+    known in advance (e.g. generated notebooks in benchmarks).
+    """
+
+    def __init__(
+        self,
+        goldens: dict[str, str],
+        chunk_chars: int = 16,
+        default: str | Callable[[list[dict[str, str]]], str] = "",
+    ) -> None:
         self.goldens: dict[str, str] = goldens
+        self.chunk_chars = max(1, chunk_chars)
+        self.default = default
 
     def chat(
         self,
@@ -16,4 +30,33 @@ class FakeLLM:
         extra: dict[str, Any] | None = None,
     ) -> tuple[str, dict[str, Any]]:
         prompt = messages[-1]["content"] if messages else ""
-        return self.goldens.get(prompt, ""), {"tokens_prompt": 0, "tokens_completion": 0}
+        meta: dict[str, Any] = {"tokens_prompt": 0, "tokens_completion": 0}
+        if prompt in self.goldens:
+            return self.goldens[prompt], meta
+        reply = self.default(messages) if callable(self.default) else self.default
+        return reply, meta
+
+    def chat_stream(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+        meta_out: dict[str, Any] | None = None,
+    ) -> Iterator[str]:
+        text, meta = self.chat(messages, model, temperature, max_tokens, extra)
+        for i in range(0, len(text), self.chunk_chars):
+            yield text[i : i + self.chunk_chars]
+        if meta_out is not None:
+            meta_out.update(meta)
+
+    async def achat(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+    ) -> tuple[str, dict[str, Any]]:
+        return self.chat(messages, model, temperature, max_tokens, extra)
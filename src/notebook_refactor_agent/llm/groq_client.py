@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 import os
 from typing import Any
 
@@ -21,6 +22,15 @@ def _normalize_model(name: str) -> tuple[str, bool]:
     return new, (new != name)
 
 
+class _UsageView:
+    """Adapts a streamed chunk's usage to the shape ``GroqLLM._meta`` expects."""
+
+    def __init__(self, id: str, model: str, usage: Any) -> None:
+        self.id = id
+        self.model = model
+        self.usage = usage
+
+
 class GroqLLM(LLMClient):
     """Thin Groq chat client wrapper with minimal, typed surface."""
 
@@ -29,6 +39,20 @@ class GroqLLM(LLMClient):
         if not api_key:
             raise RuntimeError("GROQ_API_KEY is not set")
         self.client = Groq(api_key=api_key)
+        self._api_key = api_key
+        self._aclient: Any = None
+
+    @staticmethod
+    def _meta(resp: Any) -> dict[str, Any]:
+        return {
+            "id": resp.id,
+            "model": resp.model,
+            "usage": {
+                "prompt_tokens": int(getattr(resp.usage, "prompt_tokens", 0) or 0),
+                "completion_tokens": int(getattr(resp.usage, "completion_tokens", 0) or 0),
+                "total_tokens": int(getattr(resp.usage, "total_tokens", 0) or 0),
+            },
+        }
 
     def chat(
         self,
@@ -46,13 +70,57 @@ class GroqLLM(LLMClient):
             max_tokens=max_tokens,
         )
         text = resp.choices[0].message.content or ""
-        meta = {
-            "id": resp.id,
-            "model": resp.model,
-            "usage": {
-                "prompt_tokens": int(getattr(resp.usage, "prompt_tokens", 0) or 0),
-                "completion_tokens": int(getattr(resp.usage, "completion_tokens", 0) or 0),
-                "total_tokens": int(getattr(resp.usage, "total_tokens", 0) or 0),
-            },
-        }
-        return text, meta
+        return text, self._meta(resp)
+
+    def chat_stream(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+        meta_out: dict[str, Any] | None = None,
+    ) -> Iterator[str]:
+        model_norm, _ = _normalize_model(model)
+        stream = self.client.chat.completions.create(
+            model=model_norm,
+            messages=[{"role": m["role"], "content": m["content"]} for m in messages],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                if meta_out is not None:
+                    # Groq reports usage on the final chunk under ``x_groq``.
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        meta_out.update(self._meta(_UsageView(chunk.id, chunk.model, usage)))
+                if chunk.choices:
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+        finally:
+            stream.close()
+
+    async def achat(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+    ) -> tuple[str, dict[str, Any]]:
+        if self._aclient is None:
+            from groq import AsyncGroq
+
+            self._aclient = AsyncGroq(api_key=self._api_key)
+        model_norm, _ = _normalize_model(model)
+        resp = await self._aclient.chat.completions.create(
+            model=model_norm,
+            messages=[{"role": m["role"], "content": m["content"]} for m in messages],
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+        text = resp.choices[0].message.content or ""
+        return text, self._meta(resp)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
 from typing import Any, Protocol
 
 
@@ -13,3 +14,30 @@ class LLMClient(Protocol):
         extra: dict[str, Any] | None = None,
     ) -> tuple[str, dict[str, Any]]:
         pass
+
+    def chat_stream(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+        meta_out: dict[str, Any] | None = None,
+    ) -> Iterator[str]:
+        """Yield completion text deltas; fill ``meta_out`` (id/model/usage) once finished.
+
+        Closing the iterator early stops the generation.
+        """
+        pass
+
+
+class AsyncLLMClient(Protocol):
+    async def achat(
+        self,
+        messages: list[dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        extra: dict[str, Any] | None = None,
+    ) -> tuple[str, dict[str, Any]]:
+        pass
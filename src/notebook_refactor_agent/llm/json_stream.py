@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+# Longest prose / ``` fence we tolerate before the top-level object starts.
+MAX_PREAMBLE = 4096
+
+_STRING_RUN_RE = re.compile(r'[^"\\]+')
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+_LITERALS = ("true", "false", "null")
+_WS = frozenset(" \t\r\n")
+
+
+class _Container:
+    __slots__ = ("kind", "state", "key", "is_files")
+
+    def __init__(self, kind: str, state: str, is_files: bool = False) -> None:
+        self.kind = kind  # "obj" | "arr"
+        self.state = state
+        self.key: str | None = None
+        self.is_files = is_files
+
+
+class FilesStreamParser:
+    """Incremental parser for the refactor agent's ``{"files": {path: code}, ...}`` reply.
+
+    Feed it text deltas as they arrive; :meth:`feed` returns each ``(path, code)``
+    entry of the top-level ``files`` object as soon as its string is complete.
+    Top-level string fields (``module_path`` etc.) are collected in ``fields``.
+    ``failed`` turns true as soon as the text can no longer be a JSON object;
+    raw newlines inside strings are tolerated, like the non-streaming fallback.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, Any] = {}
+        self.files: dict[str, str] = {}
+        self.failed = False
+        self.error = ""
+        self._why = ""
+        self.done = False
+        self.files_complete = False
+        self._stack: list[_Container] = []
+        self._started = False
+        self._preamble = 0
+        self._seen = 0
+        # current scalar token
+        self._mode = ""  # "" | "str" | "num" | "lit"
+        self._buf: list[str] = []
+        self._escape = False
+        self._is_key = False
+
+    # ------------------------------------------------------------------ #
+    def feed(self, text: str) -> list[tuple[str, str]]:
+        out: list[tuple[str, str]] = []
+        i, n = 0, len(text)
+        while i < n and not self.failed and not self.done:
+            if self._mode == "str":
+                i = self._feed_string(text, i, out)
+                continue
+            ch = text[i]
+            if self._mode == "num":
+                if ch in _NUMBER_CHARS:
+                    self._buf.append(ch)
+                    i += 1
+                    continue
+                self._end_number(out)
+                continue  # re-dispatch ``ch``
+            if self._mode == "lit":
+                self._buf.append(ch)
+                word = "".join(self._buf)
+                if not any(lit.startswith(word) for lit in _LITERALS):
+                    self._fail(f"invalid literal {word!r}")
+                elif word in _LITERALS:
+                    self._mode = ""
+                    self._value_done(json.loads(word), out)
+                i += 1
+                continue
+            self._feed_structural(ch, out)
+            i += 1
+        if self.failed and not self.error:
+            self.error = f"{self._why} at char {self._seen + i}"
+        self._seen += n
+        return out
+
+    # ------------------------------------------------------------------ #
+    def _fail(self, why: str) -> None:
+        self.failed = True
+        self._why = why
+
+    def _feed_string(self, text: str, i: int, out: list[tuple[str, str]]) -> int:
+        if self._escape:
+            self._buf.append(text[i])
+            self._escape = False
+            return i + 1
+        m = _STRING_RUN_RE.match(text, i)
+        if m:
+            self._buf.append(m.group())
+            return m.end()
+        ch = text[i]
+        if ch == "\\":
+            self._buf.append(ch)
+            self._escape = True
+            return i + 1
+        # closing quote
+        self._mode = ""
+        raw = "".join(self._buf)
+        self._buf = []
+        try:
+            value = json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            self._fail("invalid string escape")
+            return i + 1
+        if self._is_key:
+            top = self._stack[-1]
+            top.key = value
+            top.state = "colon"
+        else:
+            self._value_done(value, out)
+        return i + 1
+
+    def _end_number(self, out: list[tuple[str, str]]) -> None:
+        word = "".join(self._buf)
+        self._buf = []
+        self._mode = ""
+        try:
+            value = json.loads(word)
+        except ValueError:
+            self._fail(f"invalid number {word!r}")
+            return
+        self._value_done(value, out)
+
+    def _feed_structural(self, ch: str, out: list[tuple[str, str]]) -> None:
+        if not self._started:
+            if ch == "{":
+                self._started = True
+                self._stack.append(_Container("obj", "key_or_end"))
+            else:
+                self._preamble += 1
+                if self._preamble > MAX_PREAMBLE:
+                    self._fail("no JSON object found")
+            return
+        if ch in _WS:
+            return
+        top = self._stack[-1]
+        st = top.state
+        if top.kind == "obj":
+            if st in ("key_or_end", "key"):
+                if ch == '"':
+                    self._start_string(is_key=True)
+                elif ch == "}" and st == "key_or_end":
+                    self._close(out)
+                else:
+                    self._fail(f"expected object key, got {ch!r}")
+            elif st == "colon":
+                if ch == ":":
+                    top.state = "value"
+                else:
+                    self._fail(f"expected ':', got {ch!r}")
+            elif st == "value":
+                self._start_value(ch, out)
+            elif st == "comma_or_end":
+                if ch == ",":
+                    top.state = "key"
+                elif ch == "}":
+                    self._close(out)
+                else:
+                    self._fail(f"expected ',' or '}}', got {ch!r}")
+        else:
+            if st == "value_or_end" and ch == "]":
+                self._close(out)
+            elif st in ("value_or_end", "value"):
+                self._start_value(ch, out)
+            elif st == "comma_or_end":
+                if ch == ",":
+                    top.state = "value"
+                elif ch == "]":
+                    self._close(out)
+                else:
+                    self._fail(f"expected ',' or ']', got {ch!r}")
+
+    def _start_string(self, is_key: bool) -> None:
+        self._mode = "str"
+        self._is_key = is_key
+        self._buf = []
+        self._escape = False
+
+    def _start_value(self, ch: str, out: list[tuple[str, str]]) -> None:
+        if ch == '"':
+            self._start_string(is_key=False)
+        elif ch == "{":
+            parent = self._stack[-1]
+            is_files = len(self._stack) == 1 and parent.key == "files"
+            self._stack.append(_Container("obj", "key_or_end", is_files=is_files))
+        elif ch == "[":
+            self._stack.append(_Container("arr", "value_or_end"))
+        elif ch in _NUMBER_CHARS and ch not in "+.eE":
+            self._mode = "num"
+            self._buf = [ch]
+        elif ch in "tfn":
+            self._mode = "lit"
+            self._buf = [ch]
+        else:
+            self._fail(f"unexpected {ch!r} where a value was expected")
+
+    def _value_done(self, value: Any, out: list[tuple[str, str]]) -> None:
+        top = self._stack[-1]
+        if top.kind == "obj" and top.key is not None:
+            if top.is_files and isinstance(value, str):
+                self.files[top.key] = value
+                out.append((top.key, value))
+            elif len(self._stack) == 1 and value is not _CONTAINER:
+                self.fields[top.key] = value
+        top.state = "comma_or_end"
+
+    def _close(self, out: list[tuple[str, str]]) -> None:
+        closed = self._stack.pop()
+        if closed.is_files:
+            self.files_complete = True
+        if not self._stack:
+            self.done = True
+            return
+        self._value_done(_CONTAINER, out)
+
+
+# Sentinel passed for completed nested containers (never a file body).
+_CONTAINER = object()
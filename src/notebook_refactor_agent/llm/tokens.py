@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+import math
+import re
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# Approximates the Llama 3 (tiktoken-style) pre-tokenizer: contractions, letter
+# runs with an optional leading space, 1-3 digit groups, punctuation runs, whitespace.
+_PRETOKEN_RE = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|_+|\s*\n+|[ \t]+"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelProfile:
+    context_window: int
+    max_output_tokens: int
+    # Multiplier applied to the raw estimate, fitted against observed usage.
+    scale: float = 1.0
+
+
+_LLAMA3 = ModelProfile(context_window=131072, max_output_tokens=32768)
+
+_PROFILES: dict[str, ModelProfile] = {
+    "llama-3.3-70b-versatile": _LLAMA3,
+    "llama-3.3-8b-instant": ModelProfile(context_window=131072, max_output_tokens=8192),
+    "llama-3.1-70b-versatile": _LLAMA3,
+    "llama-3.1-8b-instant": ModelProfile(context_window=131072, max_output_tokens=8192),
+}
+
+# Chat templates add a few tokens per message (role header + end-of-turn).
+_PER_MESSAGE = 4
+_PER_REQUEST = 3
+
+# Generated code is usually a bit longer than the fragment it came from
+# (signatures, annotations, returns), plus some fixed JSON scaffolding.
+OUTPUT_RATIO = 1.5
+OUTPUT_OVERHEAD = 64
+
+
+def model_profile(model: str) -> ModelProfile:
+    return _PROFILES.get(model, _LLAMA3)
+
+
+def _piece_tokens(piece: str) -> int:
+    s = piece.strip(" ")
+    if not s or s.isspace():
+        return 1
+    if s[0].isalpha():
+        return 1 if len(s) <= 7 else math.ceil(len(s) / 4)
+    if s[0].isdigit():
+        return 1
+    return math.ceil(len(s) / 2)
+
+
+def estimate_tokens(text: str, model: str = "") -> int:
+    """Offline estimate of the token count of ``text`` for ``model``."""
+    if not text:
+        return 0
+    raw = sum(_piece_tokens(m.group()) for m in _PRETOKEN_RE.finditer(text))
+    return max(1, round(raw * model_profile(model).scale))
+
+
+def estimate_messages_tokens(messages: Sequence[dict[str, str]], model: str = "") -> int:
+    """Estimate prompt tokens of a chat request, including per-message template overhead."""
+    body = sum(estimate_tokens(m.get("content", ""), model) + _PER_MESSAGE for m in messages)
+    return body + _PER_REQUEST
+
+
+def estimate_output_tokens(fragment_tokens: int) -> int:
+    return math.ceil(fragment_tokens * OUTPUT_RATIO) + OUTPUT_OVERHEAD
+
+
+def input_budget(model: str, max_output_tokens: int, token_budget: int = 0) -> int:
+    """Prompt tokens available once ``max_output_tokens`` is reserved.
+
+    ``token_budget`` is the input+output budget per request; 0 means the model's context window.
+    """
+    total = token_budget if token_budget > 0 else model_profile(model).context_window
+    return max(1, total - max_output_tokens)
+
+
+def pack_by_budget(
+    items: Sequence[T],
+    cost: Callable[[T], int],
+    input_tokens: int,
+    output_tokens: int,
+    base_cost: int = 0,
+) -> list[list[T]]:
+    """Greedily pack ``items`` (in order) into chunks that fit both budgets.
+
+    A chunk's prompt is ``base_cost`` plus the item costs and must stay within
+    ``input_tokens``; its expected completion (see :func:`estimate_output_tokens`)
+    must stay within ``output_tokens``. An item too large on its own gets its own chunk.
+    """
+    chunks: list[list[T]] = []
+    cur: list[T] = []
+    cur_cost = 0
+    for item in items:
+        c = cost(item)
+        fits_in = base_cost + cur_cost + c <= input_tokens
+        fits_out = estimate_output_tokens(cur_cost + c) <= output_tokens
+        if cur and not (fits_in and fits_out):
+            chunks.append(cur)
+            cur, cur_cost = [], 0
+        cur.append(item)
+        cur_cost += c
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+def usage_record(estimated_prompt: int, meta: dict[str, Any]) -> dict[str, Any]:
+    """Estimated vs provider-reported prompt tokens, for ``llm_calls`` entries."""
+    usage = meta.get("usage", {}) or {}
+    actual = usage.get("prompt_tokens", usage.get("tokens_prompt"))
+    return {
+        "estimated_prompt_tokens": estimated_prompt,
+        "actual_prompt_tokens": int(actual) if actual else None,
+    }
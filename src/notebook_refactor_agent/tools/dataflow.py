@@ -0,0 +1,442 @@
+from __future__ import annotations
+
+import ast
+from dataclasses import dataclass, field
+import sys
+
+# ``try``/``except*`` (ast.TryStar) only exists from Python 3.11 on.
+if sys.version_info >= (3, 11):
+    TRY_NODES: tuple[type[ast.Try | ast.TryStar], ...] = (ast.Try, ast.TryStar)
+else:
+    TRY_NODES = (ast.Try,)
+
+
+@dataclass(frozen=True, slots=True)
+class CellFlow:
+    """Names a cell binds at module level and names it reads before binding them itself.
+
+    ``mutates`` lists upstream names the cell may change in place (``x[i] = ...``,
+    ``x.a = ...``, ``x += ...``, ``x.append(...)``, ``fill(x)``): any method call
+    on a name, and any call taking it as an argument, counts.
+
+    ``imports`` pairs each name the cell's top-level imports bind with the
+    top-level module it comes from (``("plt", "matplotlib")``); ``calls`` lists
+    the upstream names it calls directly (``seed(0)``). Together with
+    ``mutates`` they show which cells touch module state such as ``random.seed``.
+    """
+
+    defs: tuple[str, ...]
+    uses: tuple[str, ...]
+    mutates: tuple[str, ...] = ()
+    imports: tuple[tuple[str, str], ...] = ()
+    calls: tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class DefUseGraph:
+    """Cross-cell dataflow: for each cell, which upstream cell feeds each input name.
+
+    ``inputs[i]`` maps a name read by cell ``i`` to the latest earlier cell that
+    binds it; ``outputs[j]`` lists the names of cell ``j`` some later cell reads.
+    """
+
+    inputs: list[dict[str, int]] = field(default_factory=list)
+    outputs: list[list[str]] = field(default_factory=list)
+
+
+def _targets(node: ast.expr, out: dict[str, None]) -> None:
+    if isinstance(node, ast.Name):
+        out[node.id] = None
+    elif isinstance(node, ast.Tuple | ast.List):
+        for elt in node.elts:
+            _targets(elt, out)
+    elif isinstance(node, ast.Starred):
+        _targets(node.value, out)
+
+
+_SCOPES = (
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.ClassDef,
+    ast.Lambda,
+    ast.ListComp,
+    ast.SetComp,
+    ast.GeneratorExp,
+    ast.DictComp,
+)
+
+
+# Builtins that neither change nor consume (iterate) their arguments.
+_NON_MUTATING = frozenset({"print", "len", "repr", "str", "type", "id", "isinstance", "hash"})
+
+
+def _local_stores(body: list[ast.AST]) -> set[str]:
+    """Names bound directly in a scope's body (nested scopes contribute only their own name)."""
+    local: set[str] = set()
+    declared: set[str] = set()
+    stack = list(body)
+    while stack:
+        n = stack.pop()
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store | ast.Del):
+            local.add(n.id)
+        elif isinstance(n, ast.Global | ast.Nonlocal):
+            declared.update(n.names)
+        if isinstance(n, _SCOPES):
+            if isinstance(n, ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef):
+                local.add(n.name)
+            continue
+        stack.extend(ast.iter_child_nodes(n))
+    return local - declared
+
+
+class _Loads(ast.NodeVisitor):
+    """Free names read by an expression or statement, honouring nested function scopes."""
+
+    def __init__(self) -> None:
+        self.names: dict[str, None] = {}
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self.names[node.id] = None
+
+    def _scope(self, bound: set[str], body: list[ast.AST]) -> None:
+        inner = _Loads()
+        for child in body:
+            inner.visit(child)
+        local = bound | _local_stores(body)
+        for name in inner.names:
+            if name not in local:
+                self.names[name] = None
+
+    def _args(self, args: ast.arguments) -> set[str]:
+        params = {a.arg for a in (*args.posonlyargs, *args.args, *args.kwonlyargs)}
+        params.update(a.arg for a in (args.vararg, args.kwarg) if a is not None)
+        for default in (*args.defaults, *args.kw_defaults):
+            if default is not None:
+                self.visit(default)
+        for a in (*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg):
+            if a is not None and a.annotation is not None:
+                self.visit(a.annotation)
+        return params
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef) -> None:
+        for deco in node.decorator_list:
+            self.visit(deco)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self._scope(self._args(node.args), list(node.body))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node: ast.Lambda) -> None:
+        self._scope(self._args(node.args), [node.body])
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for expr in (*node.decorator_list, *node.bases, *(k.value for k in node.keywords)):
+            self.visit(expr)
+        self._scope(set(), list(node.body))
+
+    def _comprehension(
+        self, node: ast.ListComp | ast.SetComp | ast.GeneratorExp | ast.DictComp
+    ) -> None:
+        gens = node.generators
+        self.visit(gens[0].iter)  # evaluated in the enclosing scope
+        bound: dict[str, None] = {}
+        for g in gens:
+            _targets(g.target, bound)
+        parts: list[ast.AST] = [*(g.iter for g in gens[1:]), *(c for g in gens for c in g.ifs)]
+        if isinstance(node, ast.DictComp):
+            parts += [node.key, node.value]
+        else:
+            parts.append(node.elt)
+        self._scope(set(bound), parts)
+
+    visit_ListComp = _comprehension
+    visit_SetComp = _comprehension
+    visit_GeneratorExp = _comprehension
+    visit_DictComp = _comprehension
+
+
+def _stmt_binds(st: ast.stmt, out: dict[str, None]) -> None:
+    """Module-level names bound by ``st`` (descending into blocks, not into scopes)."""
+    if isinstance(st, ast.FunctionDef | ast.AsyncFunctionDef | ast.ClassDef):
+        out[st.name] = None
+        return
+    if isinstance(st, ast.Assign):
+        for tgt in st.targets:
+            _targets(tgt, out)
+    elif isinstance(st, ast.AugAssign) or (isinstance(st, ast.AnnAssign) and st.value):
+        _targets(st.target, out)
+    elif isinstance(st, ast.For | ast.AsyncFor):
+        _targets(st.target, out)
+    elif isinstance(st, ast.With | ast.AsyncWith):
+        for item in st.items:
+            if item.optional_vars is not None:
+                _targets(item.optional_vars, out)
+    blocks: list[list[ast.stmt]] = [
+        getattr(st, a, None) or [] for a in ("body", "orelse", "finalbody")
+    ]
+    for h in getattr(st, "handlers", None) or ():
+        if h.name:
+            out[h.name] = None
+        blocks.append(h.body)
+    blocks.extend(case.body for case in getattr(st, "cases", None) or ())
+    for block in blocks:
+        for sub in block:
+            _stmt_binds(sub, out)
+
+
+class _Flow:
+    """Walks a cell's statements in execution order, tracking defs and upstream uses.
+
+    ``defs`` holds every name the cell may bind; ``sure`` only those bound on
+    every path to the current statement, so a name bound in one ``if`` branch
+    or a loop body still reads its upstream value afterwards.
+    """
+
+    def __init__(self) -> None:
+        self.defs: dict[str, None] = {}
+        self.sure: set[str] = set()
+        self.uses: dict[str, None] = {}
+        self.mutates: dict[str, None] = {}
+        self.imports: dict[str, str] = {}
+        self.called: dict[str, None] = {}
+
+    def _mutated(self, expr: ast.expr) -> None:
+        """Mark the upstream name ``expr`` is rooted at (``x`` in ``x.a[0].b``) as mutated."""
+        while isinstance(expr, ast.Attribute | ast.Subscript | ast.Call):
+            expr = expr.func if isinstance(expr, ast.Call) else expr.value
+        if isinstance(expr, ast.Name) and expr.id not in self.sure:
+            self.mutates[expr.id] = None
+
+    def mutate(self, targets: list[ast.expr]) -> None:
+        for target in targets:
+            for node in ast.walk(target):
+                if isinstance(node, ast.Attribute | ast.Subscript) and isinstance(
+                    node.ctx, ast.Store | ast.Del
+                ):
+                    self._mutated(node.value)
+
+    def calls(self, node: ast.AST) -> None:
+        """Calls may change their object or arguments in place: ``m.fit()``, ``fill(xs)``."""
+        for n in ast.walk(node):
+            if not isinstance(n, ast.Call):
+                continue
+            if isinstance(n.func, ast.Attribute):
+                self._mutated(n.func.value)
+            elif isinstance(n.func, ast.Name) and n.func.id not in self.sure:
+                self.called[n.func.id] = None
+            if isinstance(n.func, ast.Name) and n.func.id in _NON_MUTATING:
+                continue
+            for arg in (*n.args, *(k.value for k in n.keywords)):
+                if isinstance(arg, ast.Starred):
+                    arg = arg.value
+                if isinstance(arg, ast.Name | ast.Attribute | ast.Subscript):
+                    self._mutated(arg)
+
+    def read(self, *nodes: ast.AST | None) -> None:
+        loads = _Loads()
+        for node in nodes:
+            if node is not None:
+                loads.visit(node)
+                self.calls(node)
+        for name in loads.names:
+            if name not in self.sure:
+                self.uses[name] = None
+
+    def define(self, names: dict[str, None]) -> None:
+        self.defs.update(names)
+        self.sure.update(names)
+
+    def bind(self, target: ast.expr | None) -> None:
+        if target is not None:
+            bound: dict[str, None] = {}
+            _targets(target, bound)
+            self.define(bound)
+
+    def block(self, stmts: list[ast.stmt], top: bool = False) -> None:
+        for st in stmts:
+            self.stmt(st, top)
+
+    def stmt(self, st: ast.stmt, top: bool = False) -> None:
+        if isinstance(st, ast.Import | ast.ImportFrom):
+            for alias in st.names:
+                if alias.name == "*":
+                    continue
+                bound = alias.asname or alias.name.split(".")[0]
+                if not top:
+                    self.define({bound: None})
+                    continue
+                # Top-level imports are hoisted to module level; remember the module.
+                module = st.module if isinstance(st, ast.ImportFrom) else alias.name
+                if module and not getattr(st, "level", 0):
+                    self.imports[bound] = module.split(".")[0]
+        elif isinstance(st, ast.For | ast.AsyncFor | ast.While):
+            # The body may run zero times and ``break`` skips the ``else``, so
+            # nothing bound in either is bound for sure afterwards.
+            start = set(self.sure)
+            if isinstance(st, ast.While):
+                self.read(st.test)
+            else:
+                self.read(st.iter)
+                self.bind(st.target)
+            self.block(st.body)
+            self.block(st.orelse)
+            self.sure = start
+        elif isinstance(st, ast.If):
+            self.read(st.test)
+            start = set(self.sure)
+            self.block(st.body)
+            taken = self.sure
+            self.sure = start
+            self.block(st.orelse)
+            self.sure &= taken
+        elif isinstance(st, ast.With | ast.AsyncWith):
+            for item in st.items:
+                self.read(item.context_expr)
+                self.bind(item.optional_vars)
+            self.block(st.body)
+        elif isinstance(st, TRY_NODES):
+            # A handler may start anywhere in the body, so it only relies on
+            # what was bound before the ``try``.
+            start = set(self.sure)
+            self.block(st.body)
+            self.block(st.orelse)
+            ends = [self.sure]
+            for h in st.handlers:
+                self.sure = set(start)
+                self.read(h.type)
+                if h.name:
+                    self.define({h.name: None})
+                self.block(h.body)
+                ends.append(self.sure)
+            self.sure = set.intersection(*ends)
+            self.block(st.finalbody)
+        elif isinstance(st, ast.Match):
+            self.read(st.subject)
+            start = set(self.sure)
+            last = st.cases[-1]
+            catch_all = (
+                isinstance(last.pattern, ast.MatchAs)
+                and last.pattern.pattern is None
+                and last.guard is None
+            )
+            ends = [] if catch_all else [start]  # otherwise no case may match
+            for case in st.cases:
+                self.sure = set(start)
+                captured: dict[str, None] = {}
+                for n in ast.walk(case.pattern):
+                    name = getattr(n, "name", None)
+                    if isinstance(name, str):
+                        captured[name] = None
+                self.define(captured)
+                self.read(case.guard)
+                self.block(case.body)
+                ends.append(self.sure)
+            self.sure = set.intersection(*ends)
+        else:
+            if isinstance(st, ast.AugAssign) and isinstance(st.target, ast.Name):
+                if st.target.id not in self.sure:
+                    self.uses[st.target.id] = None  # ``x += 1`` reads x
+                    self.mutates[st.target.id] = None  # and may update it in place
+            if isinstance(st, ast.Assign | ast.Delete):
+                self.mutate(st.targets)
+            elif isinstance(st, ast.AugAssign | ast.AnnAssign):
+                self.mutate([st.target])
+            self.read(st)
+            binds: dict[str, None] = {}
+            _stmt_binds(st, binds)
+            self.define(binds)
+
+
+def cell_flow(tree: ast.Module) -> CellFlow:
+    """Defs and upstream uses of one parsed cell; top-level imports are ignored.
+
+    Statements are followed in execution order, so ``x = 1; print(x)`` does
+    not read an upstream ``x`` while ``x = x + 1`` does.
+    """
+    flow = _Flow()
+    flow.block(tree.body, top=True)
+    # A name the cell binds on some paths only keeps its upstream value on the
+    # others, so the cell reads it too.
+    for name in flow.defs:
+        if name not in flow.sure:
+            flow.uses[name] = None
+    return CellFlow(
+        defs=tuple(flow.defs),
+        uses=tuple(flow.uses),
+        mutates=tuple(flow.mutates),
+        imports=tuple(flow.imports.items()),
+        calls=tuple(flow.called),
+    )
+
+
+def def_use_graph(flows: list[CellFlow | None]) -> DefUseGraph:
+    """Resolve each use to the latest earlier cell defining it, in one pass over the cells.
+
+    ``None`` marks a cell that could not be analysed; it neither feeds nor reads anything.
+    """
+    last_def: dict[str, int] = {}
+    graph = DefUseGraph(inputs=[{} for _ in flows], outputs=[[] for _ in flows])
+    used: list[set[str]] = [set() for _ in flows]
+    for i, flow in enumerate(flows):
+        if flow is None:
+            continue
+        for name in flow.uses:
+            src = last_def.get(name)
+            if src is not None:
+                graph.inputs[i][name] = src
+                used[src].add(name)
+        for name in flow.defs:
+            last_def[name] = i
+    for j, flow in enumerate(flows):
+        if flow is not None:
+            graph.outputs[j] = [n for n in flow.defs if n in used[j]]
+    return graph
+
+
+def cell_deps(flows: list[CellFlow | None], graph: DefUseGraph) -> list[tuple[int, ...]]:
+    """Earlier cells each cell must wait for when independent cells run concurrently.
+
+    Besides the data edges of ``graph``, a cell mutating a value in place stays
+    ordered against every other reader of that value. Cells calling into an
+    imported module (``random.seed(0)``, ``plt.plot(...)``, ``seed(0)`` after
+    ``from random import seed``) may change its global state, so they keep their
+    notebook order per module. A cell that could not be analysed is a barrier:
+    it waits for all earlier cells and all later wait for it.
+    """
+    deps: list[set[int]] = [set(inputs.values()) for inputs in graph.inputs]
+    readers: dict[tuple[str, int], list[int]] = {}
+    for i, inputs in enumerate(graph.inputs):
+        for name, src in inputs.items():
+            readers.setdefault((name, src), []).append(i)
+    for k, flow in enumerate(flows):
+        if flow is None:
+            continue
+        for name in flow.mutates:
+            origin = graph.inputs[k].get(name)
+            if origin is None:
+                continue
+            for j in readers[(name, origin)]:
+                if j < k:
+                    deps[k].add(j)
+                elif j > k:
+                    deps[j].add(k)
+    module_of = {name: mod for flow in flows if flow is not None for name, mod in flow.imports}
+    last_call: dict[str, int] = {}
+    for k, flow in enumerate(flows):
+        if flow is None:
+            continue
+        touched = {module_of[n] for n in (*flow.mutates, *flow.calls) if n in module_of}
+        for mod in touched:
+            if mod in last_call:
+                deps[k].add(last_call[mod])
+            last_call[mod] = k
+    barrier: int | None = None
+    for i, flow in enumerate(flows):
+        if barrier is not None:
+            deps[i].add(barrier)
+        if flow is None:
+            deps[i].update(range(barrier or 0, i))
+            barrier = i
+    return [tuple(sorted(d)) for d in deps]
@@ -1,23 +1,21 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, cast
+from typing import Any
 
-import nbformat
+from .nb_model import load_notebook
 
 
 def summarize_notebook(path: str | Path) -> dict[str, Any]:
-    nb: Any = cast(Any, nbformat.read(str(path), as_version=4))
+    nb = load_notebook(path)
     summary: dict[str, Any] = {"cells": []}
-    for i, cell in enumerate(nb.cells):
-        ctype = cell.get("cell_type")
-        src: str = cell.get("source", "")
+    for cell in nb.cells:
         summary["cells"].append(
             {
-                "id": i,
-                "type": ctype,
-                "lines": len(src.splitlines()),
-                "head": src.splitlines()[:3],
+                "id": cell.index,
+                "type": cell.cell_type,
+                "lines": cell.line_count,
+                "head": cell.head(3),
             }
         )
     return summary
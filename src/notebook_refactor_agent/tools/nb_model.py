@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+import os
+from pathlib import Path
+from typing import Any, cast
+
+from .nb_stream import read_cells
+
+
+@dataclass(frozen=True, slots=True)
+class CellModel:
+    index: int
+    cell_type: str
+    cell_id: str | None
+    source: str
+    line_count: int
+
+    def head(self, n: int) -> list[str]:
+        return self.source.splitlines()[:n]
+
+
+@dataclass(frozen=True, slots=True)
+class NotebookModel:
+    """Read-only view of the parts of a notebook the pipeline uses."""
+
+    path: str
+    cells: tuple[CellModel, ...]
+    code_cell_indices: tuple[int, ...]
+
+    @property
+    def code_cells(self) -> tuple[CellModel, ...]:
+        return tuple(self.cells[i] for i in self.code_cell_indices)
+
+
+def _read_with_nbformat(path: str) -> list[tuple[str, str | None, str]]:
+    import nbformat  # fallback only; the streaming reader handles nbformat 4
+
+    nb: Any = cast(Any, nbformat.read(path, as_version=4))
+    out: list[tuple[str, str | None, str]] = []
+    for c in nb.cells:
+        cid = c.get("id")
+        out.append(
+            (
+                str(c.get("cell_type", "")),
+                str(cid) if cid is not None else None,
+                str(c.get("source", "") or ""),
+            )
+        )
+    return out
+
+
+def _build(path: str) -> NotebookModel:
+    raw: list[tuple[str, str | None, str]]
+    try:
+        # Fast path: skip outputs/attachments without decoding them.
+        raw = [(c.cell_type, c.cell_id, c.source) for c in read_cells(path)]
+    except (OSError, ValueError):
+        # Old (v3) or malformed notebooks: let nbformat convert or report the error.
+        raw = _read_with_nbformat(path)
+    cells = tuple(
+        CellModel(
+            index=i,
+            cell_type=ctype,
+            cell_id=cid,
+            source=src,
+            line_count=len(src.splitlines()),
+        )
+        for i, (ctype, cid, src) in enumerate(raw)
+    )
+    code = tuple(c.index for c in cells if c.cell_type == "code")
+    return NotebookModel(path=path, cells=cells, code_cell_indices=code)
+
+
+@lru_cache(maxsize=32)
+def _load_cached(path: str, mtime_ns: int, size: int) -> NotebookModel:
+    return _build(path)
+
+
+def load_notebook(path: str | Path) -> NotebookModel:
+    """Return the parsed notebook, re-reading it only when its mtime or size changed."""
+    p = os.path.abspath(path)
+    st = os.stat(p)
+    return _load_cached(p, st.st_mtime_ns, st.st_size)
+
+
+def clear_notebook_cache() -> None:
+    """Forget parsed notebooks, so the next ``load_notebook`` reads and parses again."""
+    _load_cached.cache_clear()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+import json
+import mmap
+from pathlib import Path
+import re
+from typing import Any
+
+# Structural bytes we have to look at while skipping a nested value; everything
+# else (including the bulk of base64 output payloads) is jumped over with find().
+_NESTED_RE = re.compile(rb'["{}\[\]]')
+_WS_RE = re.compile(rb"[ \t\r\n]*")
+_SCALAR_RE = re.compile(rb"[^,}\]\s]+")
+
+_KEEP_KEYS = (b'"cell_type"', b'"id"', b'"source"')
+
+# Give already-scanned pages back to the kernel every so often so resident
+# memory stays flat regardless of how large the output payloads are.
+_RELEASE_EVERY = 32 * 1024 * 1024
+
+
+@dataclass(frozen=True, slots=True)
+class RawCell:
+    cell_type: str
+    cell_id: str | None
+    source: str
+
+
+class _Scanner:
+    """Minimal forward-only JSON scanner over a bytes-like buffer."""
+
+    def __init__(self, buf: mmap.mmap | bytes) -> None:
+        self.buf = buf
+        self.pos = 0
+        self._released = 0
+
+    def _release(self) -> None:
+        mm = self.buf
+        if not isinstance(mm, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        upto = self.pos - self.pos % mmap.PAGESIZE
+        if upto - self._released >= _RELEASE_EVERY:
+            mm.madvise(mmap.MADV_DONTNEED, self._released, upto - self._released)
+            self._released = upto
+
+    def ws(self) -> None:
+        m = _WS_RE.match(self.buf, self.pos)
+        if m:
+            self.pos = m.end()
+
+    def peek(self) -> int:
+        self.ws()
+        if self.pos >= len(self.buf):
+            raise ValueError("unexpected end of notebook JSON")
+        return int(self.buf[self.pos])
+
+    def expect(self, ch: bytes) -> None:
+        if self.peek() != ch[0]:
+            raise ValueError(f"expected {ch!r} at byte {self.pos}")
+        self.pos += 1
+
+    def _string_end(self, start: int) -> int:
+        # ``start`` is the opening quote; return the index after the closing one.
+        buf = self.buf
+        i = start + 1
+        while True:
+            q = buf.find(b'"', i)
+            if q < 0:
+                raise ValueError("unterminated string in notebook JSON")
+            j = q - 1
+            while buf[j] == 0x5C:  # backslash
+                j -= 1
+            if (q - 1 - j) % 2 == 0:
+                return q + 1
+            i = q + 1
+
+    def skip_value(self) -> tuple[int, int]:
+        """Skip the next value and return its byte span."""
+        c = self.peek()
+        start = self.pos
+        if c == 0x22:
+            self.pos = self._string_end(start)
+        elif c in (0x7B, 0x5B):
+            depth = 0
+            i = start
+            while True:
+                m = _NESTED_RE.search(self.buf, i)
+                if m is None:
+                    raise ValueError("unterminated container in notebook JSON")
+                i = m.start()
+                ch = self.buf[i]
+                if ch == 0x22:
+                    i = self._string_end(i)
+                    continue
+                depth += 1 if ch in (0x7B, 0x5B) else -1
+                i += 1
+                if depth == 0:
+                    break
+            self.pos = i
+        else:
+            m = _SCALAR_RE.match(self.buf, start)
+            if m is None:
+                raise ValueError(f"invalid value at byte {start}")
+            self.pos = m.end()
+        return start, self.pos
+
+    def load_value(self) -> Any:
+        start, end = self.skip_value()
+        return json.loads(self.buf[start:end])
+
+    def key(self) -> bytes:
+        if self.peek() != 0x22:
+            raise ValueError(f"expected object key at byte {self.pos}")
+        start = self.pos
+        self.pos = self._string_end(start)
+        key = bytes(self.buf[start : self.pos])
+        self.expect(b":")
+        return key
+
+    def members(self) -> Iterator[bytes]:
+        """Iterate over the keys of the object at the cursor.
+
+        The caller must consume (load or skip) each key's value before resuming.
+        """
+        self.expect(b"{")
+        if self.peek() == 0x7D:
+            self.pos += 1
+            return
+        while True:
+            yield self.key()
+            c = self.peek()
+            self.pos += 1
+            if c == 0x7D:
+                return
+            if c != 0x2C:
+                raise ValueError(f"expected ',' or '}}' at byte {self.pos - 1}")
+
+    def items(self) -> Iterator[None]:
+        """Iterate over the elements of the array at the cursor (same contract as members)."""
+        self.expect(b"[")
+        if self.peek() == 0x5D:
+            self.pos += 1
+            return
+        while True:
+            yield None
+            c = self.peek()
+            self.pos += 1
+            if c == 0x5D:
+                return
+            if c != 0x2C:
+                raise ValueError(f"expected ',' or ']' at byte {self.pos - 1}")
+
+
+def _read_cell(sc: _Scanner) -> RawCell:
+    fields: dict[bytes, Any] = {}
+    for key in sc.members():
+        if key in _KEEP_KEYS:
+            fields[key] = sc.load_value()
+        else:
+            sc.skip_value()  # outputs, attachments, metadata, ...
+    src = fields.get(b'"source"', "")
+    if isinstance(src, list):
+        src = "".join(str(s) for s in src)
+    cid = fields.get(b'"id"')
+    return RawCell(
+        cell_type=str(fields.get(b'"cell_type"', "")),
+        cell_id=str(cid) if cid is not None else None,
+        source=str(src or ""),
+    )
+
+
+def _iter_notebook(sc: _Scanner, meta: dict[str, Any]) -> Iterator[RawCell]:
+    for key in sc.members():
+        if key == b'"cells"':
+            meta["cells"] = True
+            for _ in sc.items():
+                yield _read_cell(sc)
+                sc._release()
+        elif key == b'"nbformat"':
+            meta["nbformat"] = sc.load_value()
+        else:
+            sc.skip_value()
+
+
+def iter_cells(path: str | Path) -> Iterator[RawCell]:
+    """Yield ``(cell_type, id, source)`` for each cell without materialising outputs.
+
+    The file is memory-mapped and scanned incrementally; output and attachment
+    payloads are skipped over without being decoded. Raises ``ValueError`` on
+    malformed JSON or on notebooks without a top-level ``cells`` list (nbformat < 4).
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        meta: dict[str, Any] = {}
+        yield from _iter_notebook(_Scanner(mm), meta)
+        if not meta.get("cells") or int(meta.get("nbformat", 4)) < 4:
+            raise ValueError("not an nbformat 4 notebook")
+
+
+def read_cells(path: str | Path) -> list[RawCell]:
+    """Eagerly collect :func:`iter_cells` into a list."""
+    return list(iter_cells(path))
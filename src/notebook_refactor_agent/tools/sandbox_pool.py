@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import atexit
+from collections import deque
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any
+
+# Runs inside each worker. Interpreter startup and the stdlib imports every job
+# script needs happen while the worker sits idle; rlimits are applied only once
+# a job arrives, so they bound the job and not the warm-up.
+_WORKER = r"""
+import builtins, json, os, sys
+import importlib.util, pathlib, time
+try:
+    import resource
+except ImportError:
+    resource = None
+line = sys.stdin.readline()
+if not line:
+    sys.exit(0)
+job = json.loads(line)
+os.chdir(job["cwd"])
+if resource is not None:
+    if job.get("cpu"):
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = int(ru.ru_utime + ru.ru_stime) + int(job["cpu"])
+        try:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+        except (ValueError, OSError):
+            pass
+    if job.get("mem_mb") and hasattr(resource, "RLIMIT_AS"):
+        mem = int(job["mem_mb"]) * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        except (ValueError, OSError):
+            pass
+code = compile(job["script"], "<string>", "exec")
+del line, job
+exec(code, {"__name__": "__main__", "__builtins__": builtins})
+"""
+
+_EnvKey = tuple[tuple[str, str], ...]
+
+
+def sandbox_env(safe: bool) -> dict[str, str]:
+    """Environment for sandboxed runs; ``safe`` drops proxies and sets ``NO_NETWORK=1``."""
+    env = os.environ.copy()
+    if safe:
+        for k in list(env.keys()):
+            lk = k.lower()
+            if lk.endswith("_proxy") or lk in ("http_proxy", "https_proxy", "no_proxy"):
+                env.pop(k, None)
+        env["NO_NETWORK"] = "1"
+    return env
+
+
+class SandboxPool:
+    """Pre-started ``python -I`` workers that each run exactly one script, then exit.
+
+    Workers are spawned without a ``preexec_fn`` (so subprocess can take its fast
+    spawn path) and set their own CPU and address-space limits when a job
+    arrives. Once :meth:`warm` was called for an environment, taking a worker
+    immediately starts its replacement, so the next run finds a warm
+    interpreter; one-off runs just spawn a worker and add no background load.
+    """
+
+    def __init__(self, size: int = 2, python: str = sys.executable) -> None:
+        self.size = size
+        self.python = python
+        self._idle: dict[_EnvKey, deque[subprocess.Popen[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _spawn(self, env: dict[str, str]) -> subprocess.Popen[str]:
+        return subprocess.Popen(
+            [self.python, "-I", "-c", _WORKER],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+
+    def warm(self, env: dict[str, str]) -> None:
+        """Top the idle workers for ``env`` up to ``size``; workers for other envs are retired."""
+        key: _EnvKey = tuple(sorted(env.items()))
+        with self._lock:
+            stale = [p for k, procs in self._idle.items() if k != key for p in procs]
+            self._idle = {key: self._idle.get(key, deque())}
+            idle = self._idle[key]
+            missing = self.size - len(idle)
+            idle.extend(self._spawn(env) for _ in range(max(0, missing)))
+        for p in stale:
+            _retire(p)
+
+    def _take(self, env: dict[str, str]) -> subprocess.Popen[str]:
+        key: _EnvKey = tuple(sorted(env.items()))
+        proc: subprocess.Popen[str] | None = None
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle and proc is None:
+                cand = idle.popleft()
+                if cand.poll() is None:
+                    proc = cand
+        if proc is None:
+            proc = self._spawn(env)
+        if idle is not None:  # only envs someone warmed are kept topped up
+            self.warm(env)
+        return proc
+
+    def run(
+        self,
+        cwd: str | os.PathLike[str],
+        script: str,
+        env: dict[str, str],
+        timeout: float,
+        cpu_secs: int | None = None,
+        mem_mb: int | None = None,
+    ) -> dict[str, Any]:
+        """Run ``script`` in a warm worker; result shaped like the critic's tool runs."""
+        proc = self._take(env)
+        job = {"cwd": os.fspath(cwd), "script": script, "cpu": cpu_secs, "mem_mb": mem_mb}
+        t0 = time.monotonic()
+        try:
+            out, err = proc.communicate(json.dumps(job) + "\n", timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.communicate()
+            return {"returncode": 124, "seconds": time.monotonic() - t0, "stdout": "", "stderr": ""}
+        return {
+            "returncode": proc.returncode,
+            "seconds": time.monotonic() - t0,
+            "stdout": out or "",
+            "stderr": err or "",
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            procs = [p for idle in self._idle.values() for p in idle]
+            self._idle = {}
+        for p in procs:
+            _retire(p)
+
+
+def _retire(proc: subprocess.Popen[str]) -> None:
+    try:
+        proc.communicate("", timeout=1)  # EOF on stdin: the worker exits without a job
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+
+
+_default: SandboxPool | None = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> SandboxPool:
+    """Process-wide pool (size from ``NRA_SANDBOX_WORKERS``, default 2), closed at exit."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SandboxPool(size=int(os.environ.get("NRA_SANDBOX_WORKERS") or 2))
+            atexit.register(_default.close)
+        return _default
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Any
+
+# Synthetic thread ids for named tracks (e.g. concurrent LLM requests on one thread).
+_TRACK_TID_BASE = 1 << 40
+
+
+class Tracer:
+    """Collects Chrome trace events ("X" complete events) for Perfetto / chrome://tracing.
+
+    Timestamps are ``time.perf_counter()`` in microseconds, a system-wide monotonic
+    clock on Linux, so traces from several worker processes can be merged as is.
+    """
+
+    def __init__(self, process_name: str = "nra") -> None:
+        self.pid = os.getpid()
+        self.events: list[dict[str, Any]] = [
+            _meta("process_name", self.pid, 0, process_name),
+        ]
+        self._tids: dict[str | int, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, track: str | None) -> int:
+        key: str | int = track if track is not None else threading.get_ident()
+        tid = self._tids.get(key)
+        if tid is None:
+            if track is None:
+                tid, label = threading.get_ident(), threading.current_thread().name
+            else:
+                tid, label = _TRACK_TID_BASE + len(self._tids), track
+            self._tids[key] = tid
+            self.events.append(_meta("thread_name", self.pid, tid, label))
+        return tid
+
+    def add(
+        self,
+        name: str,
+        cat: str,
+        start: float,
+        end: float,
+        args: dict[str, Any],
+        track: str | None = None,
+    ) -> None:
+        with self._lock:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": start * 1e6,
+                    "dur": (end - start) * 1e6,
+                    "pid": self.pid,
+                    "tid": self._tid(track),
+                    "args": args,
+                }
+            )
+
+
+def _meta(kind: str, pid: int, tid: int, name: str) -> dict[str, Any]:
+    return {"name": kind, "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+
+
+def write_trace(path: Path, events: list[dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+
+
+# Process-wide tracer; None (the default) makes every span a cheap no-op.
+_TRACER: Tracer | None = None
+
+
+def start_trace(process_name: str = "nra") -> Tracer:
+    global _TRACER
+    _TRACER = Tracer(process_name)
+    return _TRACER
+
+
+def stop_trace() -> Tracer | None:
+    global _TRACER
+    tracer, _TRACER = _TRACER, None
+    return tracer
+
+
+@contextmanager
+def span(
+    name: str, cat: str = "span", track: str | None = None, **args: Any
+) -> Iterator[dict[str, Any]]:
+    """Record the enclosed block as one trace event; the yielded dict becomes its args."""
+    tracer = _TRACER
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        if tracer is not None:
+            tracer.add(name, cat, start, time.perf_counter(), args, track)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+import ctypes
+import ctypes.util
+import os
+from pathlib import Path
+import select
+import struct
+import sys
+import time
+from typing import Protocol
+
+from .batch import collect_notebooks
+
+# inotify(7) constants
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE_SELF = 0x400
+_IN_ISDIR = 0x40000000
+_IN_Q_OVERFLOW = 0x4000
+_EVENT = struct.Struct("iIII")
+
+# Jupyter saves via write-to-temp + rename, editors may write in place.
+_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_MODIFY | _IN_DELETE_SELF
+
+
+def _is_notebook(p: Path) -> bool:
+    return p.suffix == ".ipynb" and ".ipynb_checkpoints" not in p.parts
+
+
+class Watcher(Protocol):
+    def wait(self, timeout: float) -> set[Path]: ...
+
+    def close(self) -> None: ...
+
+
+class InotifyWatcher:
+    """Linux inotify watcher (via ctypes) for one notebook or a directory tree."""
+
+    def __init__(self, target: Path) -> None:
+        name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd: int = fd
+        self._dirs: dict[int, Path] = {}
+        self._target = target
+        self._only: Path | None = None
+        if target.is_file():
+            self._only = target.resolve()
+            self._add(target.resolve().parent)
+        else:
+            for d, subdirs, _ in os.walk(target):
+                subdirs[:] = [s for s in subdirs if s != ".ipynb_checkpoints"]
+                self._add(Path(d).resolve())
+
+    def _add(self, d: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), _MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {d}")
+        self._dirs[wd] = d
+
+    def wait(self, timeout: float) -> set[Path]:
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return set()
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed: set[Path] = set()
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            wd, mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+            raw = buf[pos + _EVENT.size : pos + _EVENT.size + length].rstrip(b"\0")
+            pos += _EVENT.size + length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were dropped; treat every notebook as possibly saved.
+                changed.update(x.resolve() for x in collect_notebooks(self._target))
+                continue
+            base = self._dirs.get(wd)
+            if base is None or not raw:
+                continue
+            p = base / os.fsdecode(raw)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO) and self._only is None:
+                    if p.name != ".ipynb_checkpoints":
+                        self._add(p)
+                        changed.update(x for x in p.rglob("*.ipynb") if _is_notebook(x))
+                continue
+            if _is_notebook(p) and (self._only is None or p == self._only):
+                changed.add(p)
+        return changed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Portable fallback: re-stat the target's notebooks every ``interval`` seconds."""
+
+    def __init__(self, target: Path, interval: float = 1.0) -> None:
+        self.target = target
+        self.interval = interval
+        self._seen = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        out: dict[Path, tuple[int, int]] = {}
+        for p in collect_notebooks(self.target):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            out[p.resolve()] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def wait(self, timeout: float) -> set[Path]:
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            now = self._scan()
+            changed = {p for p, stamp in now.items() if self._seen.get(p) != stamp}
+            self._seen = now
+            left = deadline - time.monotonic()
+            if changed or left <= 0:
+                return changed
+            time.sleep(min(self.interval, left))
+
+    def close(self) -> None:
+        pass
+
+
+def open_watcher(target: Path, poll: bool = False, poll_interval: float = 1.0) -> Watcher:
+    """Inotify on Linux, polling elsewhere or when inotify is unavailable."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(target)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(target, poll_interval)
+
+
+def iter_changes(
+    watcher: Watcher,
+    debounce: float = 0.3,
+    stop: Callable[[], bool] | None = None,
+    tick: float = 1.0,
+) -> Iterator[set[Path]]:
+    """Yield batches of saved notebooks once no further save arrived for ``debounce`` seconds."""
+    while stop is None or not stop():
+        changed = watcher.wait(tick)
+        if not changed:
+            continue
+        # Unrelated events (temp files, other names) must not end the quiet period early.
+        quiet_until = time.monotonic() + debounce
+        while (left := quiet_until - time.monotonic()) > 0:
+            more = watcher.wait(left)
+            if more:
+                changed |= more
+                quiet_until = time.monotonic() + debounce
+        yield {p for p in changed if p.exists()}
+
+
+def watch_output_dir(nb: Path, target: Path, output_root: Path) -> Path:
+    """Output dir for ``nb``: ``output_root`` itself, or mirrored below it for a directory target."""
+    if target.is_file():
+        return output_root
+    rel = nb.resolve().relative_to(target.resolve())
+    return output_root / rel.with_suffix("")
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+import nbformat as nbf
+
+from notebook_refactor_agent.batch import collect_notebooks, output_dirs_for, refactor_many
+
+
+def _make_nb(path: Path, cells: list[str]) -> Path:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_code_cell(c) for c in cells]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nbf.write(nb, str(path))
+    return path
+
+
+def test_collect_and_output_dirs(tmp_path: Path) -> None:
+    a = _make_nb(tmp_path / "nbs" / "a.ipynb", ["x = 1"])
+    b = _make_nb(tmp_path / "nbs" / "sub" / "a.ipynb", ["y = 2"])
+    _make_nb(tmp_path / "nbs" / ".ipynb_checkpoints" / "a-checkpoint.ipynb", ["z = 3"])
+
+    found = collect_notebooks(tmp_path / "nbs")
+    assert found == [a, b]
+    assert collect_notebooks(str(tmp_path / "nbs" / "*.ipynb")) == [a]
+
+    outs = output_dirs_for(found, tmp_path / "out")
+    assert outs == [tmp_path / "out" / "a", tmp_path / "out" / "sub" / "a"]
+
+
+def test_refactor_many_in_pool(tmp_path: Path) -> None:
+    nbs = [
+        _make_nb(tmp_path / "one.ipynb", ["x = 1\ny = 2"]),
+        _make_nb(tmp_path / "two.ipynb", ["import math", "z = math.sqrt(9)"]),
+    ]
+    states = [
+        {"input_nb": str(nb), "output_dir": str(out), "timeout_secs": 10}
+        for nb, out in zip(nbs, output_dirs_for(nbs, tmp_path / "out"), strict=True)
+    ]
+    results = refactor_many(states, jobs=2)
+    assert [r.input_nb for r in results] == [str(nb) for nb in nbs]
+    for r in results:
+        assert r.error is None
+        assert (Path(r.output_dir) / "src_pkg" / "module.py").exists()
+        assert r.seconds > 0
@@ -0,0 +1,58 @@
+import ast
+from pathlib import Path
+
+from notebook_refactor_agent.bench.scaling import compare, run_suite
+from notebook_refactor_agent.bench.synthetic import NotebookSpec, write_synthetic
+from notebook_refactor_agent.tools.nb_inspector import summarize_notebook
+from notebook_refactor_agent.tools.nb_model import load_notebook
+
+
+def test_synthetic_notebook_follows_spec(tmp_path: Path) -> None:
+    spec = NotebookSpec(cells=20, def_ratio=1.0, import_density=1.0, output_bytes=300)
+    path = write_synthetic(tmp_path / "nb.ipynb", spec)
+
+    nb = load_notebook(path)
+    code = [nb.cells[i] for i in nb.code_cell_indices]
+    assert len(nb.cells) == 20 and len(code) == 18
+    assert all("def f" in c.source and "import" in c.source for c in code)
+    assert path.stat().st_size > 18 * 300  # one display payload per code cell
+    assert len(summarize_notebook(path)["cells"]) == 20
+    assert write_synthetic(tmp_path / "again.ipynb", spec).read_text() == path.read_text()
+
+
+def test_synthetic_notebook_mixed_syntax_and_magics(tmp_path: Path) -> None:
+    spec = NotebookSpec(cells=30, def_ratio=0.3, magic_ratio=0.3, syntax_mix=True)
+    nb = load_notebook(write_synthetic(tmp_path / "nb.ipynb", spec))
+    sources = [nb.cells[i].source for i in nb.code_cell_indices]
+    magics = [s for s in sources if s.startswith("%timeit")]
+    assert magics and len(magics) < len(sources)
+    for src in sources:
+        ast.parse(src.replace("%timeit", "#"))
+    joined = "\n".join(sources)
+    assert "**kwargs):" in joined and " += 1  # comment" in joined and "for j in" in joined
+
+
+def test_scaling_suite_runs_llm_graph_with_fake_provider(tmp_path: Path) -> None:
+    res = run_suite(
+        [10, 40],
+        ["planner", "refactor", "graph_llm"],
+        NotebookSpec(),
+        tmp_path,
+        repeat=1,
+        graph_max_cells=10,
+    )
+
+    got = [(r["stage"], r["cells"]) for r in res["results"]]
+    assert got == [
+        ("planner", 10),
+        ("refactor", 10),
+        ("graph_llm", 10),
+        ("planner", 40),
+        ("refactor", 40),
+    ]
+    assert all(r["seconds"] > 0 and r["py_peak_mb"] > 0 for r in res["results"])
+    module = (tmp_path / "graph_llm_10" / "graph_llm_0" / "src_pkg" / "module.py").read_text()
+    assert "def cell_0() -> None:" in module
+
+    slower = {"results": [{**r, "seconds": r["seconds"] * 2} for r in res["results"]]}
+    assert {round(r["ratio"], 6) for r in compare(res, slower)} == {2.0}
@@ -29,3 +29,35 @@ def test_critic_reports(tmp_path: Path) -> None:
     data = json.loads((reports / "report.json").read_text())
     assert "metrics" in data
     assert res["metrics"]["pytest_returncode"] == 0
+
+
+def test_critic_concurrency_limit_and_timings(tmp_path: Path) -> None:
+    p = _make_nb(tmp_path)
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out_pkg"
+    refactor_node({"input_nb": str(p), "plan": plan, "output_dir": str(out_dir)})
+    writer_node.test_writer_node({"plan": plan, "output_dir": str(out_dir)})
+    res = critic_node(
+        {"output_dir": str(out_dir), "timeout_secs": 5, "safe": True, "critic_jobs": 2}
+    )
+    metrics = res["metrics"]
+    assert set(metrics["tool_seconds"]) == {"pytest", "ruff", "black", "mypy", "exec", "import"}
+    assert 0 < metrics["import_seconds"] < metrics["tool_seconds"]["import"]
+    assert all(secs > 0 for secs in metrics["tool_seconds"].values())
+    assert metrics["critic_seconds"] < sum(metrics["tool_seconds"].values())
+    for name in ("pytest", "ruff", "black", "mypy", "exec"):
+        assert (out_dir / ".reports" / f"{name}.txt").exists()
+
+
+def test_critic_autofix_folds_fix_and_check(tmp_path: Path) -> None:
+    p = _make_nb(tmp_path)
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out_pkg"
+    refactor_node({"input_nb": str(p), "plan": plan, "output_dir": str(out_dir)})
+    writer_node.test_writer_node({"plan": plan, "output_dir": str(out_dir)})
+    state = {"output_dir": str(out_dir), "timeout_secs": 5, "safe": True}
+    assert critic_node(state)["metrics"]["black_returncode"] != 0
+
+    metrics = critic_node({**state, "autofix": True})["metrics"]
+    assert metrics["black_returncode"] == 0 and metrics["ruff_returncode"] == 0
+    assert "reformatted" in (out_dir / ".reports" / "black.txt").read_text()
@@ -0,0 +1,97 @@
+import ast
+
+from notebook_refactor_agent.tools.dataflow import cell_deps, cell_flow, def_use_graph
+
+
+def _flow(src: str):  # type: ignore[no-untyped-def]
+    return cell_flow(ast.parse(src))
+
+
+def test_cell_flow_scopes_and_order() -> None:
+    f = _flow(
+        "import os\n"
+        "a = 1\n"
+        "print(a, b)\n"
+        "def g(p, q=c):\n"
+        "    local = p + d\n"
+        "    return local\n"
+        "total = [i * e for i in range(n)]\n"
+        "k += 1\n"
+        "for j in items:\n"
+        "    acc = j\n"
+        "with open(path) as fh:\n"
+        "    pass\n"
+    )
+    assert f.defs == ("a", "g", "total", "k", "j", "acc", "fh")
+    assert f.uses[:11] == ("print", "b", "c", "d", "range", "n", "e", "k", "items", "open", "path")
+    assert f.uses[11:] == ("j", "acc")  # unbound if ``items`` is empty
+
+
+def test_cell_flow_branch_bindings_read_upstream() -> None:
+    f = _flow(
+        "if debug:\n    n = 10\nelse:\n    n = 1\n    m = 2\n"
+        "while m:\n    w = 0\n"
+        "try:\n    t = f()\n    u = 1\nexcept ValueError:\n    t = 0\n"
+        "match t:\n    case 0:\n        v = 1\n    case _:\n        v = 2\n"
+    )
+    assert f.defs == ("n", "m", "w", "t", "u", "v")
+    assert f.uses == ("debug", "m", "f", "ValueError", "w", "u")  # ``case _`` always matches
+    # Bound on one path only: the cell reads the value it keeps on the others.
+    assert _flow("if flag:\n    x = 1\nprint(x)").uses == ("flag", "print", "x")
+    assert _flow("x = 0\nif flag:\n    x = 1\nprint(x)").uses == ("flag", "print")
+
+
+def test_def_use_graph_resolves_latest_definition() -> None:
+    flows = [
+        _flow("x = 1\ny = 2"),
+        None,  # unparsable cell
+        _flow("x = x + y"),
+        _flow("print(x)"),
+    ]
+    g = def_use_graph(flows)
+    assert g.inputs == [{}, {}, {"x": 0, "y": 0}, {"x": 2}]
+    assert g.outputs == [["x", "y"], [], ["x"], []]
+
+
+def test_cell_deps_orders_mutations_and_barriers() -> None:
+    flows = [
+        _flow("a = [1]\nb = 2"),
+        _flow("c = 3"),
+        _flow("print(a)"),
+        _flow("a[0] = c"),
+        _flow("total = a[0] + b"),
+        None,  # unparsable cell
+        _flow("d = 4"),
+    ]
+    assert flows[3] is not None and flows[3].mutates == ("a",)
+    deps = cell_deps(flows, def_use_graph(flows))
+    assert deps == [(), (), (0,), (0, 1, 2), (0, 3), (0, 1, 2, 3, 4), (5,)]
+
+
+def test_cell_deps_orders_method_calls_and_arguments() -> None:
+    flows = [
+        _flow("m = M()\nxs = []"),
+        _flow("m.fit()"),
+        _flow("print(m.w)"),
+        _flow("fill(xs)"),
+        _flow("n = len(xs)"),
+    ]
+    assert [f.mutates if f else None for f in flows] == [(), ("m",), (), ("xs",), ()]
+    deps = cell_deps(flows, def_use_graph(flows))
+    assert deps == [(), (0,), (0, 1), (0,), (0, 3)]
+
+
+def test_cell_deps_keeps_module_state_calls_in_order() -> None:
+    flows = [
+        _flow("import random\nfrom random import seed\nimport matplotlib.pyplot as plt"),
+        _flow("random.seed(0)"),
+        _flow("a = random.random()"),
+        _flow("plt.plot([1])"),
+        _flow("seed(1)"),
+        _flow("b = 2"),
+        _flow("plt.savefig('x.png')"),
+    ]
+    assert flows[0] is not None
+    assert flows[0].imports == (("random", "random"), ("seed", "random"), ("plt", "matplotlib"))
+    deps = cell_deps(flows, def_use_graph(flows))
+    assert deps == [(), (), (1,), (), (2,), (), (3,)]
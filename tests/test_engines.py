@@ -0,0 +1,69 @@
+from pathlib import Path
+from typing import Any
+
+import nbformat as nbf
+import pytest
+
+from notebook_refactor_agent.agent.graph import ENGINES, build_pipeline, pipeline_nodes
+
+
+def _without_timings(state: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in state.items() if k != "metrics"}
+
+
+def test_engines_share_state_semantics() -> None:
+    calls: list[int] = [0]
+
+    def planner(state: dict[str, Any]) -> dict[str, Any]:
+        state["report"] = "lost"  # edits to the node's own dict are not state updates
+        state["llm_calls"].append({"node": "planner"})  # edits to shared values are
+        return {"plan": {"n": 1}, "not_a_state_key": 1}
+
+    def refactor(state: dict[str, Any]) -> dict[str, Any]:
+        calls[0] += 1
+        assert "report" not in state and "not_a_state_key" not in state
+        return {"files": {"a.py": ""}, "plan": None}
+
+    nodes = {"planner": planner, "refactor": refactor, "critic": lambda s: {"report": "ok"}}
+    finals = {
+        engine: build_pipeline(engine, nodes).invoke({"llm_calls": [], "bogus": True})
+        for engine in ENGINES
+    }
+
+    assert calls[0] == len(ENGINES)
+    expected = {
+        "llm_calls": [{"node": "planner"}],
+        "plan": None,
+        "files": {"a.py": ""},
+        "report": "ok",
+    }
+    for final in finals.values():
+        assert _without_timings(final) == expected
+        assert list(final["metrics"]["nodes"]) == ["planner", "refactor", "critic"]
+
+
+def test_native_engine_matches_langgraph_on_pipeline(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_code_cell("x = 1"), nbf.v4.new_code_cell("y = x + 1\nprint(y)")]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    nodes = pipeline_nodes()
+    nodes["critic"] = lambda state: {"report": "skipped"}
+
+    finals = {
+        engine: build_pipeline(engine, nodes).invoke(
+            {"input_nb": str(p), "output_dir": str(tmp_path / engine), "mode": "both"}
+        )
+        for engine in ENGINES
+    }
+
+    lg, native = (_without_timings(finals[e]) for e in ENGINES)
+    assert {k: v for k, v in lg.items() if k != "output_dir"} == {
+        k: v for k, v in native.items() if k != "output_dir"
+    }
+    assert native["files"]["src_pkg/module.py"] == lg["files"]["src_pkg/module.py"]
+
+
+def test_unknown_engine() -> None:
+    with pytest.raises(ValueError, match="Unknown engine 'dask'"):
+        build_pipeline("dask")
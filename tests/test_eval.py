@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import nbformat as nbf
+import pytest
+
+from notebook_refactor_agent.eval import run
+from notebook_refactor_agent.llm.cache import LLMCache, reset_cache_stats
+
+
+def _suite(tmp_path: Path, name: str, n: int) -> Path:
+    cases = []
+    for i in range(n):
+        nb = nbf.v4.new_notebook()
+        nb.cells = [nbf.v4.new_code_cell(f"x = {i}\ny = x + 1")]
+        nbf.write(nb, str(tmp_path / f"nb{i}.ipynb"))
+        cases.append({"id": f"case{i}", "input": str(tmp_path / f"nb{i}.ipynb")})
+    suite = tmp_path / f"{name}.yaml"
+    suite.write_text(json.dumps({"run_root": str(tmp_path / name), "cases": cases}))
+    return suite
+
+
+def _summary(root: Path) -> dict[str, Any]:
+    (ts,) = root.iterdir()
+    summary: dict[str, Any] = json.loads((ts / "summary.json").read_text())
+    for case in summary["cases"]:
+        case["metrics"].pop("seconds")
+    summary.pop("run_root")
+    return summary
+
+
+def test_run_suite_jobs_matches_serial(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    score = run._score_case
+
+    def score_with_cache(case: dict[str, Any], base: Path, profile: Path | None = None) -> Any:
+        # One miss and one hit per case, counted in whichever process runs it.
+        cache = LLMCache(base / ".cache" / str(case["id"]))
+        assert cache.get("p", "m", str(case["id"])) is None
+        cache.put("p", "m", str(case["id"]), "reply", {})
+        assert cache.get("p", "m", str(case["id"])) is not None
+        return score(case, base, profile)
+
+    monkeypatch.setattr(run, "_score_case", score_with_cache)
+    for name, jobs in (("serial", 1), ("pooled", 2)):
+        reset_cache_stats()
+        run.run_suite(_suite(tmp_path, name, 2), jobs=jobs)
+
+    serial = _summary(tmp_path / "serial")
+    pooled = _summary(tmp_path / "pooled")
+    assert [c["id"] for c in pooled["cases"]] == ["case0", "case1"]
+    assert pooled == serial
+    assert pooled["llm_cache"]["misses"] == 2 and pooled["llm_cache"]["hits"] == 2
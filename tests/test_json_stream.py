@@ -0,0 +1,48 @@
+import json
+import random
+
+from notebook_refactor_agent.llm.json_stream import FilesStreamParser
+
+
+def _feed_in_pieces(p: FilesStreamParser, text: str, seed: int) -> list[tuple[str, str]]:
+    rnd = random.Random(seed)
+    got: list[tuple[str, str]] = []
+    i = 0
+    while i < len(text):
+        k = rnd.randint(1, 9)
+        got += p.feed(text[i : i + k])
+        i += k
+    return got
+
+
+def test_files_emitted_incrementally_from_fenced_reply() -> None:
+    files = {"src_pkg/module.py": 'def f() -> str:\n    return "a\\\\b"\n', "README.md": "é"}
+    obj = {"package_root": "src_pkg", "meta": [1, -2.5e3, {"x": None}], "files": files}
+    text = "```json\n" + json.dumps(obj, indent=2) + "\n```"
+    for seed in range(20):
+        p = FilesStreamParser()
+        assert dict(_feed_in_pieces(p, text, seed)) == files
+        assert p.done and p.files_complete and not p.failed
+        assert p.fields == {"package_root": "src_pkg"}
+
+
+def test_first_file_available_before_reply_ends() -> None:
+    p = FilesStreamParser()
+    assert p.feed('{"files": {"a.py": "x = 1\\n"') == [("a.py", "x = 1\n")]
+    assert not p.done
+
+
+def test_fails_fast_on_invalid_json() -> None:
+    p = FilesStreamParser()
+    p.feed('{"files": {"a.py": "x"} oops')
+    assert p.failed and "at char" in p.error
+
+    p = FilesStreamParser()
+    p.feed("I'm sorry, " * 500)
+    assert p.failed
+
+
+def test_tolerates_raw_newlines_in_strings() -> None:
+    p = FilesStreamParser()
+    assert p.feed('{"files": {"a.py": "line1\nline2"}}') == [("a.py", "line1\nline2")]
+    assert not p.failed
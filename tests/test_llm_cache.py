@@ -0,0 +1,76 @@
+import hashlib
+import json
+from pathlib import Path
+import threading
+
+from notebook_refactor_agent.llm.cache import LLMCache, cache_stats, reset_cache_stats
+
+
+def test_cache_roundtrip_single_file(tmp_path: Path) -> None:
+    cache = LLMCache(tmp_path)
+    assert cache.get("groq", "m", "prompt") is None
+    cache.put("groq", "m", "prompt", "answer", {"usage": {"total_tokens": 3}})
+    assert cache.get("groq", "m", "prompt") == ("answer", {"usage": {"total_tokens": 3}})
+    assert cache.get("groq", "other", "prompt") is None
+    assert sorted(p.name for p in tmp_path.iterdir() if not p.name.endswith(("-wal", "-shm"))) == [
+        "cache.sqlite3"
+    ]
+
+
+def test_cache_migrates_legacy_json_files(tmp_path: Path) -> None:
+    h = hashlib.sha256(b"groq|m|old prompt").hexdigest()
+    (tmp_path / f"{h}.json").write_text(json.dumps({"text": "old", "meta": {}}, indent=2))
+    (tmp_path / "broken.json").write_text("{not json")
+
+    cache = LLMCache(tmp_path)
+    assert cache.get("groq", "m", "old prompt") == ("old", {})
+    assert not (tmp_path / f"{h}.json").exists()
+    assert (tmp_path / "broken.json").exists()
+
+
+def test_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = LLMCache(tmp_path, max_bytes=10**9)
+    cache.put("p", "m", "a", "x" * 1000, {})
+    cache.put("p", "m", "b", "y" * 1000, {})
+    cache.get("p", "m", "a")  # "b" is now least recently used
+
+    cache.max_bytes = 60  # room for roughly one compressed entry
+    cache.put("p", "m", "c", "z" * 1000, {})
+    assert cache.get("p", "m", "b") is None
+    assert cache.get("p", "m", "c") is not None
+    assert len(cache) <= 2
+
+
+def test_cache_concurrent_writers(tmp_path: Path) -> None:
+    def work(n: int) -> None:
+        cache = LLMCache(tmp_path)
+        for i in range(20):
+            cache.put("p", "m", f"{n}-{i}", str(i), {})
+            assert cache.get("p", "m", f"{n}-{i}") == (str(i), {})
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(LLMCache(tmp_path)) == 80
+
+
+def test_memory_tier_and_stats(tmp_path: Path) -> None:
+    reset_cache_stats(clear_memory=True)
+    cache = LLMCache(tmp_path)
+    assert cache.get("p", "m", "q") is None
+    cache.put("p", "m", "q", "hello", {})
+    assert cache.get("p", "m", "q") == ("hello", {})
+
+    reset_cache_stats(clear_memory=True)
+    fresh = LLMCache(tmp_path)
+    assert fresh.get("p", "m", "q") == ("hello", {})  # disk, then promoted
+    assert fresh.get("p", "m", "q") == ("hello", {})  # memory
+    assert fresh.get("p", "m", "missing") is None
+    stats = cache_stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["bytes_saved"] == 2 * len("hello")
@@ -0,0 +1,96 @@
+from pathlib import Path
+from typing import Any
+
+import nbformat as nbf
+
+from notebook_refactor_agent.agent.manifest import MANIFEST_NAME, Manifest, incremental
+from notebook_refactor_agent.agent.nodes import writer_node
+from notebook_refactor_agent.agent.nodes.planner import planner_node
+from notebook_refactor_agent.agent.nodes.refactor import refactor_node
+
+
+def _write_nb(p: Path, sources: list[str]) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_code_cell(s) for s in sources]
+    nbf.write(nb, str(p))
+
+
+def _pipeline(calls: dict[str, int]) -> list[Any]:
+    def counted(name: str, fn: Any) -> Any:
+        def run(state: dict[str, Any]) -> dict[str, Any]:
+            calls[name] = calls.get(name, 0) + 1
+            return dict(fn(state))
+
+        return incremental(name, run)
+
+    def critic(state: dict[str, Any]) -> dict[str, Any]:
+        reports = Path(state["output_dir"]) / ".reports"
+        reports.mkdir(exist_ok=True)
+        (reports / "report.json").write_text("{}")
+        return {"metrics": {"pytest_returncode": 0}, "report": "ok"}
+
+    return [
+        counted("planner", planner_node),
+        counted("refactor", refactor_node),
+        counted("test_writer", writer_node.test_writer_node),
+        counted("critic", critic),
+    ]
+
+
+def _run(nodes: list[Any], nb: Path, out: Path) -> dict[str, Any]:
+    state: dict[str, Any] = {"input_nb": str(nb), "output_dir": str(out), "incremental": True}
+    for node in nodes:
+        state.update(node(state))
+    return state
+
+
+def test_unchanged_notebook_reuses_every_stage(tmp_path: Path) -> None:
+    nb, out = tmp_path / "in.ipynb", tmp_path / "out"
+    _write_nb(nb, ["x = 1", "y = x + 1"])
+    calls: dict[str, int] = {}
+    nodes = _pipeline(calls)
+
+    first = _run(nodes, nb, out)
+    second = _run(nodes, nb, out)
+    assert calls == {"planner": 1, "refactor": 1, "test_writer": 1, "critic": 1}
+    assert second["plan"] == first["plan"]
+    assert second["files"] == first["files"]
+    assert second["metrics"] == {"pytest_returncode": 0}
+
+    data = Manifest.load(out).data
+    assert len(data["cells"]) == 2
+    assert "src_pkg/module.py" in data["stages"]["refactor"]["files"]
+    assert (out / MANIFEST_NAME).exists()
+
+
+def test_changes_rerun_only_stale_stages(tmp_path: Path) -> None:
+    nb, out = tmp_path / "in.ipynb", tmp_path / "out"
+    _write_nb(nb, ["x = 1", "y = x + 1"])
+    calls: dict[str, int] = {}
+    nodes = _pipeline(calls)
+    _run(nodes, nb, out)
+
+    # A hand edit to generated code is repaired; identical output keeps critic results.
+    (out / "src_pkg" / "module.py").write_text("oops\n")
+    _run(nodes, nb, out)
+    assert calls == {"planner": 1, "refactor": 2, "test_writer": 1, "critic": 1}
+
+    _write_nb(nb, ["x = 2", "y = x + 1"])
+    _run(nodes, nb, out)
+    assert calls == {"planner": 2, "refactor": 3, "test_writer": 2, "critic": 2}
+    assert "x = 2" in (out / "src_pkg" / "module.py").read_text()
+
+
+def test_disabled_by_default(tmp_path: Path) -> None:
+    calls = {"n": 0}
+
+    def node(state: dict[str, Any]) -> dict[str, Any]:
+        calls["n"] += 1
+        return {"report": "x"}
+
+    wrapped = incremental("critic", node)
+    state = {"input_nb": "unused", "output_dir": str(tmp_path)}
+    wrapped(state)
+    wrapped(state)
+    assert calls["n"] == 2
+    assert not (tmp_path / MANIFEST_NAME).exists()
@@ -0,0 +1,59 @@
+import json
+from pathlib import Path
+import time
+from typing import Any
+
+import pytest
+
+from notebook_refactor_agent.agent.memory import MemoryBudgetExceeded
+from notebook_refactor_agent.agent.tracing import instrument
+
+
+def _hog(state: dict[str, Any]) -> dict[str, Any]:
+    blob = [bytes(1024) for _ in range(4096)]  # ~4 MB kept alive in the update
+    return {"files": {"blob": str(len(blob))}, "blob": blob}
+
+
+def test_trace_memory_records_peak_and_call_sites(tmp_path: Path) -> None:
+    state: dict[str, Any] = {"output_dir": str(tmp_path), "trace_memory": True}
+    update = instrument("refactor", _hog)(state)
+
+    mem = update["metrics"]["nodes"]["refactor"]["memory"]
+    assert mem["py_peak_mb"] >= 4
+    assert mem["top"][0]["where"].endswith("test_memory.py:13")
+    assert "memory" not in instrument("planner", lambda s: {})({})["metrics"]["nodes"]["planner"]
+
+
+def test_memory_budget_aborts_with_report(tmp_path: Path) -> None:
+    state: dict[str, Any] = {
+        "output_dir": str(tmp_path),
+        "trace_memory": True,
+        "memory_budget_mb": 1,
+    }
+    with pytest.raises(MemoryBudgetExceeded, match="'refactor' used .* over the 1 MB"):
+        instrument("refactor", _hog)(state)
+
+    report = json.loads((tmp_path / ".reports" / "report.json").read_text())
+    assert report["report"].startswith("aborted: node 'refactor'")
+    assert report["memory"]["refactor"]["py_peak_mb"] >= 4
+
+
+def test_memory_budget_stops_a_running_node(tmp_path: Path) -> None:
+    steps: list[int] = []
+
+    def crawl(state: dict[str, Any]) -> dict[str, Any]:
+        for i in range(500):  # ~5 s unless stopped
+            try:
+                time.sleep(0.01)
+            except Exception:  # the interrupt is not an Exception
+                pass
+            steps.append(i)
+        return {}
+
+    state: dict[str, Any] = {"output_dir": str(tmp_path), "memory_budget_mb": 1}
+    t0 = time.monotonic()
+    with pytest.raises(MemoryBudgetExceeded, match="'critic' used .* over the 1 MB"):
+        instrument("critic", crawl)(state)
+    assert time.monotonic() - t0 < 2 and len(steps) < 200
+    report = json.loads((tmp_path / ".reports" / "report.json").read_text())
+    assert report["metrics"]["memory_used_mb"] > 1
@@ -0,0 +1,33 @@
+from pathlib import Path
+
+import nbformat as nbf
+
+from notebook_refactor_agent.tools.nb_model import load_notebook
+
+
+def _make_nb(tmp_path: Path, cells: list[str]) -> Path:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_markdown_cell("# title")] + [nbf.v4.new_code_cell(c) for c in cells]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    return p
+
+
+def test_load_notebook_model(tmp_path: Path) -> None:
+    p = _make_nb(tmp_path, ["x = 1\ny = 2", "print(x)"])
+    nb = load_notebook(p)
+    assert nb.code_cell_indices == (1, 2)
+    assert [c.line_count for c in nb.code_cells] == [2, 1]
+    assert nb.cells[1].head(1) == ["x = 1"]
+    assert nb.cells[1].cell_id is not None
+
+
+def test_load_notebook_cached_until_changed(tmp_path: Path) -> None:
+    p = _make_nb(tmp_path, ["x = 1"])
+    first = load_notebook(p)
+    assert load_notebook(str(p)) is first
+
+    _make_nb(tmp_path, ["x = 1", "y = 22"])
+    second = load_notebook(p)
+    assert second is not first
+    assert len(second.code_cells) == 2
@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+import nbformat as nbf
+import pytest
+
+from notebook_refactor_agent.tools.nb_model import load_notebook
+from notebook_refactor_agent.tools.nb_stream import read_cells
+
+
+def test_read_cells_skips_outputs_and_matches_nbformat(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    code = nbf.v4.new_code_cell('s = "a \\"quoted\\" \\\\ path"\nprint(s)  # {[')
+    code.outputs = [
+        nbf.v4.new_output("stream", name="stdout", text='}] "tricky" \\ output\n'),
+        nbf.v4.new_output("display_data", data={"image/png": "iVBORw0KGgo" * 1000}),
+    ]
+    md = nbf.v4.new_markdown_cell("![img](attachment:a.png)")
+    md["attachments"] = {"a.png": {"image/png": "AAAA" * 1000}}
+    nb.cells = [md, code, nbf.v4.new_code_cell("")]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+
+    cells = read_cells(p)
+    expected = nbf.read(str(p), as_version=4).cells
+    assert [(c.cell_type, c.cell_id, c.source) for c in cells] == [
+        (c.cell_type, c.get("id"), c.source) for c in expected
+    ]
+
+
+def test_read_cells_rejects_old_format(tmp_path: Path) -> None:
+    p = tmp_path / "v3.ipynb"
+    p.write_text(json.dumps({"worksheets": [{"cells": []}], "nbformat": 3, "metadata": {}}))
+    with pytest.raises(ValueError):
+        read_cells(p)
+
+
+def test_load_notebook_joins_list_sources(tmp_path: Path) -> None:
+    p = tmp_path / "raw.ipynb"
+    cell = {"cell_type": "code", "metadata": {}, "outputs": [], "source": ["x = 1\n", "y = 2"]}
+    p.write_text(json.dumps({"cells": [cell], "metadata": {}, "nbformat": 4, "nbformat_minor": 4}))
+    nb = load_notebook(p)
+    assert nb.cells[0].source == "x = 1\ny = 2"
+    assert nb.cells[0].cell_id is None
+    assert nb.cells[0].line_count == 2
@@ -0,0 +1,226 @@
+import asyncio
+import json
+from pathlib import Path
+import re
+from typing import Any
+
+import nbformat as nbf
+import pytest
+
+from notebook_refactor_agent.agent.nodes import refactor_llm
+from notebook_refactor_agent.llm import tokens
+from notebook_refactor_agent.plan import FunctionSpec, Plan
+
+
+class _ChunkLLM:
+    """Answers each chunk with one function per ``### name`` header it was sent."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    def _answer(self, messages: list[dict[str, str]]) -> str:
+        names = re.findall(r"^### (\w+)", messages[-1]["content"], flags=re.M)
+        code = "from __future__ import annotations\nimport math\n\n" + "\n\n".join(
+            f"def {n}() -> float:\n    return math.pi" for n in names
+        )
+        return json.dumps({"files": {"src_pkg/module.py": code, "README.md": names[0]}})
+
+    def chat(self, messages: list[dict[str, str]], **_: Any) -> tuple[str, dict[str, Any]]:
+        self.calls += 1
+        return self._answer(messages), {"usage": {}}
+
+    async def achat(
+        self, messages: list[dict[str, str]], *_: Any, **__: Any
+    ) -> tuple[str, dict[str, Any]]:
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return self._answer(messages), {"usage": {}}
+
+
+def _state(
+    tmp_path: Path, n: int, sources: dict[int, str] | None = None, **extra: Any
+) -> dict[str, Any]:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_code_cell((sources or {}).get(i, f"x{i} = {i}")) for i in range(n)]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = Plan(
+        module_path="src_pkg/module.py",
+        tests_path="tests/test_module.py",
+        package_root="src_pkg",
+        functions=[FunctionSpec(cell_id=i, fn_name=f"step_{i}") for i in range(n)],
+    )
+    return {
+        "input_nb": str(p),
+        "output_dir": str(tmp_path / "out"),
+        "plan": plan,
+        "provider": "stub",
+        "cache_dir": str(tmp_path / "cache"),
+        **extra,
+    }
+
+
+def test_refactor_llm_fans_out_chunks(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    llm = _ChunkLLM()
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+
+    state = refactor_llm.refactor_llm_node(
+        _state(tmp_path, 7, refactor_chunk_size=2, llm_concurrency=3)
+    )
+
+    assert llm.calls == 4
+    assert llm.peak == 3
+    module = (tmp_path / "out" / "src_pkg" / "module.py").read_text()
+    assert module.count("from __future__ import annotations") == 1
+    assert module.count("import math") == 1
+    assert [int(i) for i in re.findall(r"def step_(\d+)", module)] == list(range(7))
+    assert (tmp_path / "out" / "README.md").read_text() == "step_0"
+    assert [c["chunk"] for c in state["llm_calls"]] == [0, 1, 2, 3]
+
+
+def test_merge_python_hoists_whole_import_statements() -> None:
+    a = (
+        "from __future__ import annotations\n"
+        "from math import (\n    pi,\n    tau,\n)\n\n\n"
+        "def f() -> float:\n"
+        '    """Docs.\n\nimport this line is prose\n"""\n'
+        "    import os\n\n    return pi + tau + len(os.sep)\n"
+    )
+    b = "from math import (\n    pi,\n    tau,\n)\nimport json\n\n\ndef g() -> str:\n    return json.dumps(1)\n"
+    merged = refactor_llm._merge_python([a, b])
+    assert merged.startswith(
+        "from __future__ import annotations\nfrom math import (\n    pi,\n    tau,\n)\n"
+        "import json\n\n\ndef f()"
+    )
+    assert merged.count("from math import") == 1
+    assert "\nimport this line is prose\n" in merged and "    import os\n" in merged
+    compile(merged, "module.py", "exec")
+
+
+def test_refactor_llm_single_request_by_default(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    llm = _ChunkLLM()
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    # No chunk size and no token budget: one request as long as the prompt fits.
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 6, max_output_tokens=100))
+    assert llm.calls == 1
+    assert "chunk" not in state["llm_calls"][0]
+
+
+def test_refactor_llm_chunks_when_prompt_exceeds_context(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    llm = _ChunkLLM()
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    monkeypatch.setitem(tokens._PROFILES, "tiny", tokens.ModelProfile(1000, 100))
+    sources = {i: f"values_{i} = [{', '.join(map(str, range(80)))}]" for i in range(6)}
+    refactor_llm.refactor_llm_node(
+        _state(tmp_path, 6, sources, model="tiny", max_output_tokens=100)
+    )
+    assert llm.calls > 1
+
+
+def test_refactor_llm_chunks_by_token_budget(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    llm = _ChunkLLM()
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    state = refactor_llm.refactor_llm_node(
+        _state(tmp_path, 6, max_output_tokens=100, token_budget=100_000)
+    )
+    assert llm.calls > 1
+    for call in state["llm_calls"]:
+        assert call["estimated_prompt_tokens"] > 0
+    module = (tmp_path / "out" / "src_pkg" / "module.py").read_text()
+    assert [int(i) for i in re.findall(r"def step_(\d+)", module)] == list(range(6))
+
+
+def test_refactor_llm_reuses_unchanged_chunks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    llm = _ChunkLLM()
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    refactor_llm.refactor_llm_node(_state(tmp_path, 6, refactor_chunk_size=2))
+    assert llm.calls == 3
+
+    # Whitespace-only edits keep the key; a real edit re-requests just that chunk.
+    edited = {0: "x0 = 0   \r\n\n", 3: "x3 = 'changed'"}
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 6, edited, refactor_chunk_size=2))
+    assert llm.calls == 4
+    assert [c["cached"] for c in state["llm_calls"]] == [True, False, True]
+    module = (tmp_path / "out" / "src_pkg" / "module.py").read_text()
+    assert [int(i) for i in re.findall(r"def step_(\d+)", module)] == list(range(6))
+
+    # Inserting a cell shifts every name and cell id; only the new cell is sent,
+    # and the hits are renamed to the functions the plan now gives their cells.
+    shifted = {0: "new = 0", **{i + 1: f"x{i} = {i}" for i in range(4)}}
+    refactor_llm.refactor_llm_node(_state(tmp_path, 4, refactor_chunk_size=1))
+    calls = llm.calls
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 5, shifted, refactor_chunk_size=1))
+    assert llm.calls == calls + 1
+    assert [c["cached"] for c in state["llm_calls"]] == [False, True, True, True, True]
+    assert all("fn_names" not in c["meta"] for c in state["llm_calls"])
+    module = (tmp_path / "out" / "src_pkg" / "module.py").read_text()
+    assert [int(i) for i in re.findall(r"def step_(\d+)", module)] == list(range(5))
+
+
+class _StreamLLM:
+    def __init__(self, pieces: list[str]) -> None:
+        self.pieces = pieces
+        self.yielded = 0
+        self.closed = False
+
+    def chat_stream(self, messages: Any, *args: Any, meta_out: Any = None, **kw: Any) -> Any:
+        try:
+            for piece in self.pieces:
+                self.yielded += 1
+                yield piece
+            if meta_out is not None:
+                meta_out["usage"] = {"prompt_tokens": 7}
+        finally:
+            self.closed = True
+
+
+def test_refactor_llm_streams_files(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    reply = json.dumps({"files": {"src_pkg/module.py": "x = 1\n", "src_pkg/other.py": "y = 2\n"}})
+    llm = _StreamLLM([reply[i : i + 5] for i in range(0, len(reply), 5)])
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 2, stream=True))
+    assert (tmp_path / "out" / "src_pkg" / "other.py").read_text() == "y = 2\n"
+    assert state["llm_calls"][0]["actual_prompt_tokens"] == 7
+
+
+def test_refactor_llm_stream_aborts_on_invalid_json(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    llm = _StreamLLM(['{"files": {"a.py": "x"', ", oops", "never", "read"])
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    with pytest.raises(RuntimeError, match="no longer valid JSON"):
+        refactor_llm.refactor_llm_node(_state(tmp_path, 1, stream=True))
+    assert llm.yielded == 2 and llm.closed
+    assert (tmp_path / "out" / "a.py").read_text() == "x"
+
+
+def test_refactor_llm_stream_rejects_truncated_reply(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    reply = json.dumps({"files": {"src_pkg/module.py": "x = 1\n", "tests/test_module.py": "y\n"}})
+    cut = reply[: reply.index("tests/test_module.py") + 24]  # ends inside the second file
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: _StreamLLM([cut]))
+    with pytest.raises(RuntimeError, match="ended before the `files` object was complete"):
+        refactor_llm.refactor_llm_node(_state(tmp_path, 1, stream=True))
+
+    # Nothing was cached: the next run asks again and gets the whole reply.
+    llm = _StreamLLM([reply])
+    monkeypatch.setattr(refactor_llm, "create_llm", lambda provider: llm)
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 1, stream=True))
+    assert llm.yielded == 1 and state["llm_calls"][0]["cached"] is False
+    assert (tmp_path / "out" / "tests" / "test_module.py").read_text() == "y\n"
+    state = refactor_llm.refactor_llm_node(_state(tmp_path, 1, stream=True))
+    assert state["llm_calls"][0]["cached"] is True
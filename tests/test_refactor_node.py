@@ -1,11 +1,15 @@
+import ast
 import importlib.util
 from pathlib import Path
+import sys
 from types import ModuleType
 
 import nbformat as nbf
+import pytest
 
 from notebook_refactor_agent.agent.nodes.planner import planner_node
 from notebook_refactor_agent.agent.nodes.refactor import refactor_node
+from notebook_refactor_agent.agent.nodes.refactor_runtime import clear_memo
 
 
 def _make_nb(tmp_path: Path) -> Path:
@@ -41,3 +45,253 @@ def test_refactor_node_modes(tmp_path: Path) -> None:
             assert hasattr(m, "run_all")
         if mode in ("functions", "both"):
             assert any(n.startswith("cell_") for n in dir(m))
+
+
+def test_refactor_node_ast_engine(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell("from math import (\n    pi,\n    sqrt,\n)\nr = sqrt(pi)"),
+        nbf.v4.new_code_cell(
+            "def area(w,\n         h=2, *, scale: float = 1.0):\n    tmp = w * h\n"
+            "    return tmp * scale\n\nif True:\n    a, [b, *c] = 1, [2, 3]\n"
+        ),
+        nbf.v4.new_code_cell("%matplotlib inline\nimport os\nz = 3"),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    code = refactor_node(
+        {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "mode": "run-all"}
+    )["files"]["src_pkg/module.py"]
+
+    assert "from math import pi, sqrt" in code
+    assert "import os" in code
+    assert "def area(w: Any, h: Any=2, *, scale: float=1.0) -> Any:" in code
+    assert "return r, a, b, c" in code  # ``tmp`` is local to area() and not returned
+    assert "    %matplotlib inline" in code  # not Python: line-based fallback
+
+
+def test_refactor_node_without_trystar(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    # Python 3.10: no ast.TryStar. The engine must not touch it on any cell.
+    from notebook_refactor_agent.agent.nodes import refactor as engine
+    from notebook_refactor_agent.tools import dataflow
+
+    monkeypatch.delattr(ast, "TryStar", raising=False)
+    with monkeypatch.context() as m:
+        m.setattr(sys, "version_info", (3, 10, 0))
+        importlib.reload(dataflow)
+        importlib.reload(engine)
+    try:
+        nb = nbf.v4.new_notebook()
+        nb.cells = [
+            nbf.v4.new_code_cell("x = 1"),
+            nbf.v4.new_code_cell("try:\n    y = x\nexcept ValueError:\n    y = 0"),
+            nbf.v4.new_code_cell("print(x, y)"),
+        ]
+        p = tmp_path / "in.ipynb"
+        nbf.write(nb, str(p))
+        plan = planner_node({"input_nb": str(p)})["plan"]
+        out_dir = tmp_path / "out"
+        state = {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "mode": "both"}
+        code = engine.refactor_node(state)["files"]["src_pkg/module.py"]
+        assert "def cell_1(x: Any) -> object:" in code
+        flow = dataflow.cell_flow(ast.parse("try:\n    y = x\nexcept ValueError:\n    y = 0"))
+        assert flow.defs == ("y",) and "x" in flow.uses
+    finally:
+        monkeypatch.undo()
+        importlib.reload(dataflow)
+        importlib.reload(engine)
+
+
+def test_refactor_engine_bench_smoke(tmp_path: Path) -> None:
+    from notebook_refactor_agent.bench.refactor_engine import run_bench
+
+    res = run_bench(200, ["run-all", "functions"], tmp_path)
+    assert res["modes"]["functions"]["lines"] > res["modes"]["run-all"]["lines"] > 200
+    ast.parse((tmp_path / "out_run-all" / "src_pkg" / "module.py").read_text().replace("%", "#"))
+
+
+def test_refactor_node_threads_dataflow(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell("x = 1\nunused = 0"),
+        nbf.v4.new_code_cell("def inc(v):\n    return v + x"),
+        nbf.v4.new_code_cell("x += 1\ny = inc(x)"),
+        nbf.v4.new_code_cell("result = (x, y)"),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    code = refactor_node(
+        {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "mode": "both"}
+    )["files"]["src_pkg/module.py"]
+
+    assert "def cell_0() -> object:" in code
+    assert "def cell_2(x: Any, inc: Any) -> tuple[object, object]:" in code
+    assert "    x, y = cell_2(x, inc)" in code
+    m = _import_module(out_dir / "src_pkg" / "module.py")
+    assert m.CELL_OUTPUTS == {
+        "cell_0": ("x",),
+        "cell_1": ("inc",),
+        "cell_2": ("x", "y"),
+        "cell_3": (),
+    }
+    assert m.run_all() is None
+    assert m.cell_2(1, m.cell_1(1)) == (2, 3)
+
+
+def test_refactor_node_branch_binding_takes_upstream_value(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell("n = 5\ndebug = False"),
+        nbf.v4.new_code_cell("if debug:\n    n = 10"),
+        nbf.v4.new_code_cell("result = n * 2"),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    code = refactor_node(
+        {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "mode": "both"}
+    )["files"]["src_pkg/module.py"]
+
+    assert "def cell_1(debug: Any, n: Any) -> object:" in code
+    m = _import_module(out_dir / "src_pkg" / "module.py")
+    assert m.run_all() is None
+    assert m.cell_1(False, 5) == 5 and m.cell_1(True, 5) == 10
+
+
+def test_refactor_node_memoize(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    log = tmp_path / "calls.txt"
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell(f"x = 2\nopen({str(log)!r}, 'a').write('0')"),
+        nbf.v4.new_code_cell(f"y = x * 21\nopen({str(log)!r}, 'a').write('1')"),
+        nbf.v4.new_code_cell("def f():\n    return y\nz = f()"),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    state = {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "memoize": True}
+    code = refactor_node(state)["files"]["src_pkg/module.py"]
+    assert code.count("@_memoize(") == 3
+
+    monkeypatch.delenv("NRA_MEMO_DIR", raising=False)
+    m = _import_module(out_dir / "src_pkg" / "module.py")
+    m.run_all()
+    m.run_all()
+    assert log.read_text() == "01"  # second run served from disk
+    assert m.cell_1(3) == 63 and log.read_text() == "011"  # new input, new entry
+
+    files, size = clear_memo(out_dir)
+    assert files == 4 and size > 0
+    m.run_all()
+    assert log.read_text() == "01101"
+
+    # A cell that mutates its input returns nothing, so it must never be served from disk.
+    nb.cells = [
+        nbf.v4.new_code_cell("data = [1, 2]"),
+        nbf.v4.new_code_cell("data.append(3)"),
+        nbf.v4.new_code_cell(f"total = data[-1] * 2\nopen({str(log)!r}, 'a').write(str(total))"),
+    ]
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    state = {"input_nb": str(p), "plan": plan, "output_dir": str(tmp_path / "mut"), "memoize": True}
+    code = refactor_node(state)["files"]["src_pkg/module.py"]
+    assert code.count("@_memoize(") == 2 and "\ndef cell_1(data: Any) -> None:" in code
+    assert '")\ndef cell_1(' not in code
+    m = _import_module(tmp_path / "mut" / "src_pkg" / "module.py")
+    log.write_text("")
+    for _ in range(2):
+        data = m.cell_0()
+        m.cell_1(data)
+        assert data == [1, 2, 3]
+        m.run_all()
+    assert log.read_text() == "6"  # computed once from [1, 2, 3], then a memo hit
+
+
+def test_refactor_node_parallel_run_all(tmp_path: Path) -> None:
+    spans = tmp_path / "spans.txt"
+
+    # Calls into ``time`` are ordered like any module state, so the cells sleep
+    # through a helper and record the interval they spent in it.
+    nap = (
+        "import time\n\ndef nap():\n    t0 = time.monotonic()\n    time.sleep(0.2)\n"
+        f"    open({str(spans)!r}, 'a').write(f'{{t0}} {{time.monotonic()}}\\n')"
+    )
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell(nap),
+        nbf.v4.new_code_cell("nap()\na = [1]"),
+        nbf.v4.new_code_cell("nap()\nb = 2"),
+        nbf.v4.new_code_cell("nap()\nc = 3"),
+        nbf.v4.new_code_cell("a[0] = b + c"),
+        nbf.v4.new_code_cell("total = a[0] * b"),
+        nbf.v4.new_code_cell(f"open({str(tmp_path / 'total.txt')!r}, 'w').write(str(total))"),
+        nbf.v4.new_code_cell(
+            "class M:\n    w = None\n\n    def fit(self):\n"
+            "        time.sleep(0.2)\n        self.w = 1\n\nm = M()"
+        ),
+        nbf.v4.new_code_cell("m.fit()"),
+        nbf.v4.new_code_cell(f"open({str(tmp_path / 'w.txt')!r}, 'w').write(str(m.w))"),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    refactor_node({"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "parallel": True})
+
+    m = _import_module(out_dir / "src_pkg" / "module.py")
+    assert m.CELL_DEPS["cell_4"] == ("cell_1", "cell_2", "cell_3")
+    assert m.CELL_DEPS["cell_9"] == ("cell_7", "cell_8")  # waits for m.fit()
+    m.run_all()
+    starts, ends = zip(
+        *(map(float, ln.split()) for ln in spans.read_text().splitlines()), strict=True
+    )
+    assert len(starts) == 3 and max(starts) < min(ends)  # the three sleeps overlap
+    assert (tmp_path / "total.txt").read_text() == "10"
+    assert (tmp_path / "w.txt").read_text() == "1"
+
+
+def test_refactor_node_lazy_imports(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    (tmp_path / "heavymod.py").write_text("VALUE = 41\n")
+    (tmp_path / "starmod.py").write_text("STAR = 3\n")
+    (tmp_path / "sidefx.py").write_text("")
+    (tmp_path / "pkgmod").mkdir()
+    (tmp_path / "pkgmod" / "__init__.py").write_text("VALUE = 1\n")
+    (tmp_path / "pkgmod" / "sub.py").write_text("X = 2\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ("heavymod", "starmod", "sidefx", "pkgmod", "pkgmod.sub"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    nb = nbf.v4.new_notebook()
+    nb.cells = [
+        nbf.v4.new_code_cell("import json\nimport heavymod as hm\nx = json.dumps(1)"),
+        nbf.v4.new_code_cell("y = hm.VALUE + int(x)"),
+        nbf.v4.new_code_cell("print(y)"),
+        nbf.v4.new_code_cell(
+            "import pkgmod.sub\nimport pkgmod\nfrom starmod import *\nimport sidefx\n"
+            "z = pkgmod.sub.X + pkgmod.VALUE + STAR"
+        ),
+    ]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    plan = planner_node({"input_nb": str(p)})["plan"]
+    out_dir = tmp_path / "out"
+    state = {"input_nb": str(p), "plan": plan, "output_dir": str(out_dir), "lazy_imports": True}
+    code = refactor_node({**state, "mode": "functions"})["files"]["src_pkg/module.py"]
+    assert "\nimport json\n" in code  # stdlib stays at module level
+    assert "def cell_1(x: Any) -> object:\n    import heavymod as hm\n" in code
+    assert "def cell_0() -> object:\n    x = " in code  # cell_0 never reads hm
+    # star imports cannot move into a function; unread imports are for side effects
+    assert "\nfrom starmod import *\n" in code and "\nimport sidefx\n" in code
+    assert "def cell_3() -> None:\n    import pkgmod.sub\n    import pkgmod\n    z = " in code
+
+    m = _import_module(out_dir / "src_pkg" / "module.py")
+    assert "heavymod" not in sys.modules
+    assert m.cell_1(m.cell_0()) == 42
+    assert "heavymod" in sys.modules
+    m.cell_3()
+    assert "pkgmod.sub" in sys.modules
@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import pytest
+
+from notebook_refactor_agent.tools.sandbox_pool import SandboxPool, sandbox_env
+
+
+def test_sandbox_pool_runs_one_job_per_warm_worker(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy:1")
+    env = sandbox_env(True)
+    assert "HTTPS_PROXY" not in env and env["NO_NETWORK"] == "1"
+
+    pool = SandboxPool(size=1)
+    try:
+        pool.warm(env)
+        script = (
+            "import os, pathlib; print(os.getpid(), pathlib.Path.cwd(), os.environ['NO_NETWORK'])"
+        )
+        first = pool.run(tmp_path, script, env, timeout=10)
+        second = pool.run(tmp_path, script, env, timeout=10)
+        assert first["returncode"] == 0, first["stderr"]
+        pid1, cwd, flag = first["stdout"].split()
+        assert Path(cwd) == tmp_path.resolve() and flag == "1"
+        assert second["stdout"].split()[0] != pid1  # a fresh worker per job
+
+        failed = pool.run(tmp_path, "raise SystemExit(3)", env, timeout=10)
+        assert failed["returncode"] == 3
+    finally:
+        pool.close()
+
+
+def test_sandbox_pool_enforces_limits(tmp_path: Path) -> None:
+    pool = SandboxPool(size=0)
+    env = sandbox_env(True)
+    mem = pool.run(tmp_path, "b = bytearray(512 * 1024 * 1024)", env, timeout=10, mem_mb=256)
+    assert mem["returncode"] != 0 and "MemoryError" in mem["stderr"]
+    cpu = pool.run(tmp_path, "while True: pass", env, timeout=20, cpu_secs=1)
+    assert cpu["returncode"] != 0 and cpu["seconds"] < 10
+    slow = pool.run(tmp_path, "import time; time.sleep(5)", env, timeout=0.5)
+    assert slow["returncode"] == 124
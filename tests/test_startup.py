@@ -0,0 +1,22 @@
+from notebook_refactor_agent.bench.startup import import_profile, parse_importtime
+
+
+def test_parse_importtime() -> None:
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     zipimport\n"
+        "import time:      2000 |       5000 |   typer\n"
+        "import time:       900 |       5900 | notebook_refactor_agent.cli\n"
+    )
+    assert parse_importtime(stderr) == [
+        ("zipimport", 120, 120, 2),
+        ("typer", 2000, 5000, 1),
+        ("notebook_refactor_agent.cli", 900, 5900, 0),
+    ]
+
+
+def test_cli_and_inspect_start_without_heavy_dependencies() -> None:
+    cli = import_profile("notebook_refactor_agent.cli")
+    assert cli["heavy_loaded"] == []
+    assert 0 < cli["import_ms"] < 500  # generous for loaded CI runners; the bench default is 150
+    assert import_profile("notebook_refactor_agent.tools.nb_inspector")["heavy_loaded"] == []
@@ -0,0 +1,36 @@
+from notebook_refactor_agent.llm.tokens import (
+    estimate_messages_tokens,
+    estimate_output_tokens,
+    estimate_tokens,
+    input_budget,
+    pack_by_budget,
+    usage_record,
+)
+
+
+def test_estimate_tokens_code() -> None:
+    assert estimate_tokens("") == 0
+    # def / foo / ( / a / , / b / ): / \n / indent / return / a / + / b / \n
+    assert estimate_tokens("def foo(a, b):\n    return a + b\n") == 14
+    long_text = "x = compute_something(value)\n" * 100
+    assert 500 <= estimate_tokens(long_text) <= 1500
+    msgs = [{"role": "system", "content": "hi"}, {"role": "user", "content": "there"}]
+    assert estimate_messages_tokens(msgs) == 1 + 1 + 2 * 4 + 3
+
+
+def test_pack_by_budget_respects_input_and_output() -> None:
+    items = [10, 10, 10, 50, 10]
+    chunks = pack_by_budget(items, lambda c: c, input_tokens=35, output_tokens=10**6, base_cost=5)
+    assert chunks == [[10, 10, 10], [50], [10]]
+
+    out_limit = estimate_output_tokens(20)
+    chunks = pack_by_budget(items[:3], lambda c: c, input_tokens=10**6, output_tokens=out_limit)
+    assert chunks == [[10, 10], [10]]
+
+
+def test_budget_and_usage_record() -> None:
+    assert input_budget("llama-3.3-70b-versatile", 4096) == 131072 - 4096
+    assert input_budget("unknown", 1000, token_budget=3000) == 2000
+    rec = usage_record(120, {"usage": {"prompt_tokens": 100}})
+    assert rec == {"estimated_prompt_tokens": 120, "actual_prompt_tokens": 100}
+    assert usage_record(5, {})["actual_prompt_tokens"] is None
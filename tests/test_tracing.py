@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+import subprocess
+import sys
+from typing import Any
+
+import nbformat as nbf
+from typer.testing import CliRunner
+
+from notebook_refactor_agent.agent.tracing import (
+    instrument,
+    start_profile,
+    stop_profile,
+    write_profile_report,
+)
+from notebook_refactor_agent.cli import app
+from notebook_refactor_agent.tracing import span, start_trace, stop_trace
+
+
+def test_instrument_keeps_earlier_node_metrics() -> None:
+    def critic(state: dict[str, Any]) -> dict[str, Any]:
+        with span("tool", cat="subprocess"):
+            return {"metrics": {"pytest_returncode": 0}}
+
+    tracer = start_trace()
+    try:
+        planner = instrument("planner", lambda state: {"plan": {}})
+        state: dict[str, Any] = planner({})
+        state = {**state, **instrument("critic", critic)(state)}
+    finally:
+        assert stop_trace() is tracer
+
+    metrics = state["metrics"]
+    assert metrics["pytest_returncode"] == 0
+    assert set(metrics["nodes"]) == {"planner", "critic"}
+    assert metrics["nodes"]["critic"]["wall_seconds"] >= 0
+    spans = [e for e in tracer.events if e["ph"] == "X"]
+    assert [(e["name"], e["cat"]) for e in spans] == [
+        ("planner", "node"),
+        ("tool", "subprocess"),
+        ("critic", "node"),
+    ]
+    tool, node = spans[1], spans[2]
+    assert node["ts"] <= tool["ts"] and tool["ts"] + tool["dur"] <= node["ts"] + node["dur"]
+
+
+def _busy_loop(n: int) -> int:
+    return sum(i * i for i in range(n))
+
+
+def test_profile_dumps_one_pstats_per_node(tmp_path: Path) -> None:
+    prof = tmp_path / "prof"
+    start_profile(prof)
+    try:
+        state: dict[str, Any] = instrument("planner", lambda state: {"plan": {}})({})
+        state = {**state, **instrument("refactor", lambda s: {"n": _busy_loop(10_000)})(state)}
+    finally:
+        stop_profile()
+    instrument("critic", lambda state: {})(state)  # profiling is off again
+
+    assert sorted(f.name for f in prof.iterdir()) == ["planner.pstats", "refactor.pstats"]
+    report = tmp_path / ".reports" / "profile.txt"
+    write_profile_report(prof, report, nodes=state["metrics"]["nodes"], total_seconds=1.0)
+    text = report.read_text()
+    assert "outside nodes (graph overhead)" in text
+    assert "all nodes combined" in text and "_busy_loop" in text
+    assert text.index("==== planner") < text.index("==== refactor")
+
+
+def test_refactor_cli_writes_chrome_trace(tmp_path: Path) -> None:
+    nb = nbf.v4.new_notebook()
+    nb.cells = [nbf.v4.new_code_cell("x = 1\ny = x + 1")]
+    p = tmp_path / "in.ipynb"
+    nbf.write(nb, str(p))
+    trace = tmp_path / "trace.json"
+    out = tmp_path / "out"
+    args = [
+        "refactor",
+        str(p),
+        "--output-dir",
+        str(out),
+        "--full",
+        "--cache-dir",
+        str(tmp_path / "cache"),
+        "--trace",
+        str(trace),
+        "--verbose",
+    ]
+    result = CliRunner().invoke(app, args)
+    assert "Nodes:   planner" in result.output
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    nodes = [e["name"] for e in events if e.get("cat") == "node"]
+    assert nodes == ["planner", "refactor", "test_writer", "critic"]
+    tools = {e["name"] for e in events if e.get("cat") == "subprocess"}
+    assert {"pytest -q tests", "mypy .", "exec", "import"} <= tools
+
+
+def test_llm_layer_does_not_import_the_agent_package() -> None:
+    code = "import sys, notebook_refactor_agent.llm.aio; print(sorted(sys.modules))"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert "notebook_refactor_agent.agent" not in proc.stdout
+    assert "'notebook_refactor_agent.tracing'" in proc.stdout
@@ -0,0 +1,59 @@
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+
+from notebook_refactor_agent.watch import (
+    InotifyWatcher,
+    PollingWatcher,
+    iter_changes,
+    watch_output_dir,
+)
+
+
+def _save(p: Path, text: str) -> None:
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(text)
+    tmp.replace(p)  # atomic save, like Jupyter
+
+
+@pytest.mark.parametrize("kind", ["inotify", "poll"])
+def test_watcher_debounces_saves(tmp_path: Path, kind: str) -> None:
+    if kind == "inotify" and not sys.platform.startswith("linux"):
+        pytest.skip("inotify is Linux-only")
+    (tmp_path / "sub").mkdir()
+    a, b = tmp_path / "a.ipynb", tmp_path / "sub" / "b.ipynb"
+    _save(a, "{}")
+    _save(b, "{}")
+    watcher = (
+        InotifyWatcher(tmp_path) if kind == "inotify" else PollingWatcher(tmp_path, interval=0.02)
+    )
+
+    def edits() -> None:
+        time.sleep(0.1)
+        for i in range(5):
+            _save(a, f'{{"n": {i}}}')
+            time.sleep(0.02)
+        _save(b, '{"n": 1}')
+        (tmp_path / "notes.txt").write_text("ignored")
+
+    t = threading.Thread(target=edits)
+    t.start()
+    batches = iter_changes(watcher, debounce=0.3, tick=0.05)
+    try:
+        assert next(batches) == {a.resolve(), b.resolve()}
+    finally:
+        t.join()
+        watcher.close()
+
+
+def test_watch_output_dir(tmp_path: Path) -> None:
+    nb = tmp_path / "nbs" / "sub" / "x.ipynb"
+    nb.parent.mkdir(parents=True)
+    nb.write_text("{}")
+    assert watch_output_dir(nb, nb, tmp_path / "out") == tmp_path / "out"
+    assert (
+        watch_output_dir(nb, tmp_path / "nbs", tmp_path / "out") == tmp_path / "out" / "sub" / "x"
+    )